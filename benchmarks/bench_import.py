@@ -0,0 +1,57 @@
+##### Import-time benchmark
+## Pricing workers are short-lived, so importing the numeric path must stay
+## cheap. Each module is imported in a fresh interpreter; the run fails if a
+## forbidden (heavy) module gets imported or if the import exceeds its budget.
+## Usage: python benchmarks/bench_import.py [--repeat 5] [--scale 1.0]
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> (budget in seconds on top of a bare interpreter, modules it must not import)
+BUDGETS = {
+    "core": (0.5, ["pandas", "matplotlib", "networkx", "quantecon", "scipy"]),
+    "functions": (1.5, ["matplotlib", "networkx", "quantecon"]),
+}
+
+_PROBE = """
+import sys, time
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t)
+print(",".join(m for m in {forbidden!r} if m in sys.modules))
+"""
+
+def time_import(module, forbidden, repeat):
+    """
+    Best import time of `module` over `repeat` fresh interpreters, and the
+    forbidden modules it pulled in.
+    """
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(module=module, forbidden=forbidden)],
+                             cwd=ROOT, capture_output=True, text=True, check=True).stdout.split("\n")
+        best = min(best, float(out[0]))
+        loaded = [m for m in out[1].split(",") if m]
+    return best, loaded
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget (slow machines)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module, (budget, forbidden) in BUDGETS.items():
+        elapsed, loaded = time_import(module, forbidden, args.repeat)
+        ok = elapsed <= budget * args.scale and not loaded
+        failed |= not ok
+        print(f"{module:<12} {elapsed * 1000:8.1f} ms  budget {budget * args.scale * 1000:8.1f} ms"
+              + (f"  forbidden imports: {', '.join(loaded)}" if loaded else "") + ("" if ok else "  FAIL"))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
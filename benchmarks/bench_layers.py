@@ -0,0 +1,137 @@
+##### Layer benchmarks
+## Times every layer of the model on its own: matrix build (batchMC), solve
+## (absorb, absorb_to), DataFrame packaging (res*, determiMM), across the
+## single-call, batched and cached paths, and over sweeps of batch size and
+## state-space size. Results are compared with the baseline stored next to this
+## file; the run fails if a case is slower than baseline * (1 + threshold).
+## Baselines are machine-specific: refresh them with --update on the machine
+## that runs the gate.
+## Usage: python benchmarks/bench_layers.py [--filter batch] [--threshold 1.0] [--update]
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+import core
+import functions
+from cache import LayerCache
+from distributions import set_score_template
+from formats import BEST_OF_3, BEST_OF_5, flat_template
+
+BATCH_SIZES = (1, 100, 10_000)
+
+def cases():
+    """
+    Benchmark cases: name -> zero-argument callable.
+    """
+    p1, p2, h1, h2, t1, s1 = 0.65, 0.6, 0.82, 0.74, 0.55, 0.6
+    mats = {level: core.batchMC(level, *args) for level, args in
+            [("game", (p1,)), ("tb", (p1, p2)), ("set", (h1, h2, t1)), ("match", (s1,))]}
+    out = {
+        # Matrix build, solve and DataFrame packaging of each layer, one call
+        "build/game": lambda: functions.MCgame2(p1),
+        "build/tb": lambda: functions.MCtb2(p1, p2),
+        "build/set": lambda: functions.MCset(h1, h2, t1),
+        "build/match": lambda: functions.MCmatch(s1),
+        **{f"solve/{level}": (lambda m=m: core.absorb(m)) for level, m in mats.items()},
+        "frame/resGAME": lambda: functions.resGAME(p1, functions.s0game),
+        "frame/resTIE": lambda: functions.resTIE(p1, p2, functions.s0tb),
+        "frame/resSET": lambda: functions.resSET(h1, h2, t1, functions.s0set),
+        "frame/resMATCH": lambda: functions.resMATCH(s1, functions.s0match),
+        "frame/determiMM": lambda: functions.determiMM(p1, p2, "1-0", "3-2", functions.s0match,
+                                                       functions.s0set, functions.s0game, functions.s0tb),
+        # Cached path: warm (every level hits) and cold (empty cache)
+        "cached/warm": lambda: _warm_cache.price(p1, p2, "1-0", "3-2"),
+        "cached/cold": lambda: LayerCache().price(p1, p2, "1-0", "3-2"),
+    }
+    # Batched paths over the batch size
+    rng = np.random.default_rng(0)
+    for n in BATCH_SIZES:
+        a, b = rng.uniform(0.5, 0.8, n), rng.uniform(0.5, 0.8, n)
+        ss = rng.choice(["0-0", "1-0", "0-1", "1-1"], n)
+        gs = rng.choice(core.set_states[:-2], n)
+        out[f"batch/batchMM[{n}]"] = lambda a=a, b=b, ss=ss, gs=gs: core.batchMM(a, b, ss, gs)
+        out[f"batch/batchLiveMM[{n}]"] = lambda a=a, b=b, ss=ss, gs=gs: core.batchLiveMM(a, b, ss, gs)
+        if n <= 100:
+            out[f"batch/liveValues[{n}]"] = lambda a=a, b=b: core.liveValues(a, b)
+    # State-space size: advantage sets of growing length, whole-match chains
+    for cap in (10, 20, 40):
+        template = set_score_template(6, None, cap)
+        out[f"states/advantage_set[{len(template.states)}]"] = \
+            lambda t=template: core.absorb_to(t, "6-4", h1, h2, t1)
+    for name, fmt in (("best_of_3", BEST_OF_3), ("best_of_5", BEST_OF_5)):
+        template = flat_template(fmt)
+        out[f"states/flat_{name}[{len(template.states)}]"] = lambda t=template: core.absorb_to(t, "V1", p1, p2)
+    return out
+
+_warm_cache = LayerCache()
+
+def measure(fn, repeat=5, min_time=0.05):
+    """
+    Best time per call, in seconds, over `repeat` runs of enough calls to last
+    min_time.
+    """
+    fn()
+    number = 1
+    while True:
+        t = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t
+        if elapsed >= min_time or number >= 10_000:
+            break
+        number *= 2 if elapsed > min_time / 4 else 10
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        t = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t) / number)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Layer benchmarks")
+    parser.add_argument("--filter", default="", help="regular expression on the case names")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=1.0, help="allowed slowdown vs baseline (1.0 = twice as slow)")
+    parser.add_argument("--update", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)["results"]
+
+    results, failed = {}, False
+    for name, fn in cases().items():
+        if not re.search(args.filter, name):
+            continue
+        results[name] = elapsed = measure(fn, args.repeat)
+        line = f"{name:<36} {elapsed * 1e6:12.1f} us"
+        if name in baseline and not args.update:
+            ratio = elapsed / baseline[name]
+            ok = ratio <= 1 + args.threshold
+            failed |= not ok
+            line += f"  baseline {baseline[name] * 1e6:12.1f} us  x{ratio:5.2f}" + ("" if ok else "  FAIL")
+        print(line)
+
+    if args.update:
+        with open(BASELINE, "w") as f:
+            json.dump({"machine": {"python": platform.python_version(), "numpy": np.__version__,
+                                   "platform": platform.platform(), "cpus": os.cpu_count()},
+                       "results": {**baseline, **results}}, f, indent=1, sort_keys=True)
+            f.write("\n")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
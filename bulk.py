@@ -0,0 +1,180 @@
+##### Bulk pricing job
+## Streams a CSV or Parquet file of fixtures / live scores through the model in
+## fixed-size chunks and writes the prices as it goes, so memory stays flat
+## whatever the size of the input. Chunks are fanned out over a process pool
+## (each worker compiles the chain templates once, at start-up) with a bounded
+## number of chunks in flight, and written back in input order.
+## Input columns: ppoint_srv1, ppoint_srv2, and optionally setscore, gamescore,
+## pointscore and server (see core.batchLiveMM; an empty server cell takes its
+## default). Output: the input columns followed by phold1, phold2, ptie1,
+## pset_v1, V1, V2 and error. A row that cannot be priced (a probability outside (0, 1), an impossible score...) gets
+## NaN prices and the reason in error, and the job goes on.
+## Usage: python bulk.py fixtures.csv prices.csv [--chunksize 50000] [--processes 4]
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core import batchLiveMM, chain_template
+
+_DEFAULTS = {"setscore": "0-0", "gamescore": "0-0", "pointscore": "0-0", "server": None}
+_PRICES = ("phold1", "phold2", "ptie1", "pset_v1", "V1", "V2")
+
+def _warm():
+    # Worker initializer: compile the templates once per process
+    for level in ("game", "tb", "set", "match"):
+        chain_template(level)
+
+def _rows(scores, idx):
+    return {k: v if v is None or np.ndim(v) == 0 else v[idx] for k, v in scores.items()}
+
+def price_chunk(chunk):
+    """
+    Prices one DataFrame of fixtures and returns it with the price columns and
+    error, empty for the rows that were priced.
+    """
+    if "ppoint_srv1" not in chunk or "ppoint_srv2" not in chunk:
+        raise ValueError("Input must have ppoint_srv1 and ppoint_srv2 columns.")
+    n = len(chunk)
+    p1, p2 = chunk["ppoint_srv1"].to_numpy(dtype=float), chunk["ppoint_srv2"].to_numpy(dtype=float)
+    scores = {k: chunk[k].to_numpy() if k in chunk else v for k, v in _DEFAULTS.items()}
+    prices = {k: np.full(n, np.nan) for k in _PRICES}
+    error = np.full(n, "", dtype=object)
+    valid = (p1 > 0) & (p1 < 1) & (p2 > 0) & (p2 < 1)
+    error[~valid] = "Invalid serve probability provided."
+    for k in ("setscore", "gamescore", "pointscore"):
+        if k in chunk:
+            missing = chunk[k].isna().to_numpy() & valid
+            error[missing] = f"Missing {k}."
+            valid &= ~missing
+    if "server" in chunk:
+        # An empty server cell takes the default, as a missing column does
+        blank = chunk["server"].isna().to_numpy()
+        scores["server"] = np.where(blank, None, chunk["server"].to_numpy(dtype=object))
+
+    ok = np.flatnonzero(valid)
+    try:
+        res = batchLiveMM(p1[ok], p2[ok], **_rows(scores, ok))
+        for k in _PRICES:
+            prices[k][ok] = res[k]
+    except Exception:
+        # One bad row fails the batch: price the rows one by one
+        for i in ok:
+            try:
+                res = batchLiveMM(p1[i], p2[i], **_rows(scores, [i]))
+            except Exception as e:
+                error[i] = str(e) or type(e).__name__
+                continue
+            for k in _PRICES:
+                prices[k][i] = res[k][0]
+    return chunk.assign(**prices, error=error)
+
+def _parquet():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet input or output requires pyarrow (pip install pyarrow).") from e
+    return pa, pq
+
+def read_chunks(path, chunksize):
+    """
+    Yields the input file as DataFrames of at most chunksize rows.
+    """
+    if path.endswith(".parquet"):
+        _, pq = _parquet()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, dtype={"setscore": str, "gamescore": str,
+                                                                 "pointscore": str})
+
+class ChunkWriter:
+    """
+    Appends DataFrames to a CSV or Parquet file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+        self._header = True
+
+    def write(self, df):
+        if self.path.endswith(".parquet"):
+            pa, pq = _parquet()
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def run(source, dest, chunksize=50_000, processes=1, log=None):
+    """
+    Prices every row of source into dest and returns (rows, errors, seconds),
+    errors being the number of rows that could not be priced. With log (a
+    file), reports the running rows per second after each chunk, and the
+    number (from 1) and reason of every failed row.
+    """
+    start = time.perf_counter()
+    rows = errors = 0
+    writer = ChunkWriter(dest)
+
+    def done(chunk):
+        nonlocal rows, errors
+        writer.write(chunk)
+        failed = np.flatnonzero(chunk["error"].to_numpy() != "")
+        if log is not None:
+            for i in failed:
+                print(f"row {rows + i + 1}: {chunk['error'].iat[i]}", file=log, flush=True)
+        rows += len(chunk)
+        errors += len(failed)
+        if log is not None:
+            elapsed = time.perf_counter() - start
+            print(f"{rows:>12,} rows  {rows / elapsed:>10,.0f} rows/s", file=log, flush=True)
+
+    try:
+        if processes == 1:
+            for chunk in read_chunks(source, chunksize):
+                done(price_chunk(chunk))
+        else:
+            # At most two chunks per worker are read ahead of the writer
+            with ProcessPoolExecutor(max_workers=processes, initializer=_warm) as pool:
+                pending = deque()
+                for chunk in read_chunks(source, chunksize):
+                    pending.append(pool.submit(price_chunk, chunk))
+                    if len(pending) >= 2 * processes:
+                        done(pending.popleft().result())
+                while pending:
+                    done(pending.popleft().result())
+    finally:
+        writer.close()
+    return rows, errors, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk match pricing")
+    parser.add_argument("source", help="input .csv or .parquet")
+    parser.add_argument("dest", help="output .csv or .parquet")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args(argv)
+
+    rows, errors, elapsed = run(args.source, args.dest, args.chunksize, args.processes,
+                                log=None if args.quiet else sys.stderr)
+    print(f"Priced {rows:,} rows in {elapsed:.1f} s ({rows / max(elapsed, 1e-9):,.0f} rows/s), "
+          f"{errors:,} rows failed")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
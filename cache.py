@@ -0,0 +1,123 @@
+##### Hierarchical layer cache
+## Each level of the hierarchy is cached on its own inputs only:
+# game      <- ppoint_server
+# tie-break <- (ppoint_srv1, ppoint_srv2)
+# set       <- (phold1, phold2, ptie1)
+# match     <- pset_v1
+## so a new score on the same match only hits the caches, and a move in one
+## player's serve probability leaves the other player's game level cached.
+
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+from core import _match_after_set, absorb, batchMC, game_index, match_index, set_index, set_states, tb_index
+from instrument import emit
+
+class LayerCache:
+    """
+    Bounded LRU cache of the absorption tables of each level, with optional
+    rounding of the probability keys to `decimals` and hit/miss counters.
+    """
+    LEVELS = ("game", "tb", "set", "match")
+
+    def __init__(self, maxsize=4096, decimals=None):
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self._lock = Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._store = {level: OrderedDict() for level in self.LEVELS}
+            self.hits = dict.fromkeys(self.LEVELS, 0)
+            self.misses = dict.fromkeys(self.LEVELS, 0)
+
+    def stats(self):
+        """
+        Hits, misses and current size of each level.
+        """
+        with self._lock:
+            return {level: {"hits": self.hits[level], "misses": self.misses[level],
+                            "size": len(self._store[level])} for level in self.LEVELS}
+
+    def _key(self, *params):
+        if self.decimals is None:
+            return tuple(float(p) for p in params)
+        return tuple(round(float(p), self.decimals) for p in params)
+
+    def _get(self, level, key, compute):
+        store = self._store[level]
+        with self._lock:
+            hit = key in store
+            if hit:
+                store.move_to_end(key)
+                self.hits[level] += 1
+                value = store[key]
+            else:
+                self.misses[level] += 1
+        emit(f"cache.{level}", hit=hit)
+        if hit:
+            return value
+        value = compute(*key)
+        value.setflags(write=False)
+        with self._lock:
+            store[key] = value
+            store.move_to_end(key)
+            while len(store) > self.maxsize:
+                store.popitem(last=False)
+        return value
+
+    def game(self, ppoint_server):
+        """
+        Probability that the server holds, from every game state.
+        """
+        return self._get("game", self._key(ppoint_server),
+                         lambda p: absorb(batchMC("game", p))[0, :, game_index["HOLD"]])
+
+    def tb(self, ppoint_srv1, ppoint_srv2):
+        """
+        Probability that player 1 wins the tie-break, from every tie-break state.
+        """
+        return self._get("tb", self._key(ppoint_srv1, ppoint_srv2),
+                         lambda p1, p2: absorb(batchMC("tb", p1, p2))[0, :, tb_index["SETv1"]])
+
+    def set(self, phold1, phold2, ptie1):
+        """
+        Probability that player 1 wins the set, from every set state.
+        """
+        return self._get("set", self._key(phold1, phold2, ptie1),
+                         lambda h1, h2, t1: absorb(batchMC("set", h1, h2, t1))[0, :, set_index["SETv1"]])
+
+    def match(self, pset_v1):
+        """
+        Probability that player 1 wins the match, from every match state.
+        """
+        return self._get("match", self._key(pset_v1),
+                         lambda p: absorb(batchMC("match", p))[0, :, match_index["V1"]])
+
+    def price(self, ppoint_srv1, ppoint_srv2, setscore="0-0", gamescore="0-0"):
+        """
+        Cached determiMM: probability that player 1 wins the match.
+        """
+        if setscore not in _match_after_set:
+            raise ValueError("Invalid setscore provided.")
+        if gamescore not in set_states[:-2]:
+            raise ValueError("Invalid gamescore provided.")
+        phold1 = self.game(ppoint_srv1)[0]
+        phold2 = self.game(ppoint_srv2)[0]
+        ptie1 = self.tb(ppoint_srv1, ppoint_srv2)[0]
+        pset = self.set(phold1, phold2, ptie1)
+        pmatch = self.match(pset[0])
+        pset_now = pset[set_index[gamescore]]
+        win, lose = (match_index[s] for s in _match_after_set[setscore])
+        return float(pset_now * pmatch[win] + (1 - pset_now) * pmatch[lose])
+
+default_cache = LayerCache()
+
+def cachedMM(ppoint_srv1, ppoint_srv2, setscore="0-0", gamescore="0-0"):
+    """
+    determiMM through the shared default_cache.
+    """
+    return default_cache.price(ppoint_srv1, ppoint_srv2, setscore, gamescore)
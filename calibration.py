@@ -0,0 +1,113 @@
+##### Inverse calibration
+## Backs out (ppoint_srv1, ppoint_srv2) from market-implied probabilities.
+## gradMM prices like core.batchMM and also returns the exact Jacobian with
+## respect to the two serve probabilities, by forward differentiation through
+## the game, tie-break, set and match layers (core.absorb_grad). calibrate
+## runs a damped Newton iteration on N matches at once, dropping each match
+## from the batch as soon as it has converged.
+## Two targets are needed for two unknowns. At the start of a set the set and
+## match prices carry the same information, so pair the match price with a
+## hold price, or fix ppoint_srv1 + ppoint_srv2 with `total`.
+
+import numpy as np
+
+from core import _after_set, _state_index, absorb_grad, chain_template, set_states
+
+TARGETS = ("V1", "V2", "pset_now", "pset_v1", "phold1", "phold2", "ptie1")
+
+def gradMM(ppoint_srv1, ppoint_srv2, setscore="0-0", gamescore="0-0"):
+    """
+    Prices as core.batchMM and returns (values, jacobian): two dicts keyed as
+    batchMM, values of shape (N,) and jacobian of shape (N, 2) holding the
+    derivatives with respect to ppoint_srv1 and ppoint_srv2.
+    """
+    p1, p2 = np.broadcast_arrays(np.atleast_1d(np.asarray(ppoint_srv1, dtype=float)),
+                                 np.atleast_1d(np.asarray(ppoint_srv2, dtype=float)))
+    n = len(p1)
+    rows = np.arange(n)
+    zero = np.zeros(n)
+
+    # Game and tie-break layers, as functions of (p1, p2)
+    v, (d,) = absorb_grad(chain_template("game"), "HOLD", p1)
+    phold1, dphold1 = v[:, 0], np.stack([d[:, 0], zero], axis=1)
+    v, (d,) = absorb_grad(chain_template("game"), "HOLD", p2)
+    phold2, dphold2 = v[:, 0], np.stack([zero, d[:, 0]], axis=1)
+    v, (d1, d2) = absorb_grad(chain_template("tb"), "SETv1", p1, p2)
+    ptie1, dptie1 = v[:, 0], np.stack([d1[:, 0], d2[:, 0]], axis=1)
+
+    # Set layer: chain rule through (phold1, phold2, ptie1)
+    v, (dh1, dh2, dt) = absorb_grad(chain_template("set"), "SETv1", phold1, phold2, ptie1)
+    def set_value(i):
+        return v[rows, i], dh1[rows, i, None] * dphold1 + dh2[rows, i, None] * dphold2 + dt[rows, i, None] * dptie1
+    pset_v1, dpset_v1 = set_value(np.zeros(n, dtype=int))
+    pset_now, dpset_now = set_value(_state_index(set_states, gamescore, n))
+
+    # Match layer, from the set score reached after the current set
+    v, (dm,) = absorb_grad(chain_template("match"), "V1", pset_v1)
+    i_win, i_lose = _after_set(setscore, n)
+    m_win, dm_win = v[rows, i_win], dm[rows, i_win, None] * dpset_v1
+    m_lose, dm_lose = v[rows, i_lose], dm[rows, i_lose, None] * dpset_v1
+    pmatch_v1 = pset_now * m_win + (1 - pset_now) * m_lose
+    dpmatch_v1 = (dpset_now * (m_win - m_lose)[:, None] + pset_now[:, None] * dm_win
+                  + (1 - pset_now)[:, None] * dm_lose)
+
+    values = {"phold1": phold1, "phold2": phold2, "ptie1": ptie1, "pset_v1": pset_v1,
+              "pset_now": pset_now, "V1": pmatch_v1, "V2": 1 - pmatch_v1}
+    jacobian = {"phold1": dphold1, "phold2": dphold2, "ptie1": dptie1, "pset_v1": dpset_v1,
+                "pset_now": dpset_now, "V1": dpmatch_v1, "V2": -dpmatch_v1}
+    return values, jacobian
+
+def calibrate(targets, setscore="0-0", gamescore="0-0", total=None, start=(0.62, 0.62),
+              tol=1e-10, max_iter=30, max_step=0.1, bounds=(0.05, 0.95)):
+    """
+    Solves for the serve probabilities that reproduce the targets, a dict of
+    two market probabilities keyed as batchMM (see TARGETS), or of one when
+    ppoint_srv1 + ppoint_srv2 is fixed by `total`. Targets, scores and total
+    are scalars or arrays of length N.
+    Returns a dict of arrays of length N: ppoint_srv1, ppoint_srv2, converged,
+    iterations, residual (largest absolute pricing error) and singular (the
+    targets do not pin down both probabilities).
+    """
+    keys = list(targets)
+    if any(k not in TARGETS for k in keys) or len(keys) + (total is not None) != 2:
+        raise ValueError("Invalid targets provided: two of " + ", ".join(TARGETS)
+                         + ", or one with total.")
+    arrays = np.broadcast_arrays(*[np.atleast_1d(np.asarray(v, dtype=float)) for v in targets.values()],
+                                 np.atleast_1d(np.asarray(0.0 if total is None else total, dtype=float)),
+                                 np.atleast_1d(np.asarray(setscore)), np.atleast_1d(np.asarray(gamescore)))
+    *goal, total_, setscore, gamescore = arrays
+    goal = np.stack(goal, axis=1)
+    n = len(total_)
+    lo, hi = bounds
+
+    p = np.empty((n, 2))
+    p[:] = start
+    if total is not None:
+        p[:] = total_[:, None] / 2
+    out = {"converged": np.zeros(n, dtype=bool), "iterations": np.zeros(n, dtype=int),
+           "residual": np.full(n, np.inf), "singular": np.zeros(n, dtype=bool)}
+    active = np.arange(n)
+    for it in range(max_iter + 1):
+        values, jacobian = gradMM(p[active, 0], p[active, 1], setscore[active], gamescore[active])
+        F = np.stack([values[k] for k in keys], axis=1) - goal[active]
+        J = np.stack([jacobian[k] for k in keys], axis=1)
+        if total is not None:
+            F = np.column_stack([F, p[active].sum(axis=1) - total_[active]])
+            J = np.concatenate([J, np.ones((len(active), 1, 2))], axis=1)
+        out["residual"][active] = np.abs(F).max(axis=1)
+        out["iterations"][active] = it
+        done = out["residual"][active] < tol
+        out["converged"][active[done]] = True
+        singular = np.abs(np.linalg.det(J)) < 1e-12
+        out["singular"][active[singular & ~done]] = True
+        keep = ~done & ~singular
+        active, F, J = active[keep], F[keep], J[keep]
+        if not active.size or it == max_iter:
+            break
+
+        # Newton step, capped in size and kept inside the bounds
+        step = -np.linalg.solve(J, F[:, :, None])[:, :, 0]
+        scale = np.minimum(1, max_step / np.maximum(np.abs(step).max(axis=1), 1e-300))
+        p[active] = np.clip(p[active] + scale[:, None] * step, lo, hi)
+
+    return {"ppoint_srv1": p[:, 0], "ppoint_srv2": p[:, 1], **out}
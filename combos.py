@@ -0,0 +1,190 @@
+##### Combination pricing
+## Prices combos of legs across many matches (best of 3, as in determiMM).
+## Every leg is an event of the rest of a match: who wins it, the final set
+## score, the winner of a given set, whether a tie-break is played... all of
+## which are read off the sequence of its remaining sets. A set ends in one of
+## four outcomes (either player, with or without a tie-break), so a match has
+## at most 4^3 = 64 paths from any set score (sets after the end are padded
+## and sum out), with probabilities
+#   P(path) = current[o1] * fresh[o2] * fresh[o3]
+## where current is the outcome of the set in progress (from gamescore) and
+## fresh that of a set from 0-0. Both come from one batched solve of the
+## game, tie-break and set chains over all the matches of the combo (the
+## probability of reaching 6-6 is the part of P(set won) that is linear in
+## ptie1). A leg is then a boolean mask over the 64 paths, the legs on one
+## match are and-ed, and matches are independent, or correlated through
+## pairwise correlations of their legs (second-order Bahadur expansion,
+## clipped to the Frechet bounds).
+## Usage:
+##   comboMM([0.64, 0.62], [0.6, 0.63], legs=[(0, "win", 1), (1, "tiebreak", True)])
+
+from functools import lru_cache
+
+import numpy as np
+
+from core import _state_index, absorb_to, chain_template, set_states
+from instrument import timed
+
+# Events a leg can be, with their arguments
+EVENTS = {
+    "win": "player (1 or 2) wins the match",
+    "win_set": "player wins at least one set",
+    "win_straight": "player wins the match without losing a set",
+    "sets": "final set score, as 'sets1-sets2' (e.g. '2-1')",
+    "total_sets": "number of sets played (2 or 3)",
+    "tiebreak": "a tie-break is played in the current set or a later one (True / False)",
+    "set_winner": "set k (1, 2 or 3, not over yet) is won by player",
+    "set_tiebreak": "set k (not over yet) is played and goes / does not go to a tie-break",
+}
+# Set scores a match can be priced from
+_SETSCORES = ("0-0", "0-1", "1-0", "1-1")
+
+@lru_cache(maxsize=None)
+def _path_table():
+    # For every set score and padded path (o1 + 4 o2 + 16 o3, outcome o:
+    # winner 1 + (o & 1), tie-break o >> 1): final sets of each player (4, 64, 2),
+    # and per set 1..3 its winner and tie-break (4, 64, 3), -1 for sets not
+    # played, 0 for sets already over
+    sets = np.zeros((4, 64, 2), dtype=int)
+    winner = np.full((4, 64, 3), -1, dtype=int)
+    tb = np.full((4, 64, 3), -1, dtype=int)
+    for s, score in enumerate(_SETSCORES):
+        for path in range(64):
+            a, b = map(int, score.split("-"))
+            winner[s, path, :a + b] = tb[s, path, :a + b] = 0
+            for o in ((path >> 2 * k) & 3 for k in range(3)):
+                if a == 2 or b == 2:
+                    break
+                winner[s, path, a + b] = 1 + (o & 1)
+                tb[s, path, a + b] = o >> 1
+                a, b = (a + 1, b) if o & 1 == 0 else (a, b + 1)
+            sets[s, path] = a, b
+    for a in (sets, winner, tb):
+        a.setflags(write=False)
+    return sets, winner, tb
+
+def _player(player):
+    if player not in (1, 2):
+        raise ValueError("Invalid player provided.")
+    return player - 1
+
+def _leg_mask(s, event, args):
+    # Paths (64,) of a match at set score index s where the leg holds
+    sets, winner, tb = (a[s] for a in _path_table())
+    if event == "win":
+        return sets[:, _player(*args)] == 2
+    if event == "win_set":
+        return sets[:, _player(*args)] >= 1
+    if event == "win_straight":
+        p = _player(*args)
+        return (sets[:, p] == 2) & (sets[:, 1 - p] == 0)
+    if event == "sets":
+        a, b = map(int, str(args[0]).split("-"))
+        return (sets[:, 0] == a) & (sets[:, 1] == b)
+    if event == "total_sets":
+        return sets.sum(axis=1) == args[0]
+    if event == "tiebreak":
+        return np.any(tb == 1, axis=1) == bool(args[0])
+    if event in ("set_winner", "set_tiebreak"):
+        k, value = args
+        if k not in (1, 2, 3):
+            raise ValueError(f"Invalid set provided: {k}.")
+        if np.all(winner[:, k - 1] == 0):
+            raise ValueError(f"Invalid leg provided: set {k} is already over.")
+        if event == "set_winner":
+            return winner[:, k - 1] == _player(value) + 1
+        return tb[:, k - 1] == int(bool(value))
+    raise ValueError(f"Invalid event provided: {event}.")
+
+def _set_outcomes(win, reach, ptie1):
+    # Probability of the four outcomes of a set, (N, 4), from P(player 1 wins
+    # it) and P(it reaches 6-6)
+    out = np.stack([win - reach * ptie1, 1 - win - reach * (1 - ptie1), reach * ptie1, reach * (1 - ptie1)], axis=1)
+    return np.clip(out, 0, 1)
+
+@timed("combos.match_paths", lambda args, res: {"n": len(res["prob"])})
+def match_paths(ppoint_srv1, ppoint_srv2, setscore="0-0", gamescore="0-0"):
+    """
+    Probabilities of the 64 padded set paths of N matches, from their serve
+    probabilities and score (labels or state indices, as in batchMM). Returns a
+    dict: prob (N, 64) and setscore (N,), the index of the set score in
+    ("0-0", "0-1", "1-0", "1-1").
+    """
+    p1, p2 = np.broadcast_arrays(np.atleast_1d(np.asarray(ppoint_srv1, dtype=float)),
+                                 np.atleast_1d(np.asarray(ppoint_srv2, dtype=float)))
+    n = len(p1)
+    rows = np.arange(n)
+    holds = absorb_to(chain_template("game"), "HOLD", np.concatenate([p1, p2]))[:, 0]
+    phold1, phold2 = holds[:n], holds[n:]
+    ptie1 = absorb_to(chain_template("tb"), "SETv1", p1, p2)[:, 0]
+    # P(player 1 wins the set) from every state with the tie-break at ptie1,
+    # surely won and surely lost, in one solve: the last two differ by P(6-6)
+    win = absorb_to(chain_template("set"), "SETv1", np.tile(phold1, 3), np.tile(phold2, 3),
+                    np.concatenate([ptie1, np.ones(n), np.zeros(n)]))
+    win, reach = win[:n], win[n:2 * n] - win[2 * n:]
+
+    i_game = _state_index(set_states, gamescore, n)
+    current = _set_outcomes(win[rows, i_game], reach[rows, i_game], ptie1)
+    fresh = _set_outcomes(win[:, 0], reach[:, 0], ptie1)
+    prob = current[:, None, None, :] * fresh[:, None, :, None] * fresh[:, :, None, None]
+    return {"prob": prob.reshape(n, 64), "setscore": _state_index(_SETSCORES, setscore, n)}
+
+def _correlated(q, rho):
+    # Joint probability of K events of probabilities q with pairwise
+    # correlations rho (K, K): second-order Bahadur expansion, within the
+    # Frechet bounds
+    independent = np.prod(q)
+    if independent == 0:
+        return 0.0
+    z = np.sqrt((1 - q) / q)
+    adjustment = np.sum(np.triu(rho * np.outer(z, z), k=1))
+    return float(np.clip(independent * (1 + adjustment), max(0.0, q.sum() - (len(q) - 1)), q.min()))
+
+def price_combo(paths, legs, correlation=None):
+    """
+    Prices the combo of legs on matches of match_paths(). A leg is (match,
+    event, *args) with event one of EVENTS, e.g. (3, "win", 1), (0, "sets",
+    "2-1"), (2, "set_winner", 2, 1). correlation, optional, holds the
+    correlations between the legs of different matches, as a matrix over the
+    matches or a dict {(i, j): rho}. Returns a dict: legs (the probability of
+    each leg), matches (the joint probability of the legs of each match, 1
+    where there is none), independent and joint (with correlation).
+    """
+    prob, setscore = paths["prob"], paths["setscore"]
+    n = len(prob)
+    masks = np.empty((len(legs), 64), dtype=bool)
+    on = np.empty(len(legs), dtype=int)
+    for i, (match, event, *args) in enumerate(legs):
+        if not 0 <= match < n:
+            raise ValueError(f"Invalid match provided: {match}.")
+        masks[i], on[i] = _leg_mask(setscore[match], event, args), match
+
+    # Legs of the same match and-ed over its paths
+    together = np.ones((n, 64), dtype=bool)
+    np.logical_and.at(together, on, masks)
+    matches = np.einsum("mp,mp->m", prob, together)
+    used = np.unique(on)
+    q = matches[used]
+    independent = float(np.prod(q))
+    joint = independent
+    if correlation is not None:
+        if isinstance(correlation, dict):
+            rho = np.zeros((n, n))
+            for (i, j), r in correlation.items():
+                rho[i, j] = rho[j, i] = r
+        else:
+            rho = np.asarray(correlation, dtype=float)
+            if rho.shape != (n, n):
+                raise ValueError(f"Expected a correlation matrix of shape {(n, n)}.")
+        joint = _correlated(q, rho[np.ix_(used, used)])
+    return {"legs": np.einsum("lp,lp->l", prob[on], masks), "matches": matches,
+            "independent": independent, "joint": joint}
+
+@timed("combos.comboMM", lambda args, res: {"n": len(res["legs"])})
+def comboMM(ppoint_srv1, ppoint_srv2, legs, setscore="0-0", gamescore="0-0", correlation=None):
+    """
+    Prices a combo of legs on N matches given by their serve probabilities
+    and score (arrays of length N, as in batchMM): match_paths then
+    price_combo.
+    """
+    return price_combo(match_paths(ppoint_srv1, ppoint_srv2, setscore, gamescore), legs, correlation)
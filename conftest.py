@@ -0,0 +1,2 @@
+# The modules live at the top level of the repository: this file puts it on
+# sys.path for the tests under tests/.
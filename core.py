@@ -0,0 +1,1056 @@
+##### Numeric core
+## NumPy-only implementation of the hierarchy, in this order :
+# 0 - State enumerations and the absorbing-chain solver
+# I - Game model
+# II - Tie-break model
+# III - Set model
+# IV - Match model
+# V - Batched and in-play pricing
+## States are integer indices into the tuples below, probabilities are floats
+## or ndarrays. Nothing here holds mutable module-level state, so every function
+## is safe to call from several threads. functions.py wraps this module in the
+## original pandas API. The hot paths report to instrument.py when a sink is on.
+
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+import numpy as np
+
+from instrument import timed
+
+# Sizes reported to the instrumentation sink (see instrument.py)
+def _stack_sizes(args, tMat):
+    return {"n": int(np.prod(tMat.shape[:-2], dtype=int)), "states": tMat.shape[-1]}
+
+def _table_sizes(args, values):
+    return {"n": values.shape[0], "states": values.shape[1]}
+
+def _price_sizes(args, res):
+    return {"n": len(res["V1"])}
+
+################### 0 - Define constants #######################################
+# (a) Standard state for a game
+game_states = ("0-0","0-15","15-0","15-15",
+               "30-0","0-30","40-0","30-15",
+               "15-30","0-40","40-15","15-40",
+               "30-30(DEUCE)","40-30(A-40)","30-40(40-A)",
+               "HOLD" # keeping the game/service (absorbing state)
+               , "BREAK" # breaking the service (absorbing state)
+               )
+
+# (b) Standard state for a tie-break
+tb_states = ("0-0","0-1","1-0","1-1",
+             "2-0","0-2","3-0","2-1",
+             "1-2","0-3","4-0","3-1",
+             "2-2","1-3","0-4","5-0",
+             "4-1", "3-2","2-3","1-4",
+             "0-5","5-1","4-2","3-3",
+             "2-4","1-5","5-2","4-3","3-4",
+             "2-5","5-3","4-4","3-5","5-4",
+             "4-5", "5-5","6-5","5-6",
+             "6-6"
+             ,"SETv1" # absorbing state
+             ,"SETv2" # absorbing state
+             ,"6-0",
+             "6-1","6-2","6-3","6-4","4-6",
+             "3-6","2-6","1-6","0-6","7-7","7-6","6-7")
+
+# (c) Standard state for a set
+set_states = ("0-0","0-1","1-0","1-1",
+              "2-0","0-2","3-0","2-1",
+              "1-2","0-3","4-0","3-1",
+              "2-2","1-3","0-4","5-0",
+              "4-1", "3-2","2-3","1-4",
+              "0-5","5-1","4-2","3-3",
+              "2-4","1-5","5-2","4-3","3-4",
+              "2-5","5-3","4-4","3-5","5-4",
+              "4-5", "5-5","6-5","5-6",
+              "6-6"
+              ,"SETv1" # absorbing state
+              ,"SETv2" # absorbing state
+              )
+
+# (d) Standard state for a match
+match_states = ("0-0","0-1","1-0","1-1","2-0","0-2","2-1","1-2"
+                ,"V1" # absorbing state
+                ,"V2" # absorbing state
+                )
+
+game_index = MappingProxyType({state: i for i, state in enumerate(game_states)})
+tb_index = MappingProxyType({state: i for i, state in enumerate(tb_states)})
+set_index = MappingProxyType({state: i for i, state in enumerate(set_states)})
+match_index = MappingProxyType({state: i for i, state in enumerate(match_states)})
+
+# (e) Exact absorbing-chain solver
+@timed("core.absorb", _stack_sizes)
+def absorb(tMat):
+    """
+    Computes the limit of tMat^n exactly, with the fundamental matrix of the chain.
+    Row i holds the absorption probabilities when starting from state i.
+    tMat can also be a stack of shape (N, S, S) sharing the same absorbing states.
+    """
+    tMat = np.asarray(tMat, dtype=float)
+    diag = np.diagonal(tMat, axis1=-2, axis2=-1).reshape(-1, tMat.shape[-1])[0]
+    absorbing = np.flatnonzero(np.isclose(diag, 1))
+    transient = np.flatnonzero(~np.isclose(diag, 1))
+    # Q: transient -> transient, R: transient -> absorbing, N = (I - Q)^-1
+    tMat_t = np.take(tMat, transient, axis=-2)
+    Q = np.take(tMat_t, transient, axis=-1)
+    R = np.take(tMat_t, absorbing, axis=-1)
+    B = np.linalg.solve(np.eye(len(transient)) - Q, R)
+    tMat_lim = np.zeros_like(tMat)
+    tMat_lim[..., transient[:, None], absorbing] = B
+    tMat_lim[..., absorbing, absorbing] = 1
+    return tMat_lim
+
+################# I - Game model  ##############################################
+# Build the transition matrix for a game
+def game_matrix(ppoint_server):
+    ppoint_ret = 1 - ppoint_server
+    idx = game_index
+    tMat = np.zeros((len(game_states), len(game_states)))
+
+    # Set the correct probabilities (server wins point)
+    tMat[idx["0-0"], idx["15-0"]] = ppoint_server
+    tMat[idx["15-0"], idx["30-0"]] = ppoint_server
+    tMat[idx["0-15"], idx["15-15"]] = ppoint_server
+    tMat[idx["30-0"], idx["40-0"]] = ppoint_server
+    tMat[idx["15-15"], idx["30-15"]] = ppoint_server
+    tMat[idx["0-30"], idx["15-30"]] = ppoint_server
+    tMat[idx["40-0"], idx["HOLD"]] = ppoint_server
+    tMat[idx["30-15"], idx["40-15"]] = ppoint_server
+    tMat[idx["40-15"], idx["HOLD"]] = ppoint_server
+    tMat[idx["40-30(A-40)"], idx["HOLD"]] = ppoint_server
+    tMat[idx["0-40"], idx["15-40"]] = ppoint_server
+    tMat[idx["15-40"], idx["30-40(40-A)"]] = ppoint_server
+    tMat[idx["30-40(40-A)"], idx["30-30(DEUCE)"]] = ppoint_server
+    tMat[idx["15-30"], idx["30-30(DEUCE)"]] = ppoint_server
+    tMat[idx["30-30(DEUCE)"], idx["40-30(A-40)"]] = ppoint_server
+
+    # Set the correct probabilities (returner wins point)
+    tMat[idx["0-0"], idx["0-15"]] = ppoint_ret
+    tMat[idx["15-0"], idx["15-15"]] = ppoint_ret
+    tMat[idx["0-15"], idx["0-30"]] = ppoint_ret
+    tMat[idx["30-0"], idx["30-15"]] = ppoint_ret
+    tMat[idx["15-15"], idx["15-30"]] = ppoint_ret
+    tMat[idx["0-30"], idx["0-40"]] = ppoint_ret
+    tMat[idx["40-0"], idx["40-15"]] = ppoint_ret
+    tMat[idx["30-15"], idx["30-30(DEUCE)"]] = ppoint_ret
+    tMat[idx["40-15"], idx["40-30(A-40)"]] = ppoint_ret
+    tMat[idx["40-30(A-40)"], idx["30-30(DEUCE)"]] = ppoint_ret
+    tMat[idx["0-40"], idx["BREAK"]] = ppoint_ret
+    tMat[idx["15-40"], idx["BREAK"]] = ppoint_ret
+    tMat[idx["30-40(40-A)"], idx["BREAK"]] = ppoint_ret
+    tMat[idx["15-30"], idx["15-40"]] = ppoint_ret
+    tMat[idx["30-30(DEUCE)"], idx["30-40(40-A)"]] = ppoint_ret
+
+    # Stationary (absorbing) states
+    tMat[idx["HOLD"], idx["HOLD"]] = 1
+    tMat[idx["BREAK"], idx["BREAK"]] = 1
+
+    return tMat
+
+################## II - Tie-break model ########################################
+def tb_matrix(ppoint_srv1, ppoint_srv2):
+    # Define the states
+    idx = tb_index
+    tMat = np.zeros((len(tb_states), len(tb_states)))
+
+    # Helper for setting transitions
+    def set_trans(from_state, to_state, prob):
+        tMat[idx[from_state], idx[to_state]] = prob
+
+    # Fill transitions as per R code
+    # Player 1 serving
+    set_trans("0-0","1-0", ppoint_srv1)
+    set_trans("3-0","4-0", ppoint_srv1)
+    set_trans("2-1","3-1", ppoint_srv1)
+    set_trans("1-2","2-2", ppoint_srv1)
+    set_trans("0-3","1-3", ppoint_srv1)
+    set_trans("4-0","5-0", ppoint_srv1)
+    set_trans("3-1","4-1", ppoint_srv1)
+    set_trans("2-2","3-2", ppoint_srv1)
+    set_trans("1-3","2-3", ppoint_srv1)
+    set_trans("0-4","1-4", ppoint_srv1)
+    set_trans("6-1","SETv1", ppoint_srv1)
+    set_trans("5-2","6-2", ppoint_srv1)
+    set_trans("4-3","5-3", ppoint_srv1)
+    set_trans("3-4","4-4", ppoint_srv1)
+    set_trans("2-5","3-5", ppoint_srv1)
+    set_trans("1-6","2-6", ppoint_srv1)
+    set_trans("6-2","SETv1", ppoint_srv1)
+    set_trans("5-3","6-3", ppoint_srv1)
+    set_trans("4-4","5-4", ppoint_srv1)
+    set_trans("3-5","4-5", ppoint_srv1)
+    set_trans("2-6","3-6", ppoint_srv1)
+    set_trans("6-5","SETv1", ppoint_srv1)
+    set_trans("5-6","6-6", ppoint_srv1)
+    set_trans("6-6","7-6", ppoint_srv1)
+
+    set_trans("0-0","0-1", 1-ppoint_srv1)
+    set_trans("3-0","3-1", 1-ppoint_srv1)
+    set_trans("2-1","2-2", 1-ppoint_srv1)
+    set_trans("1-2","1-3", 1-ppoint_srv1)
+    set_trans("0-3","0-4", 1-ppoint_srv1)
+    set_trans("4-0","4-1", 1-ppoint_srv1)
+    set_trans("3-1","3-2", 1-ppoint_srv1)
+    set_trans("2-2","2-3", 1-ppoint_srv1)
+    set_trans("1-3","1-4", 1-ppoint_srv1)
+    set_trans("0-4","0-5", 1-ppoint_srv1)
+    set_trans("6-1","6-2", 1-ppoint_srv1)
+    set_trans("5-2","5-3", 1-ppoint_srv1)
+    set_trans("4-3","4-4", 1-ppoint_srv1)
+    set_trans("3-4","3-5", 1-ppoint_srv1)
+    set_trans("2-5","2-6", 1-ppoint_srv1)
+    set_trans("1-6","SETv2", 1-ppoint_srv1)
+    set_trans("6-2","6-3", 1-ppoint_srv1)
+    set_trans("5-3","5-4", 1-ppoint_srv1)
+    set_trans("4-4","4-5", 1-ppoint_srv1)
+    set_trans("3-5","3-6", 1-ppoint_srv1)
+    set_trans("2-6","SETv2", 1-ppoint_srv1)
+    set_trans("6-5","6-6", 1-ppoint_srv1)
+    set_trans("5-6","SETv2", 1-ppoint_srv1)
+    set_trans("3-4","3-5", 1-ppoint_srv1)
+    set_trans("6-6","6-7", 1-ppoint_srv1)
+
+    # Player 2 serving
+    set_trans("1-0","1-1", ppoint_srv2)
+    set_trans("0-1","0-2", ppoint_srv2)
+    set_trans("2-0","2-1", ppoint_srv2)
+    set_trans("1-1","1-2", ppoint_srv2)
+    set_trans("0-2","0-3", ppoint_srv2)
+    set_trans("5-0","5-1", ppoint_srv2)
+    set_trans("4-1","4-2", ppoint_srv2)
+    set_trans("3-2","3-3", ppoint_srv2)
+    set_trans("2-3","2-4", ppoint_srv2)
+    set_trans("1-4","1-5", ppoint_srv2)
+    set_trans("0-5","0-6", ppoint_srv2)
+    set_trans("6-0","6-1", ppoint_srv2)
+    set_trans("5-1","5-2", ppoint_srv2)
+    set_trans("4-2","5-2", ppoint_srv2)
+    set_trans("3-3","3-4", ppoint_srv2)
+    set_trans("2-4","2-5", ppoint_srv2)
+    set_trans("1-5","1-6", ppoint_srv2)
+    set_trans("0-6","SETv2", ppoint_srv2)
+    set_trans("6-3","6-4", ppoint_srv2)
+    set_trans("5-4","5-5", ppoint_srv2)
+    set_trans("4-5","4-6", ppoint_srv2)
+    set_trans("3-6","SETv2", ppoint_srv2)
+    set_trans("6-4","6-5", ppoint_srv2)
+    set_trans("5-5","5-6", ppoint_srv2)
+    set_trans("4-6","SETv2", ppoint_srv2)
+    set_trans("6-7","SETv2", ppoint_srv2)
+    set_trans("7-6","7-7", ppoint_srv2)
+    set_trans("4-2","4-3", ppoint_srv2)
+    set_trans("7-7","5-6", ppoint_srv2)
+
+    set_trans("1-0","2-0", 1-ppoint_srv2)
+    set_trans("0-1","1-1", 1-ppoint_srv2)
+    set_trans("2-0","3-0", 1-ppoint_srv2)
+    set_trans("1-1","2-1", 1-ppoint_srv2)
+    set_trans("0-2","1-2", 1-ppoint_srv2)
+    set_trans("5-0","6-0", 1-ppoint_srv2)
+    set_trans("4-1","5-1", 1-ppoint_srv2)
+    set_trans("3-2","4-2", 1-ppoint_srv2)
+    set_trans("2-3","3-3", 1-ppoint_srv2)
+    set_trans("1-4","2-4", 1-ppoint_srv2)
+    set_trans("0-5","1-5", 1-ppoint_srv2)
+    set_trans("6-0","SETv1", 1-ppoint_srv2)
+    set_trans("5-1","6-1", 1-ppoint_srv2)
+    set_trans("4-2","5-2", 1-ppoint_srv2)
+    set_trans("3-3","4-3", 1-ppoint_srv2)
+    set_trans("2-4","3-4", 1-ppoint_srv2)
+    set_trans("1-5","2-5", 1-ppoint_srv2)
+    set_trans("0-6","1-6", 1-ppoint_srv2)
+    set_trans("6-3","SETv1", 1-ppoint_srv2)
+    set_trans("5-4","6-4", 1-ppoint_srv2)
+    set_trans("4-5","5-5", 1-ppoint_srv2)
+    set_trans("3-6","4-6", 1-ppoint_srv2)
+    set_trans("6-4","SETv1", 1-ppoint_srv2)
+    set_trans("5-5","6-5", 1-ppoint_srv2)
+    set_trans("4-6","5-6", 1-ppoint_srv2)
+    set_trans("3-6","4-6", 1-ppoint_srv2)
+    set_trans("6-7","7-7", 1-ppoint_srv2)
+    set_trans("7-6","SETv1", 1-ppoint_srv2)
+    set_trans("7-7","6-5", 1-ppoint_srv2)
+
+    # Absorbing states
+    set_trans("SETv1","SETv1", 1)
+    set_trans("SETv2","SETv2", 1)
+
+    return tMat
+
+################## III - Set model #############################################
+def set_matrix(phold1, phold2, ptie1):
+    idx = set_index
+    tMat = np.zeros((len(set_states), len(set_states)))
+
+    def set_trans(from_state, to_state, prob):
+        tMat[idx[from_state], idx[to_state]] = prob
+
+    # Player 1 serving
+    set_trans("0-0","1-0", phold1)
+    set_trans("2-0","3-0", phold1)
+    set_trans("1-1","2-1", phold1)
+    set_trans("0-2","1-2", phold1)
+    set_trans("4-0","5-0", phold1)
+    set_trans("3-1","4-1", phold1)
+    set_trans("2-2","3-2", phold1)
+    set_trans("1-3","2-3", phold1)
+    set_trans("0-4","1-4", phold1)
+    set_trans("5-1","SETv1", phold1)
+    set_trans("4-2","5-2", phold1)
+    set_trans("3-3","4-3", phold1)
+    set_trans("2-4","3-4", phold1)
+    set_trans("1-5","2-5", phold1)
+    set_trans("5-3","SETv1", phold1)
+    set_trans("4-4","5-4", phold1)
+    set_trans("3-5","4-5", phold1)
+    set_trans("5-5","6-5", phold1)
+
+    set_trans("0-0","0-1", 1-phold1)
+    set_trans("2-0","2-1", 1-phold1)
+    set_trans("1-1","1-2", 1-phold1)
+    set_trans("0-2","0-3", 1-phold1)
+    set_trans("4-0","4-1", 1-phold1)
+    set_trans("3-1","3-2", 1-phold1)
+    set_trans("2-2","2-3", 1-phold1)
+    set_trans("1-3","1-4", 1-phold1)
+    set_trans("0-4","0-5", 1-phold1)
+    set_trans("5-1","5-2", 1-phold1)
+    set_trans("4-2","4-3", 1-phold1)
+    set_trans("3-3","3-4", 1-phold1)
+    set_trans("2-4","2-5", 1-phold1)
+    set_trans("1-5","SETv2", 1-phold1)
+    set_trans("5-3","5-4", 1-phold1)
+    set_trans("4-4","4-5", 1-phold1)
+    set_trans("3-5","SETv2", 1-phold1)
+    set_trans("5-5","5-6", 1-phold1)
+
+    # Player 2 serving
+    set_trans("1-0","1-1", phold2)
+    set_trans("0-1","0-2", phold2)
+    set_trans("3-0","3-1", phold2)
+    set_trans("2-1","2-2", phold2)
+    set_trans("1-2","1-3", phold2)
+    set_trans("0-3","0-4", phold2)
+    set_trans("5-0","5-1", phold2)
+    set_trans("4-1","4-2", phold2)
+    set_trans("3-2","3-3", phold2)
+    set_trans("2-3","2-4", phold2)
+    set_trans("1-4","1-5", phold2)
+    set_trans("0-5","SETv2", phold2)
+    set_trans("5-2","5-3", phold2)
+    set_trans("4-3","4-4", phold2)
+    set_trans("3-4","3-5", phold2)
+    set_trans("2-5","SETv2", phold2)
+    set_trans("5-4","5-5", phold2)
+    set_trans("4-5","SETv2", phold2)
+    set_trans("5-6","SETv2", phold2)
+    set_trans("6-5","6-6", phold2)
+
+    set_trans("1-0","2-0", 1-phold2)
+    set_trans("0-1","1-1", 1-phold2)
+    set_trans("3-0","4-0", 1-phold2)
+    set_trans("2-1","3-1", 1-phold2)
+    set_trans("1-2","2-2", 1-phold2)
+    set_trans("0-3","1-3", 1-phold2)
+    set_trans("5-0","SETv1", 1-phold2)
+    set_trans("4-1","5-1", 1-phold2)
+    set_trans("3-2","4-2", 1-phold2)
+    set_trans("2-3","3-3", 1-phold2)
+    set_trans("1-4","2-4", 1-phold2)
+    set_trans("0-5","1-5", 1-phold2)
+    set_trans("5-2","SETv1", 1-phold2)
+    set_trans("4-3","5-3", 1-phold2)
+    set_trans("3-4","4-4", 1-phold2)
+    set_trans("2-5","3-5", 1-phold2)
+    set_trans("5-4","SETv1", 1-phold2)
+    set_trans("4-5","5-5", 1-phold2)
+    set_trans("5-6","6-6", 1-phold2)
+    set_trans("6-5","SETv1", 1-phold2)
+
+    # Absorbing states
+    set_trans("SETv1","SETv1", 1)
+    set_trans("SETv2","SETv2", 1)
+
+    # Tie-break at 6-6
+    set_trans("6-6","SETv1", ptie1)
+    set_trans("6-6","SETv2", 1-ptie1)
+
+    return tMat
+
+################## IV - Match model ############################################
+def match_matrix(pset_v1):
+    pset_v2 = 1 - pset_v1
+    idx = match_index
+    tMat = np.zeros((len(match_states), len(match_states)))
+
+    def set_trans(from_state, to_state, prob):
+        tMat[idx[from_state], idx[to_state]] = prob
+
+    # Set probabilities
+    set_trans("0-0","1-0", pset_v1)
+    set_trans("1-0","2-0", pset_v1)
+    set_trans("0-1","1-1", pset_v1)
+    set_trans("1-1","2-1", pset_v1)
+
+    set_trans("0-0","0-1", pset_v2)
+    set_trans("1-0","1-1", pset_v2)
+    set_trans("0-1","0-2", pset_v2)
+    set_trans("1-1","1-2", pset_v2)
+
+    # Set stationary (absorbing) states
+    set_trans("2-0", "V1", 1)
+    set_trans("2-1", "V1", 1)
+    set_trans("0-2", "V2", 1)
+    set_trans("1-2", "V2", 1)
+    set_trans("V1", "V1", 1)
+    set_trans("V2", "V2", 1)
+
+    return tMat
+
+############# V. Batched and in-play pricing ###################################
+# (a) Compiled chain templates
+# Every transition matrix above is affine in its probabilities (each cell is a
+# constant, p or 1-p). A chain is compiled once into index arrays: cell
+# (rows[e], cols[e]) holds a[e] + b[e] * params[param[e]], so N chains are
+# filled with a single vectorized scatter (param -1 marks constant cells).
+Template = namedtuple("Template", ["states", "rows", "cols", "param", "a", "b", "n_params"])
+
+_BUILDERS = MappingProxyType({"game": (game_matrix, game_states, 1), "tb": (tb_matrix, tb_states, 2),
+                              "set": (set_matrix, set_states, 3), "match": (match_matrix, match_states, 1)})
+
+def _freeze(template):
+    for a in template[1:6]:
+        a.setflags(write=False)
+    return template
+
+@lru_cache(maxsize=None)
+def chain_template(level):
+    """
+    Compiles the chain `level` ("game", "tb", "set" or "match") into a Template,
+    by evaluating its builder once at p = 0 and once per unit vector.
+    """
+    builder, states, n_params = _BUILDERS[level]
+    base = builder(*np.zeros(n_params))
+    deltas = np.stack([builder(*np.eye(n_params)[k]) - base for k in range(n_params)])
+    rows, cols = np.nonzero((base != 0) | np.any(deltas != 0, axis=0))
+    d = deltas[:, rows, cols]
+    if np.any(np.count_nonzero(d, axis=0) > 1):
+        raise ValueError(f"The {level} chain is not affine in a single probability per cell.")
+    param = np.where(np.any(d != 0, axis=0), np.argmax(d != 0, axis=0), -1)
+    b = d[np.maximum(param, 0), np.arange(len(rows))] * (param >= 0)
+    return _freeze(Template(states, rows, cols, param, base[rows, cols], b, n_params))
+
+@lru_cache(maxsize=256)
+def classed_template(level, classes):
+    """
+    Template of the chain `level` whose probabilities depend on the state.
+    classes (a tuple, one int per state of the level) puts every state in one
+    of K classes, and each probability of the level becomes K probabilities,
+    one per class, used on the transitions out of the states of that class.
+    The chain then takes n_params * K probabilities: the K classes of the
+    first probability, then the K classes of the second... Same structure as
+    chain_template(level), so it fills and solves as fast.
+    """
+    base = chain_template(level)
+    classes = np.asarray(classes, dtype=int)
+    if classes.shape != (len(base.states),) or np.any(classes < 0):
+        raise ValueError(f"Expected one class per {level} state.")
+    k = int(classes.max()) + 1
+    param = np.where(base.param >= 0, base.param * k + classes[base.rows], -1)
+    return _freeze(base._replace(param=param, n_params=base.n_params * k))
+
+def _class_params(params, k):
+    # Per-class probabilities, each (K,) or (N, K), as the n_params * K arrays
+    # of classed_template
+    out = []
+    for p in params:
+        p = np.asarray(p, dtype=float)
+        if p.shape[-1:] != (k,):
+            raise ValueError(f"Expected {k} probabilities per class, got shape {p.shape}.")
+        out += list(np.atleast_2d(p).T)
+    return out
+
+def _edge_values(template, params):
+    # Probability of every transition of the N chains, shape (N, E)
+    params = np.broadcast_arrays(*[np.atleast_1d(np.asarray(p, dtype=float)) for p in params])
+    if len(params) != template.n_params:
+        raise ValueError(f"Expected {template.n_params} probabilities, got {len(params)}.")
+    # Constant cells (param -1) read the trailing row of zeros
+    p = np.vstack([*params, np.zeros(len(params[0]))])
+    return (template.a[:, None] + template.b[:, None] * p[template.param]).T
+
+@timed("core.fill", _stack_sizes)
+def fill(template, *params):
+    """
+    Builds the stacked transition matrices, of shape (N, S, S), of N chains
+    sharing the structure of template.
+    """
+    values = _edge_values(template, params)
+    tMat = np.zeros((len(values), len(template.states), len(template.states)))
+    tMat[:, template.rows, template.cols] = values
+    return tMat
+
+def _components(template):
+    # Transient states, transitions (edge, row, col) between them, in positions
+    # of the transient states, and their strongly connected components
+    # (iterative Tarjan), sinks first. Each component comes with its transient
+    # successors outside it and the transitions inside it and out of it.
+    absorbing = (template.rows == template.cols) & (template.param < 0) & np.isclose(template.a, 1)
+    return _components_of(len(template.states), template.rows.tobytes(), template.cols.tobytes(),
+                          absorbing.tobytes())
+
+@lru_cache(maxsize=256)
+def _components_of(n_states, rows, cols, absorbing):
+    # Cached on the structure of the chain, which does not depend on the probabilities
+    rows, cols = np.frombuffer(rows, dtype=int), np.frombuffer(cols, dtype=int)
+    absorbing = set(rows[np.frombuffer(absorbing, dtype=bool)].tolist())
+    transient = [s for s in range(n_states) if s not in absorbing]
+    pos = {s: i for i, s in enumerate(transient)}
+    succ = [[] for _ in transient]
+    edges = [[] for _ in transient]
+    dense = []
+    for e, (r, c) in enumerate(zip(rows.tolist(), cols.tolist())):
+        if r in pos and c in pos:
+            edges[pos[r]].append((e, pos[c]))
+            dense.append((e, pos[r], pos[c]))
+            if r != c:
+                succ[pos[r]].append(pos[c])
+    index, low, on_stack, stack, blocks = [None] * len(succ), [0] * len(succ), [False] * len(succ), [], []
+    counter = 0
+    for root in range(len(succ)):
+        if index[root] is not None:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, i = work.pop()
+            if i == 0:
+                index[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = True
+            for j in range(i, len(succ[v])):
+                w = succ[v][j]
+                if index[w] is None:
+                    work += [(v, j + 1), (w, 0)]
+                    break
+                if on_stack[w]:
+                    low[v] = min(low[v], index[w])
+            else:
+                if low[v] == index[v]:
+                    block = []
+                    while not block or block[-1] != v:
+                        block.append(stack.pop())
+                        on_stack[block[-1]] = False
+                    block = sorted(block)
+                    outside = sorted({w for u in block for w in succ[u]} - set(block))
+                    local = {u: i for i, u in enumerate(block)}
+                    out = {u: i for i, u in enumerate(outside)}
+                    inner = [(e, local[u], local[w]) for u in block for e, w in edges[u] if w in local]
+                    outer = [(e, local[u], out[w]) for u in block for e, w in edges[u] if w in out]
+                    blocks.append((np.array([transient[u] for u in block]), np.array([transient[w] for w in outside], dtype=int),
+                                   np.array(inner, dtype=int).reshape(-1, 3).T, np.array(outer, dtype=int).reshape(-1, 3).T))
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+    structure = (np.array(transient, dtype=int), np.array(dense, dtype=int).reshape(-1, 3).T, blocks)
+    for x in [*structure[:2], *(x for block in blocks for x in block)]:
+        x.setflags(write=False)
+    return structure
+
+# Batches below this many cells of I - Q are solved densely: one LU beats the
+# Python loop over the components
+_DENSE_CELLS = 50_000
+
+def _solve_blocks(values, rhs, structure):
+    # Solves (I - Q) x = rhs on the transient states by back substitution over
+    # the components, from the transition probabilities `values` (N, E): only
+    # the loops (deuce, tie-break) need a small dense solve
+    transient, (e, i, j), blocks = structure
+    n = len(values)
+    x = np.zeros_like(rhs)
+    if n * len(transient) ** 2 <= _DENSE_CELLS:
+        A = np.broadcast_to(np.eye(len(transient)), (n, len(transient), len(transient))).copy()
+        A[:, i, j] -= values[:, e]
+        x[:, transient] = np.linalg.solve(A, rhs[:, transient])
+        return x
+    for block, outside, (ei, ii, ji), (eo, io, jo) in blocks:
+        b = rhs[:, block]
+        if len(eo):
+            R = np.zeros((n, len(block), len(outside)))
+            R[:, io, jo] = values[:, eo]
+            b = b + R @ x[:, outside]
+        if len(ei):
+            A = np.broadcast_to(np.eye(len(block)), (n, len(block), len(block))).copy()
+            A[:, ii, ji] -= values[:, ei]
+            b = np.linalg.solve(A, b)
+        x[:, block] = b
+    return x
+
+def _absorb_to(template, target, values):
+    # absorb_to from the transition probabilities, and the components of the chain
+    n, S = len(values), len(template.states)
+    t = template.states.index(target)
+    structure = _components(template)
+    # Transitions into the target only feed the right-hand side
+    into = np.flatnonzero((template.cols == t) & (template.rows != t))
+    rhs = np.zeros((n, S, 1))
+    rhs[:, template.rows[into], 0] = values[:, into]
+    x = _solve_blocks(values, rhs, structure)[..., 0]
+    x[:, t] = 1
+    return x, structure
+
+@timed("core.absorb_to", _table_sizes)
+def absorb_to(template, target, *params):
+    """
+    Probability of absorption in the state `target`, from every state of the N
+    chains of template: the column `target` of absorb(fill(template, *params)),
+    of shape (N, S), without solving for the other absorbing states or filling
+    the dense matrices.
+    """
+    return _absorb_to(template, target, _edge_values(template, params))[0]
+
+@timed("core.absorb_grad", lambda args, res: _table_sizes(args, res[0]))
+def absorb_grad(template, target, *params, hessian=False):
+    """
+    absorb_to and its derivatives with respect to each probability.
+    Returns (values, grads) of shapes (N, S) and (n_params, N, S), and with
+    hessian=True also the second derivatives, of shape (n_params, n_params, N, S).
+    """
+    edges = _edge_values(template, params)
+    n, S = len(edges), len(template.states)
+    values, structure = _absorb_to(template, target, edges)
+    # v = P v, so on transient states (I - Q) dv = dP v, where dP / dp_k is
+    # constant, and (I - Q) d2v / dp_k dp_l = dP_k dv_l + dP_l dv_k
+    dP = np.zeros((template.n_params, S, S))
+    on = template.param >= 0
+    dP[template.param[on], template.rows[on], template.cols[on]] = template.b[on]
+    grads = np.moveaxis(_solve_blocks(edges, np.einsum("kij,nj->nik", dP, values), structure), 2, 0)
+    if not hessian:
+        return values, grads
+    rhs = np.einsum("kij,lnj->nikl", dP, grads)
+    rhs = (rhs + np.swapaxes(rhs, 2, 3)).reshape(n, S, -1)
+    hessians = np.moveaxis(_solve_blocks(edges, rhs, structure), 2, 0)
+    return values, grads, hessians.reshape(template.n_params, template.n_params, n, S)
+
+def _played(template):
+    # States left by a played step (a point, game or set): transitions of
+    # constant probability, such as 2-0 -> V1 in the match chain, are not steps
+    played = np.zeros(len(template.states), dtype=bool)
+    played[template.rows[template.param >= 0]] = True
+    return played
+
+@timed("core.absorb_steps", lambda args, res: _table_sizes(args, res[0]))
+def absorb_steps(template, *params):
+    """
+    Mean and variance of the number of steps to absorption (points of a game
+    or tie-break, games of a set, sets of a match) from every state of the N
+    chains of template. Returns (mean, var), each of shape (N, S), zero on
+    the absorbing states.
+    """
+    edges = _edge_values(template, params)
+    structure = _components(template)
+    # With c = 1 on the states left by a played step: (I - Q) t = c, and the
+    # second moment solves (I - Q) m = c (2t - 1)
+    c = np.zeros((len(edges), len(template.states), 1))
+    c[:, _played(template)] = 1
+    t = _solve_blocks(edges, c, structure)
+    m = _solve_blocks(edges, c * (2 * t - 1), structure)
+    t, m = t[..., 0], m[..., 0]
+    return t, m - t ** 2
+
+@timed("core.step_distribution", lambda args, res: {"n": res.shape[0], "states": len(args[0].states)})
+def step_distribution(template, *params, start=None, tol=1e-12, max_steps=1000):
+    """
+    Distribution of the number of steps to absorption of the N chains of
+    template: P(k steps) in column k, up to the first K - 1 where every chain
+    has less than tol left to absorb (or max_steps). From every state, of
+    shape (N, S, K), or from start (a state label or index, or one per chain),
+    of shape (N, K). Absorbing states absorb in 0 steps.
+    """
+    edges = _edge_values(template, params)
+    n, S = len(edges), len(template.states)
+    # Steps between the states left by a played step; the others (absorbing,
+    # or only followed by constant transitions) are done
+    live = np.flatnonzero(_played(template))
+    pos = np.full(S, -1)
+    pos[live] = np.arange(len(live))
+    e = np.flatnonzero((pos[template.rows] >= 0) & (pos[template.cols] >= 0))
+    i, j = pos[template.rows[e]], pos[template.cols[e]]
+    values = edges[:, e]
+    if start is None:
+        # Survival from every state: s_k = Q s_{k-1}, with Q applied as the
+        # (N, E) transition products summed into their rows by a one-hot (E, T)
+        mass = np.ones((n, len(live)))
+        into, src = i, j
+    else:
+        # Mass on each state after k steps from the start: m_k = m_{k-1} Q
+        mass = np.zeros((n, len(live)))
+        k = pos[_state_index(template.states, start, n)]
+        mass[np.flatnonzero(k >= 0), k[k >= 0]] = 1
+        into, src = j, i
+    scatter = np.zeros((len(e), len(live)))
+    scatter[np.arange(len(e)), into] = 1
+    # P(T = k) = what was left before step k minus what is left after
+    dist = [np.zeros(mass.shape) if start is None else (k < 0).astype(float)[:, None]]
+    while len(dist) <= max_steps and mass.max(initial=0) >= tol:
+        nxt = (values * mass[:, src]) @ scatter
+        dist.append(mass - nxt if start is None else (mass.sum(axis=1) - nxt.sum(axis=1))[:, None])
+        mass = nxt
+    if start is not None:
+        return np.concatenate(dist, axis=1)
+    out = np.zeros((n, S, len(dist)))
+    out[:, live] = np.stack(dist, axis=2)
+    out[:, pos < 0, 0] = 1
+    return out
+
+def batchMC(level, *params, classes=None):
+    """
+    Builds the stacked transition matrices, of shape (N, S, S), of N chains.
+    With classes (one class per state, see classed_template), each
+    probability is given per class, as an array of shape (K,) or (N, K);
+    classes=range(S) gives every state its own probability.
+    """
+    if classes is None:
+        return fill(chain_template(level), *params)
+    template = classed_template(level, tuple(int(c) for c in classes))
+    return fill(template, *_class_params(params, template.n_params // chain_template(level).n_params))
+
+def _state_index(states, scores, n):
+    # Map an array of score labels (or state indices) to state indices,
+    # looking up each distinct label once
+    scores = np.broadcast_to(np.asarray(scores), (n,))
+    if scores.dtype.kind in "iu":
+        if np.any((scores < 0) | (scores >= len(states))):
+            raise ValueError("Invalid state index provided.")
+        return scores.astype(int)
+    labels, inverse = np.unique(scores, return_inverse=True)
+    idx = {state: i for i, state in enumerate(states)}
+    try:
+        return np.array([idx[label] for label in labels], dtype=int)[inverse]
+    except KeyError as e:
+        raise ValueError(f"Invalid score provided: {e.args[0]}") from None
+
+# (b) Composition of the set and match layers
+# Match state reached after the current set is won / lost by player 1
+_match_after_set = MappingProxyType({"0-0": ("1-0", "0-1"), "1-0": ("2-0", "1-1"),
+                                     "0-1": ("1-1", "0-2"), "1-1": ("2-1", "1-2")})
+_match_next = np.full((len(match_states), 2), -1)
+for _state, _next in _match_after_set.items():
+    _match_next[match_index[_state]] = [match_index[_next[0]], match_index[_next[1]]]
+_match_next.setflags(write=False)
+
+def _after_set(setscore, n):
+    i_set = _state_index(match_states, setscore, n)
+    i_next = _match_next[i_set]
+    if np.any(i_next < 0):
+        raise ValueError("Invalid setscore provided.")
+    return i_next[:, 0], i_next[:, 1]
+
+def predict_match(setscore, gamescore, phold1, phold2, ptie1, pset_v1):
+    """
+    Distribution over match_states at absorption, from a set score and a game
+    score in the current set (labels or state indices).
+    """
+    set_lim = absorb(batchMC("set", phold1, phold2, ptie1)[0])
+    i_game = _state_index(set_states, gamescore, 1)[0]
+    i_win, i_lose = _after_set(setscore, 1)
+    s_match = np.zeros(len(match_states))
+    s_match[i_win[0]] = set_lim[i_game, set_index["SETv1"]]
+    s_match[i_lose[0]] = set_lim[i_game, set_index["SETv2"]]
+    return s_match @ absorb(batchMC("match", pset_v1)[0])
+
+# (c) Batched pricing over arrays of probabilities
+@timed("core.batchMM", _price_sizes)
+def batchMM(ppoint_srv1, ppoint_srv2, setscore="0-0", gamescore="0-0"):
+    """
+    Vectorized determiMM: prices N (ppoint_srv1, ppoint_srv2, setscore, gamescore)
+    tuples in one pass and returns a dict of arrays of length N. Scores are
+    labels or state indices.
+    """
+    ppoint_srv1, ppoint_srv2 = np.broadcast_arrays(np.atleast_1d(np.asarray(ppoint_srv1, dtype=float)),
+                                                   np.atleast_1d(np.asarray(ppoint_srv2, dtype=float)))
+    n = len(ppoint_srv1)
+    rows = np.arange(n)
+
+    phold1 = absorb(batchMC("game", ppoint_srv1))[:, 0, game_index["HOLD"]]
+    phold2 = absorb(batchMC("game", ppoint_srv2))[:, 0, game_index["HOLD"]]
+    ptie1 = absorb(batchMC("tb", ppoint_srv1, ppoint_srv2))[:, 0, tb_index["SETv1"]]
+    set_lim = absorb(batchMC("set", phold1, phold2, ptie1))
+    pset_v1 = set_lim[:, 0, set_index["SETv1"]]
+    match_lim = absorb(batchMC("match", pset_v1))
+
+    # Probability that player 1 wins the current set from gamescore
+    pset_now = set_lim[rows, _state_index(set_states, gamescore, n), set_index["SETv1"]]
+
+    # Combine with the match chain from the set score reached after the current set
+    i_win, i_lose = _after_set(setscore, n)
+    v1 = match_index["V1"]
+    pmatch_v1 = pset_now * match_lim[rows, i_win, v1] + (1 - pset_now) * match_lim[rows, i_lose, v1]
+
+    return {"phold1": phold1, "phold2": phold2, "ptie1": ptie1, "pset_v1": pset_v1,
+            "pset_now": pset_now, "V1": pmatch_v1, "V2": 1 - pmatch_v1}
+
+# (d) In-play pricing from any point score
+# A live state is (setscore, gamescore, pointscore, server): sets and games are
+# "player1-player2", the point score is server-first inside a game (as in
+# game_states) and "player1-player2" inside a tie-break (gamescore "6-6").
+# server (1 or 2) is the player serving the next point. Sets after the
+# current one are priced as in determiMM, with player 1 serving first.
+_tb_point_states = tuple(s for s in tb_states if s not in ("SETv1", "SETv2"))
+_game_point_states = tuple(s for s in game_states if s not in ("HOLD", "BREAK"))
+_points = MappingProxyType({"0": 0, "15": 1, "30": 2, "40": 3, "A": 4, "AD": 4})
+
+def _mirror(state):
+    # Swap the players in a "a-b" label (or in the absorbing labels of a set)
+    if state in ("SETv1", "SETv2"):
+        return "SETv2" if state == "SETv1" else "SETv1"
+    a, b = state.split("-")
+    return f"{b}-{a}"
+
+def _tb_server(pointscore, first_server):
+    # Player 1 serves the first tie-break point, then the serve changes every two points
+    a, b = map(int, pointscore.split("-"))
+    return first_server if ((a + b + 1) // 2) % 2 == 0 else 3 - first_server
+
+def _set_after_game(gamescore, p1_wins):
+    g1, g2 = map(int, gamescore.split("-"))
+    g1, g2 = (g1 + 1, g2) if p1_wins else (g1, g2 + 1)
+    if g1 == 7 or (g1 == 6 and g2 <= 4):
+        return "SETv1"
+    if g2 == 7 or (g2 == 6 and g1 <= 4):
+        return "SETv2"
+    return f"{g1}-{g2}"
+
+def _game_point_label(pointscore):
+    if pointscore in _game_point_states:
+        return pointscore
+    try:
+        a, b = (_points[x.strip().upper()] for x in pointscore.split("-"))
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid pointscore provided: {pointscore}") from None
+    if min(a, b) >= 2 and abs(a - b) <= 1:
+        # 30-30 and 40-40 are the same state, as are 40-30 and A-40
+        return {0: "30-30(DEUCE)", 1: "40-30(A-40)", -1: "30-40(40-A)"}[a - b]
+    label = f"{[0, 15, 30, 40][a]}-{[0, 15, 30, 40][b]}" if max(a, b) <= 3 else None
+    if label not in _game_point_states:
+        raise ValueError(f"Invalid pointscore provided: {pointscore}")
+    return label
+
+def _tb_point_label(pointscore):
+    try:
+        a, b = map(int, pointscore.split("-"))
+    except ValueError:
+        raise ValueError(f"Invalid pointscore provided: {pointscore}") from None
+    # 8-8, 10-10, ... are the same Markov state as 6-6 (serve order included)
+    while min(a, b) >= 7:
+        a, b = a - 2, b - 2
+    if f"{a}-{b}" not in _tb_point_states:
+        raise ValueError(f"Invalid pointscore provided: {pointscore}")
+    return f"{a}-{b}"
+
+def live_state(setscore, gamescore, pointscore="0-0", server=1):
+    """
+    Normalizes a live score into the canonical key of live_states.
+    """
+    if setscore not in _match_after_set or gamescore not in set_states[:-2]:
+        raise ValueError(f"Invalid score provided: {setscore} Sets, {gamescore} Games")
+    if server not in (1, 2):
+        raise ValueError("Invalid server provided.")
+    if gamescore == "6-6":
+        return (setscore, gamescore, _tb_point_label(pointscore), server)
+    return (setscore, gamescore, _game_point_label(pointscore), server)
+
+live_states = tuple((ss, gs, ps, srv)
+                    for ss in _match_after_set
+                    for gs in set_states[:-2]
+                    for ps in (_tb_point_states if gs == "6-6" else _game_point_states)
+                    for srv in (1, 2))
+live_index = MappingProxyType({state: i for i, state in enumerate(live_states)})
+
+@lru_cache(maxsize=None)
+def _live_layout():
+    # Columns of the per-layer value tables, concatenated in liveValues as
+    # [game1 | game2 | tb1 | tb2 | set1 | set2 | match]
+    sizes = [len(game_states), len(game_states), len(tb_states), len(tb_states),
+             len(set_states), len(set_states), len(match_states)]
+    offsets = dict(zip(["game1", "game2", "tb1", "tb2", "set1", "set2", "match"], np.cumsum([0] + sizes)))
+    cols = {k: np.zeros(len(live_states), dtype=int) for k in ["game", "win", "lose", "mwin", "mlose"]}
+    is_tb = np.zeros(len(live_states), dtype=bool)
+    srv1 = np.zeros(len(live_states), dtype=bool)
+    for i, (ss, gs, ps, srv) in enumerate(live_states):
+        g1, g2 = map(int, gs.split("-"))
+        mwin, mlose = _match_after_set[ss]
+        cols["mwin"][i] = offsets["match"] + match_index[mwin]
+        cols["mlose"][i] = offsets["match"] + match_index[mlose]
+        if gs == "6-6":
+            # Whoever served first in the set serves first in the tie-break
+            first = 1 if _tb_server(ps, 1) == srv else 2
+            tb = "tb1" if first == 1 else "tb2"
+            is_tb[i] = True
+            cols["win"][i] = cols["lose"][i] = offsets[tb] + tb_index[ps]
+        else:
+            first = srv if (g1 + g2) % 2 == 0 else 3 - srv
+            st = "set1" if first == 1 else "set2"
+            srv1[i] = srv == 1
+            cols["game"][i] = offsets["game1" if srv == 1 else "game2"] + game_index[ps]
+            cols["win"][i] = offsets[st] + set_index[_set_after_game(gs, True)]
+            cols["lose"][i] = offsets[st] + set_index[_set_after_game(gs, False)]
+    for a in [*cols.values(), is_tb, srv1]:
+        a.setflags(write=False)
+    return cols, is_tb, srv1
+
+def _live_tables(p1, p2):
+    # Per-layer value tables of liveValues, in the order of _live_layout:
+    # [game1, game2, tb1, tb2, set1, set2, match], each of shape (N, S)
+    mirror_tb = [tb_index[_mirror(s)] for s in tb_states]
+    mirror_set = [set_index[_mirror(s)] for s in set_states]
+
+    game1 = absorb_to(chain_template("game"), "HOLD", p1)
+    game2 = absorb_to(chain_template("game"), "HOLD", p2)
+    tb1 = absorb_to(chain_template("tb"), "SETv1", p1, p2)
+    # Tie-break served first by player 2: same chain with the players swapped
+    tb2 = 1 - absorb_to(chain_template("tb"), "SETv1", p2, p1)[:, mirror_tb]
+    set1 = absorb_to(chain_template("set"), "SETv1", game1[:, 0], game2[:, 0], tb1[:, 0])
+    set2 = 1 - absorb_to(chain_template("set"), "SETv1", game2[:, 0], game1[:, 0], 1 - tb2[:, 0])[:, mirror_set]
+    match = absorb_to(chain_template("match"), "V1", set1[:, 0])
+    return [game1, game2, tb1, tb2, set1, set2, match]
+
+def _live_combine(tables, k, rows=slice(None)):
+    # Match-win probability at the live states k (all of them for a slice),
+    # of every chain or of chain rows[i] for state k[i]
+    cols, is_tb, srv1 = _live_layout()
+    def pick(name):
+        return tables[rows, cols[name][k]]
+    hold_now = pick("game")
+    pgame = np.where(srv1[k], hold_now, 1 - hold_now)
+    pset = np.where(is_tb[k], pick("win"), pgame * pick("win") + (1 - pgame) * pick("lose"))
+    return pick("mlose") + pset * (pick("mwin") - pick("mlose"))
+
+@timed("core.liveValues", lambda args, values: {"n": np.atleast_2d(values).shape[0]})
+def liveValues(ppoint_srv1, ppoint_srv2):
+    """
+    Probability that player 1 wins the match from every live state (ordered as
+    live_states). Scalar inputs give an array of shape (K,), arrays of N pairs
+    give (N, K).
+    """
+    scalar = np.ndim(ppoint_srv1) == 0 and np.ndim(ppoint_srv2) == 0
+    p1, p2 = np.broadcast_arrays(np.atleast_1d(np.asarray(ppoint_srv1, dtype=float)),
+                                 np.atleast_1d(np.asarray(ppoint_srv2, dtype=float)))
+    values = _live_combine(np.concatenate(_live_tables(p1, p2), axis=1), slice(None))
+    return values[0] if scalar else values
+
+def _first_server(gamescore, pointscore="0-0"):
+    # Server of the next point when player 1 served first in the set: the
+    # server of the game, or in the tie-break the one the point score gives
+    if gamescore == "6-6":
+        return _tb_server(pointscore, 1)
+    return 1 if sum(map(int, gamescore.split("-"))) % 2 == 0 else 2
+
+@timed("core.batchLiveMM", _price_sizes)
+def batchLiveMM(ppoint_srv1, ppoint_srv2, setscore="0-0", gamescore="0-0", pointscore="0-0", server=None):
+    """
+    Vectorized liveMM: prices N rows, each with its own serve probabilities and
+    live score, without tabulating every live state. server=None (for all rows,
+    or as the entry of a row) has player 1 serve first in the current set, as
+    in batchMM (in a tie-break, the server of the next point then follows from
+    the point score). Returns a dict of arrays of length N: phold1, phold2,
+    ptie1, pset_v1, V1 and V2.
+    """
+    p1, p2 = np.broadcast_arrays(np.atleast_1d(np.asarray(ppoint_srv1, dtype=float)),
+                                 np.atleast_1d(np.asarray(ppoint_srv2, dtype=float)))
+    n = len(p1)
+    scores = [np.broadcast_to(np.asarray(x, dtype=object), (n,)) for x in (setscore, gamescore, pointscore)]
+    server = np.broadcast_to(np.asarray(server, dtype=object), (n,))
+    server = [_first_server(g, ps) if srv is None else srv for srv, g, ps in zip(server, scores[1], scores[2])]
+    # Normalize each distinct score once
+    keys = {}
+    k = np.array([keys[s] if s in keys else keys.setdefault(s, live_index[live_state(*s)])
+                  for s in zip(*scores, server)], dtype=int)
+    tables = _live_tables(p1, p2)
+    V1 = _live_combine(np.concatenate(tables, axis=1), k, np.arange(n))
+    game1, game2, tb1, _, set1 = tables[:5]
+    return {"phold1": game1[:, 0], "phold2": game2[:, 0], "ptie1": tb1[:, 0], "pset_v1": set1[:, 0],
+            "V1": V1, "V2": 1 - V1}
+
+# (e) Sensitivities to the serve probabilities
+# A jet stacks a table and its derivatives with respect to (ppoint_srv1,
+# ppoint_srv2) = (a, b) along a first axis of length 6: [v, a, b, aa, ab, bb].
+def _jmul(x, y):
+    xv, xa, xb, xaa, xab, xbb = x
+    yv, ya, yb, yaa, yab, ybb = y
+    return np.stack([xv * yv, xv * ya + yv * xa, xv * yb + yv * xb,
+                     xv * yaa + yv * xaa + 2 * xa * ya, xv * yab + yv * xab + xa * yb + xb * ya,
+                     xv * ybb + yv * xbb + 2 * xb * yb])
+
+def _jflip(x):
+    # 1 - x
+    out = -x
+    out[0] += 1
+    return out
+
+def _compose(template, target, inner, flip=False):
+    # Jet of a chain whose probabilities are themselves jets (state 0 of the
+    # inner tables), by the chain rule; flip=True takes 1 - the result
+    inner = np.stack([x[:, :, 0] for x in inner], axis=1)  # (6, m, N)
+    values, grads, hessians = absorb_grad(template, target, *inner[0], hessian=True)
+    _, ia, ib, iaa, iab, ibb = inner[:, :, :, None]
+    def second(d1, d2, d12):
+        return np.einsum("mns,mns->ns", grads, d12) + np.einsum("ijns,ins,jns->ns", hessians, d1, d2)
+    jet = np.stack([values, np.einsum("mns,mns->ns", grads, ia), np.einsum("mns,mns->ns", grads, ib),
+                    second(ia, ia, iaa), second(ia, ib, iab), second(ib, ib, ibb)])
+    return _jflip(jet) if flip else jet
+
+@timed("core.liveGreeks", lambda args, res: {"n": np.atleast_2d(res["V1"]).shape[0]})
+def liveGreeks(ppoint_srv1, ppoint_srv2):
+    """
+    liveValues with its exact first and second derivatives with respect to the
+    serve probabilities, at every live state in one pass. Returns a dict of
+    arrays shaped as liveValues: V1, dV1_dp1, dV1_dp2, d2V1_dp1dp1,
+    d2V1_dp1dp2 and d2V1_dp2dp2.
+    """
+    scalar = np.ndim(ppoint_srv1) == 0 and np.ndim(ppoint_srv2) == 0
+    p1, p2 = np.broadcast_arrays(np.atleast_1d(np.asarray(ppoint_srv1, dtype=float)),
+                                 np.atleast_1d(np.asarray(ppoint_srv2, dtype=float)))
+    # The serve probabilities as jets of a single state
+    x1, x2 = np.zeros((2, 6, len(p1), 1))
+    x1[0, :, 0], x1[1] = p1, 1
+    x2[0, :, 0], x2[2] = p2, 1
+    mirror_tb = [tb_index[_mirror(s)] for s in tb_states]
+    mirror_set = [set_index[_mirror(s)] for s in set_states]
+
+    game1 = _compose(chain_template("game"), "HOLD", [x1])
+    game2 = _compose(chain_template("game"), "HOLD", [x2])
+    tb1 = _compose(chain_template("tb"), "SETv1", [x1, x2])
+    tb2 = _compose(chain_template("tb"), "SETv1", [x2, x1], flip=True)[:, :, mirror_tb]
+    set1 = _compose(chain_template("set"), "SETv1", [game1, game2, tb1])
+    set2 = _compose(chain_template("set"), "SETv1", [game2, game1, _jflip(tb2)], flip=True)[:, :, mirror_set]
+    match = _compose(chain_template("match"), "V1", [set1])
+    tables = np.concatenate([game1, game2, tb1, tb2, set1, set2, match], axis=2)
+
+    # Same combination as liveValues, carried through the jets. live_states
+    # repeat the same in-set states under each set score, so the current set is
+    # priced once and crossed with the match layer of the 4 set scores.
+    cols, is_tb, srv1 = _live_layout()
+    k = len(live_states) // len(_match_after_set)
+    win, lose, hold_now = tables[:, :, cols["win"][:k]], tables[:, :, cols["lose"][:k]], tables[:, :, cols["game"][:k]]
+    pgame = np.where(srv1[:k], hold_now, _jflip(hold_now))
+    pset = np.where(is_tb[:k], win, lose + _jmul(pgame, win - lose))
+    mwin, mlose = (tables[:, :, cols[c][::k], None] for c in ("mwin", "mlose"))
+    V = (mlose + _jmul(pset[:, :, None], mwin - mlose)).reshape(6, len(p1), -1)
+
+    out = dict(zip(["V1", "dV1_dp1", "dV1_dp2", "d2V1_dp1dp1", "d2V1_dp1dp2", "d2V1_dp2dp2"], V))
+    return {k: v[0] for k, v in out.items()} if scalar else out
+
+def liveMM(values, setscore, gamescore, pointscore="0-0", server=None):
+    """
+    Probability that player 1 wins the match from a live score, looked up in
+    the values precomputed by liveValues. server=None has player 1 serve first
+    in the current set, as in batchLiveMM.
+    """
+    if server is None:
+        server = _first_server(gamescore, pointscore)
+    return values[..., live_index[live_state(setscore, gamescore, pointscore, server)]]
@@ -0,0 +1,157 @@
+##### Correct-score and total-games distributions
+## The set chain is expanded so that every final score ("6-4", "7-6", ...) is
+## its own absorbing state. The match layer is then a generating-function
+## pass: a set is the polynomial sum_k P(set won with k games) z^k, evaluated
+## on the unit circle (FFT), sets multiply along each path of the match chain,
+## and one inverse FFT gives the exact total-games distribution, from 0-0 or
+## from a live set and game score.
+## lengthMM gives the number of points of a game or tie-break, games of a set
+## and sets of a match (mean, variance and distribution) from the transient
+## structure of the chains (core.absorb_steps, core.step_distribution).
+## Everything is batched over N (ppoint_srv1, ppoint_srv2) pairs.
+
+from functools import lru_cache
+
+import numpy as np
+
+from core import _state_index, absorb, absorb_steps, absorb_to, chain_template, fill, step_distribution
+from formats import _ab, _compile, _win, compile_format
+
+# Advantage sets are unrolled up to this many games each; longer sets are
+# folded into the last scores (their mass is negligible in practice)
+ADVANTAGE_CAP = 40
+
+@lru_cache(maxsize=None)
+def set_score_template(set_games=6, tiebreak_at=6, cap=ADVANTAGE_CAP):
+    """
+    Set served first by player 1 (params: phold1, phold2, ptie1) whose
+    absorbing states are the final scores.
+    """
+    def step(state):
+        a, b = state
+        if tiebreak_at is not None and a == b == tiebreak_at:
+            return [(f"{a + 1}-{b}", 2, 1), (f"{a}-{b + 1}", 2, -1)]
+        srv1 = (a + b) % 2 == 0
+        out = []
+        for (x, y), p1_wins in (((a + 1, b), True), ((a, b + 1), False)):
+            if _win(x, y, set_games) is not None:
+                nxt = f"{x}-{y}"
+            else:
+                nxt = (x - 2, y - 2) if min(x, y) >= cap else (x, y)
+            out.append((nxt, 0, 1 if p1_wins else -1) if srv1 else (nxt, 1, -1 if p1_wins else 1))
+        return out
+    return _compile((0, 0), step, _ab)._replace(n_params=3)
+
+def _final_scores(template):
+    # Transient states come first in a compiled template, then the absorbing
+    # ones (self-loops), here the final scores
+    n_absorbing = np.count_nonzero((template.rows == template.cols) & (template.b == 0))
+    return list(template.states[len(template.states) - n_absorbing:])
+
+def setScores(fmt, ppoint_srv1, ppoint_srv2, final=False, gamescore="0-0"):
+    """
+    Distribution of the final score of a set from gamescore (the final set of
+    fmt if final=True). Returns (labels, probs) with probs of shape
+    (N, len(labels)). A match tie-break counts as a 1-0 set.
+    """
+    T = compile_format(fmt)
+    p1, p2 = np.broadcast_arrays(np.atleast_1d(np.asarray(ppoint_srv1, dtype=float)),
+                                 np.atleast_1d(np.asarray(ppoint_srv2, dtype=float)))
+    if final and fmt.final_set == "match_tiebreak":
+        if gamescore != "0-0":
+            raise ValueError("Invalid gamescore provided.")
+        ptb = absorb(fill(T["final"], p1, p2))[:, 0, T["final"].states.index("SETv1")]
+        return ["1-0", "0-1"], np.stack([ptb, 1 - ptb], axis=1)
+    hold = [absorb(fill(T["game"], p))[:, 0, T["game"].states.index("HOLD")] for p in (p1, p2)]
+    tb = T["final_tb"] if final and fmt.final_set == "long_tiebreak" else T["tb"]
+    ptie1 = absorb(fill(tb, p1, p2))[:, 0, tb.states.index("SETv1")]
+    tiebreak_at = None if final and fmt.final_set == "advantage" else fmt.tiebreak_at
+    template = set_score_template(fmt.set_games, tiebreak_at)
+    labels = _final_scores(template)
+    if gamescore not in template.states or gamescore in labels:
+        raise ValueError("Invalid gamescore provided.")
+    lim = absorb(fill(template, hold[0], hold[1], ptie1))
+    return labels, lim[:, template.states.index(gamescore), [template.states.index(s) for s in labels]]
+
+def matchDistributions(fmt, ppoint_srv1, ppoint_srv2, setscore="0-0", gamescore="0-0"):
+    """
+    Exact distributions of the rest of the match from setscore and gamescore
+    (one score for all the pairs, player 1 serving first in the current set),
+    batched over N pairs:
+    set_scores / final_set_scores: (labels, probs (N, n)) of one set from 0-0,
+    current_set_scores: (labels, probs (N, n)) of the current set,
+    match_scores: (labels, probs (N, n)) in sets ("2-0", "2-1", ...),
+    total_games: probs (N, G), P(k games in the current and later sets) in
+    column k, expected_games: (N,).
+    """
+    W = fmt.sets_to_win
+    try:
+        a0, b0 = map(int, setscore.split("-"))
+    except (AttributeError, ValueError):
+        raise ValueError("Invalid setscore provided.") from None
+    if not (0 <= a0 < W and 0 <= b0 < W):
+        raise ValueError("Invalid setscore provided.")
+    regular = setScores(fmt, ppoint_srv1, ppoint_srv2)
+    final = setScores(fmt, ppoint_srv1, ppoint_srv2, final=True)
+    current = setScores(fmt, ppoint_srv1, ppoint_srv2, final=a0 == b0 == W - 1, gamescore=gamescore)
+    games = [np.array([sum(map(int, s.split("-"))) for s in labels]) for labels, _ in (regular, final, current)]
+    size = int(max(g.max() for g in games)) * (2 * W - 1) + 1
+
+    # Generating functions of one set won / lost by player 1, on the unit circle
+    z = np.exp(-2j * np.pi * np.outer(np.arange(size), np.arange(size // 2 + 1)) / size)
+    def spectra(labels, probs, g):
+        p1_wins = np.array([int(s.split("-")[0]) > int(s.split("-")[1]) for s in labels])
+        return (probs[:, p1_wins] @ z[g[p1_wins]], probs[:, ~p1_wins] @ z[g[~p1_wins]])
+    set_win, set_lose = spectra(*regular, games[0])
+    final_win, final_lose = spectra(*final, games[1])
+    current_win, current_lose = spectra(*current, games[2])
+
+    # Walk the match chain set by set from the current set, multiplying the
+    # generating functions
+    n = regular[1].shape[0]
+    paths = {(a0, b0): np.ones((n, size // 2 + 1), dtype=complex)}
+    ended = {}
+    for played in range(a0 + b0, 2 * W - 1):
+        for (a, b), spec in [(k, v) for k, v in paths.items() if sum(k) == played]:
+            if played == a0 + b0:
+                win, lose = current_win, current_lose
+            else:
+                win, lose = (final_win, final_lose) if a == b == W - 1 else (set_win, set_lose)
+            for nxt, f in (((a + 1, b), win), ((a, b + 1), lose)):
+                target = ended if W in nxt else paths
+                target[nxt] = target.get(nxt, 0) + spec * f
+    labels = sorted(ended, key=lambda s: (-s[0], s[1]))
+    match_probs = np.stack([ended[s][:, 0].real for s in labels], axis=1)
+    total = np.clip(np.fft.irfft(sum(ended.values()), n=size, axis=1), 0, None)
+    return {"set_scores": regular, "final_set_scores": final, "current_set_scores": current,
+            "match_scores": ([_ab(s) for s in labels], match_probs),
+            "total_games": total, "expected_games": total @ np.arange(size)}
+
+def lengthMM(ppoint_srv1, ppoint_srv2, setscore="0-0", gamescore="0-0", pointscore="0-0", tbscore="0-0",
+             tol=1e-12):
+    """
+    Length of each layer from a score, batched over N pairs (scores are
+    labels or state indices of the chains, scalars or arrays of length N):
+    game1 / game2: points of a game served by player 1 / 2 from pointscore,
+    tb: points of the tie-break from tbscore, set: games of the set from
+    gamescore, match: sets of the match from setscore. Each is a dict of mean
+    and var, of shape (N,), and dist, of shape (N, K), P(k left) in column k.
+    """
+    p1, p2 = np.broadcast_arrays(np.atleast_1d(np.asarray(ppoint_srv1, dtype=float)),
+                                 np.atleast_1d(np.asarray(ppoint_srv2, dtype=float)))
+    phold1 = absorb_to(chain_template("game"), "HOLD", p1)[:, 0]
+    phold2 = absorb_to(chain_template("game"), "HOLD", p2)[:, 0]
+    ptie1 = absorb_to(chain_template("tb"), "SETv1", p1, p2)[:, 0]
+    pset_v1 = absorb_to(chain_template("set"), "SETv1", phold1, phold2, ptie1)[:, 0]
+    rows = np.arange(len(p1))
+    out = {}
+    for name, level, params, start in (("game1", "game", (p1,), pointscore), ("game2", "game", (p2,), pointscore),
+                                       ("tb", "tb", (p1, p2), tbscore),
+                                       ("set", "set", (phold1, phold2, ptie1), gamescore),
+                                       ("match", "match", (pset_v1,), setscore)):
+        template = chain_template(level)
+        i = _state_index(template.states, start, len(p1))
+        mean, var = absorb_steps(template, *params)
+        out[name] = {"mean": mean[rows, i], "var": var[rows, i],
+                     "dist": step_distribution(template, *params, start=i, tol=tol)}
+    return out
@@ -0,0 +1,317 @@
+##### Match formats
+## Rule-driven generator of the game, tie-break, set and match chains for any
+## format, compiled once per format into core.Template index arrays:
+# - game: advantage or no-ad (deciding point at deuce)
+# - tie-break: first to n points, win by two
+# - set: first to `set_games`, tie-break at `tiebreak_at`-all or advantage set
+# - match: best of 3 or 5 sets, with a special final set (advantage set,
+#   10-point tie-break at 6-6, or a 10-point match tie-break instead of the set)
+## As in functions.py, player 1 serves first in every set and tie-break.
+
+from collections import deque, namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from core import Template, _freeze, _state_index, absorb_to
+
+MatchFormat = namedtuple("MatchFormat", ["sets_to_win", "set_games", "tiebreak_at", "tiebreak_points",
+                                         "final_set", "final_tiebreak_points", "no_ad"],
+                         defaults=[2, 6, 6, 7, "standard", 10, False])
+MatchFormat.__doc__ = """
+Format spec. tiebreak_at=None plays advantage sets; final_set is "standard",
+"advantage", "long_tiebreak" (final_tiebreak_points tie-break at tiebreak_at-all)
+or "match_tiebreak" (the final set is a final_tiebreak_points tie-break).
+"""
+
+BEST_OF_3 = MatchFormat()
+BEST_OF_5 = MatchFormat(sets_to_win=3)
+GRAND_SLAM = MatchFormat(sets_to_win=3, final_set="long_tiebreak")
+ADVANTAGE_FINAL_SET = MatchFormat(sets_to_win=3, final_set="advantage")
+DOUBLES = MatchFormat(no_ad=True, final_set="match_tiebreak")
+SHORT_SETS = MatchFormat(set_games=4, tiebreak_at=4)
+
+################### 0 - Chain compiler #########################################
+def _compile(start, step, label):
+    """
+    Enumerates the states reachable from start and compiles the chain.
+    step(state) returns [(next_state, param, sign)]: the transition has
+    probability params[param] (sign 1), 1 - params[param] (sign -1) or 1 (param -1).
+    Absorbing states are strings and are placed after the transient ones.
+    """
+    transient, absorbing, edges = [start], [], []
+    seen, queue = {start}, deque([start])
+    while queue:
+        state = queue.popleft()
+        for nxt, param, sign in step(state):
+            edges.append((state, nxt, param, sign))
+            if nxt not in seen:
+                seen.add(nxt)
+                if isinstance(nxt, str):
+                    absorbing.append(nxt)
+                else:
+                    transient.append(nxt)
+                    queue.append(nxt)
+    states = transient + absorbing
+    idx = {state: i for i, state in enumerate(states)}
+    edges += [(s, s, -1, 0) for s in absorbing]
+    rows, cols, param, sign = (np.array(x) for x in zip(*[(idx[a], idx[b], k, sg) for a, b, k, sg in edges]))
+    n_params = int(param.max()) + 1 if len(param) else 0
+    # p -> (a=0, b=1), 1 - p -> (a=1, b=-1), constant -> (a=1, b=0)
+    a = np.where(sign == 1, 0.0, 1.0)
+    b = sign.astype(float)
+    return _freeze(Template(tuple(label(s) for s in states), rows, cols, param, a, b, n_params))
+
+def _win(a, b, target):
+    # Winner of a race to `target`, won by two, or None if still running
+    if a >= target and a - b >= 2:
+        return 1
+    if b >= target and b - a >= 2:
+        return 2
+    return None
+
+def _ab(state):
+    return state if isinstance(state, str) else f"{state[0]}-{state[1]}"
+
+################### I - Game model #############################################
+_game_points = ["0", "15", "30", "40"]
+
+def _game_label(state):
+    if isinstance(state, str):
+        return state
+    a, b = state
+    if a >= 3 and b >= 3:
+        return {0: "40-40", 1: "A-40", -1: "40-A"}[a - b]
+    return f"{_game_points[a]}-{_game_points[b]}"
+
+@lru_cache(maxsize=None)
+def game_template(no_ad=False):
+    """
+    Service game from the server's point of view (param 0: ppoint_server).
+    """
+    def step(state):
+        out = []
+        for (a, b), sign in (((state[0] + 1, state[1]), 1), ((state[0], state[1] + 1), -1)):
+            if no_ad and min(a, b) == 3 and max(a, b) == 4:
+                # Deciding point at deuce
+                nxt = "HOLD" if a > b else "BREAK"
+            else:
+                won = _win(a, b, 4)
+                # 40-40 is 30-30 again, A-40 is 40-30, etc.
+                nxt = {1: "HOLD", 2: "BREAK"}.get(won, (a - 1, b - 1) if min(a, b) >= 4 else (a, b))
+            out.append((nxt, 0, sign))
+        return out
+    return _compile((0, 0), step, _game_label)
+
+################### II - Tie-break model #######################################
+def _tb_step(points):
+    def step(state):
+        a, b = state
+        # Player 1 serves point 0, then the serve changes every two points
+        srv1 = ((a + b + 1) // 2) % 2 == 0
+        out = []
+        for (x, y), p1_wins in (((a + 1, b), True), ((a, b + 1), False)):
+            won = _win(x, y, points)
+            while won is None and min(x, y) >= points:
+                x, y = x - 2, y - 2
+            nxt = {1: "SETv1", 2: "SETv2"}.get(won, (x, y))
+            # params: 0 = ppoint_srv1, 1 = ppoint_srv2
+            out.append((nxt, 0, 1 if p1_wins else -1) if srv1 else (nxt, 1, -1 if p1_wins else 1))
+        return out
+    return step
+
+@lru_cache(maxsize=None)
+def tb_template(points=7):
+    """
+    Tie-break to `points` served first by player 1 (params: ppoint_srv1, ppoint_srv2).
+    """
+    return _compile((0, 0), _tb_step(points), _ab)
+
+################### III - Set model ############################################
+@lru_cache(maxsize=None)
+def set_template(set_games=6, tiebreak_at=6):
+    """
+    Set served first by player 1 (params: phold1, phold2, ptie1). tiebreak_at=None
+    plays an advantage set, and ptie1 is then unused.
+    """
+    def step(state):
+        a, b = state
+        if tiebreak_at is not None and a == b == tiebreak_at:
+            return [("SETv1", 2, 1), ("SETv2", 2, -1)]
+        srv1 = (a + b) % 2 == 0
+        out = []
+        for (x, y), p1_wins in (((a + 1, b), True), ((a, b + 1), False)):
+            won = _win(x, y, set_games)
+            while won is None and tiebreak_at is None and min(x, y) >= set_games:
+                x, y = x - 2, y - 2
+            nxt = {1: "SETv1", 2: "SETv2"}.get(won, (x, y))
+            out.append((nxt, 0, 1 if p1_wins else -1) if srv1 else (nxt, 1, -1 if p1_wins else 1))
+        return out
+    template = _compile((0, 0), step, _ab)
+    # Keep three parameters even when the tie-break is never played
+    return template._replace(n_params=3)
+
+################### IV - Match model ###########################################
+@lru_cache(maxsize=None)
+def match_template(sets_to_win=2):
+    """
+    Match won by the first to `sets_to_win` sets (params: pset_v1, pfinal_v1,
+    the probability that player 1 wins a regular set and the final set).
+    """
+    def step(state):
+        a, b = state
+        k = 1 if a == b == sets_to_win - 1 else 0
+        win = "V1" if a + 1 == sets_to_win else (a + 1, b)
+        lose = "V2" if b + 1 == sets_to_win else (a, b + 1)
+        return [(win, k, 1), (lose, k, -1)]
+    return _compile((0, 0), step, _ab)
+
+################### V - Compiled formats and pricing ###########################
+@lru_cache(maxsize=None)
+def compile_format(fmt):
+    """
+    Templates of every chain of a format, compiled once: "game", "tb", "set",
+    "final" (final set, or final tie-break for "match_tiebreak") and "match".
+    """
+    if fmt.final_set not in ("standard", "advantage", "long_tiebreak", "match_tiebreak"):
+        raise ValueError(f"Invalid final_set provided: {fmt.final_set}")
+    templates = {"game": game_template(fmt.no_ad), "tb": tb_template(fmt.tiebreak_points),
+                 "set": set_template(fmt.set_games, fmt.tiebreak_at), "match": match_template(fmt.sets_to_win)}
+    if fmt.final_set == "standard":
+        templates["final"] = templates["set"]
+    elif fmt.final_set == "advantage":
+        templates["final"] = set_template(fmt.set_games, None)
+    elif fmt.final_set == "long_tiebreak":
+        templates["final"] = set_template(fmt.set_games, fmt.tiebreak_at)
+        templates["final_tb"] = tb_template(fmt.final_tiebreak_points)
+    else:
+        templates["final"] = tb_template(fmt.final_tiebreak_points)
+    return templates
+
+@lru_cache(maxsize=None)
+def _match_next(sets_to_win):
+    # States reached from each match state after player 1 wins / loses a set (-1 if absorbing)
+    states = match_template(sets_to_win).states
+    nxt = np.full((2, len(states)), -1)
+    for i, state in enumerate(states):
+        if state not in ("V1", "V2"):
+            a, b = map(int, state.split("-"))
+            nxt[0, i] = states.index("V1" if a + 1 == sets_to_win else f"{a + 1}-{b}")
+            nxt[1, i] = states.index("V2" if b + 1 == sets_to_win else f"{a}-{b + 1}")
+    nxt.setflags(write=False)
+    return nxt
+
+def _first(template, *params, target="SETv1"):
+    # Absorption probability into `target` from every state, for N chains
+    return absorb_to(template, target, *params)
+
+def formatMM(fmt, ppoint_srv1, ppoint_srv2, setscore="0-0", gamescore="0-0"):
+    """
+    batchMM for any MatchFormat. In a "match_tiebreak" final set, gamescore is
+    the score of the match tie-break.
+    """
+    T = compile_format(fmt)
+    p1, p2 = np.broadcast_arrays(np.atleast_1d(np.asarray(ppoint_srv1, dtype=float)),
+                                 np.atleast_1d(np.asarray(ppoint_srv2, dtype=float)))
+    n = len(p1)
+    rows = np.arange(n)
+
+    phold1 = _first(T["game"], p1, target="HOLD")[:, 0]
+    phold2 = _first(T["game"], p2, target="HOLD")[:, 0]
+    ptie1 = _first(T["tb"], p1, p2)[:, 0]
+    set_v1 = _first(T["set"], phold1, phold2, ptie1)
+    if fmt.final_set == "match_tiebreak":
+        final_v1 = _first(T["final"], p1, p2)
+    elif fmt.final_set == "long_tiebreak":
+        final_v1 = _first(T["final"], phold1, phold2, _first(T["final_tb"], p1, p2)[:, 0])
+    else:
+        final_v1 = _first(T["final"], phold1, phold2, ptie1)
+    match_v1 = _first(T["match"], set_v1[:, 0], final_v1[:, 0], target="V1")
+
+    # Probability that player 1 wins the current set, from the regular or the final set chain
+    i_match = _state_index(T["match"].states, setscore, n)
+    final = np.array([s == f"{fmt.sets_to_win - 1}-{fmt.sets_to_win - 1}" for s in T["match"].states])[i_match]
+    pset_now = np.empty(n)
+    for mask, table, template in ((~final, set_v1, T["set"]), (final, final_v1, T["final"])):
+        if mask.any():
+            i_game = _state_index(template.states, np.broadcast_to(np.asarray(gamescore), (n,))[mask], mask.sum())
+            pset_now[mask] = table[rows[mask], i_game]
+
+    # Match state after the current set is won / lost by player 1
+    i_win, i_lose = _match_next(fmt.sets_to_win)[:, i_match]
+    if np.any(i_win < 0):
+        raise ValueError("Invalid setscore provided.")
+    pmatch_v1 = pset_now * match_v1[rows, i_win] + (1 - pset_now) * match_v1[rows, i_lose]
+
+    return {"phold1": phold1, "phold2": phold2, "ptie1": ptie1, "pset_v1": set_v1[:, 0],
+            "pfinal_v1": final_v1[:, 0], "pset_now": pset_now, "V1": pmatch_v1, "V2": 1 - pmatch_v1}
+
+################### VI - Flattened match chain #################################
+def _set_rules(fmt, s1, s2):
+    # (tie-break games, tie-break points) of the set played at set score s1-s2;
+    # a match tie-break is a tie-break at 0-0 games
+    if s1 == s2 == fmt.sets_to_win - 1:
+        if fmt.final_set == "advantage":
+            return None, None
+        if fmt.final_set == "long_tiebreak":
+            return fmt.tiebreak_at, fmt.final_tiebreak_points
+        if fmt.final_set == "match_tiebreak":
+            return 0, fmt.final_tiebreak_points
+    return fmt.tiebreak_at, fmt.tiebreak_points
+
+def _flat_label(state):
+    if isinstance(state, str):
+        return state
+    s1, s2, g1, g2, a, b = state
+    return f"{s1}-{s2} {g1}-{g2} {a}-{b}"
+
+@lru_cache(maxsize=None)
+def flat_template(fmt=BEST_OF_3):
+    """
+    The whole match as one point-by-point chain (params: ppoint_srv1, ppoint_srv2).
+    States are (sets, games, points) labelled "s1-s2 g1-g2 a-b", points being
+    server-first in a game and player1-player2 in a tie-break. Its size grows
+    quickly with the format, which is what the sparse backend is for.
+    """
+    def after_set(s1, s2, p1_wins):
+        s1, s2 = (s1 + 1, s2) if p1_wins else (s1, s2 + 1)
+        if max(s1, s2) == fmt.sets_to_win:
+            return "V1" if p1_wins else "V2"
+        return (s1, s2, 0, 0, 0, 0)
+
+    def after_game(s1, s2, g1, g2, p1_wins):
+        tb_at, _ = _set_rules(fmt, s1, s2)
+        g1, g2 = (g1 + 1, g2) if p1_wins else (g1, g2 + 1)
+        won = _win(g1, g2, fmt.set_games)
+        while won is None and tb_at is None and min(g1, g2) >= fmt.set_games:
+            g1, g2 = g1 - 2, g2 - 2
+        if won is not None:
+            return after_set(s1, s2, won == 1)
+        return (s1, s2, g1, g2, 0, 0)
+
+    def step(state):
+        s1, s2, g1, g2, a, b = state
+        tb_at, tb_points = _set_rules(fmt, s1, s2)
+        out = []
+        if tb_at is not None and g1 == g2 == tb_at:
+            srv1 = ((a + b + 1) // 2) % 2 == 0
+            for (x, y), p1_wins in (((a + 1, b), True), ((a, b + 1), False)):
+                won = _win(x, y, tb_points)
+                while won is None and min(x, y) >= tb_points:
+                    x, y = x - 2, y - 2
+                nxt = after_set(s1, s2, won == 1) if won is not None else (s1, s2, g1, g2, x, y)
+                out.append((nxt, 0, 1 if p1_wins else -1) if srv1 else (nxt, 1, -1 if p1_wins else 1))
+            return out
+        srv1 = (g1 + g2) % 2 == 0
+        for (x, y), srv_wins in (((a + 1, b), True), ((a, b + 1), False)):
+            if fmt.no_ad and min(x, y) == 3 and max(x, y) == 4:
+                won = 1 if x > y else 2
+            else:
+                won = _win(x, y, 4)
+            if won is not None:
+                nxt = after_game(s1, s2, g1, g2, (won == 1) == srv1)
+            else:
+                nxt = (s1, s2, g1, g2, x - 1, y - 1) if min(x, y) >= 4 else (s1, s2, g1, g2, x, y)
+            out.append((nxt, 0 if srv1 else 1, 1 if srv_wins else -1))
+        return out
+    return _compile((0, 0, 0, 0, 0, 0), step, _flat_label)
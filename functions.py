@@ -4,624 +4,184 @@
 # II - Tie-break model
 # III - Set model
 # IV - Match model
+## The numbers are computed by the NumPy core (core.py); the functions below keep
+## the original pandas API (one-hot DataFrames in, one-row DataFrames out).
+
+from collections import namedtuple
 
-import matplotlib.pyplot as plt
-import networkx as nx
 import numpy as np
 import pandas as pd
-from quantecon import MarkovChain
+
+from core import absorb, batchMC, predict_match
+from core import game_index, game_states, match_states, set_index, set_states, tb_index, tb_states
+from instrument import span, timed
+
+# Chain container returned by the MC* builders: transition matrix and state labels
+MarkovChain = namedtuple("MarkovChain", ["P", "state_values"])
 
 ################### 0 - Define constants #######################################
 # (a) Standard state for a game
-game_states = ["0-0","0-15","15-0","15-15",
-               "30-0","0-30","40-0","30-15",
-               "15-30","0-40","40-15","15-40",
-               "30-30(DEUCE)","40-30(A-40)","30-40(40-A)",
-               "HOLD" # keeping the game/service (absorbing state)
-               , "BREAK" # breaking the service (absorbing state)
-               ]
-s0game = pd.DataFrame(np.zeros((1, len(game_states))), columns=game_states)
+s0game = pd.DataFrame(np.zeros((1, len(game_states))), columns=list(game_states))
 s0game.at[0, "0-0"] = 1 # initializing the Markov chain in the starting state
 
 # (b) Standard state for a tie-break
-tb_states = ["0-0","0-1","1-0","1-1",
-             "2-0","0-2","3-0","2-1",
-             "1-2","0-3","4-0","3-1",
-             "2-2","1-3","0-4","5-0",
-             "4-1", "3-2","2-3","1-4",
-             "0-5","5-1","4-2","3-3",
-             "2-4","1-5","5-2","4-3","3-4",
-             "2-5","5-3","4-4","3-5","5-4",
-             "4-5", "5-5","6-5","5-6",
-             "6-6"
-             ,"SETv1" # absorbing state
-             ,"SETv2" # absorbing state
-             ,"6-0",
-             "6-1","6-2","6-3","6-4","4-6",
-             "3-6","2-6","1-6","0-6","7-7","7-6","6-7"]
-s0tb = pd.DataFrame(np.zeros((1, len(tb_states))), columns=tb_states)
+s0tb = pd.DataFrame(np.zeros((1, len(tb_states))), columns=list(tb_states))
 s0tb.at[0, "0-0"] = 1 # initializing the Markov chain in the starting state
 
 # (c) Standard state for a set
-set_states = ["0-0","0-1","1-0","1-1",
-              "2-0","0-2","3-0","2-1",
-              "1-2","0-3","4-0","3-1",
-              "2-2","1-3","0-4","5-0",
-              "4-1", "3-2","2-3","1-4",
-              "0-5","5-1","4-2","3-3",
-              "2-4","1-5","5-2","4-3","3-4",
-              "2-5","5-3","4-4","3-5","5-4",
-              "4-5", "5-5","6-5","5-6",
-              "6-6"
-              ,"SETv1" # absorbing state
-              ,"SETv2" # absorbing state
-              ]
-s0set = pd.DataFrame(np.zeros((1, len(set_states))), columns=set_states)
+s0set = pd.DataFrame(np.zeros((1, len(set_states))), columns=list(set_states))
 s0set.at[0, "0-0"] = 1 # initializing the Markov chain in the starting state
 
 # (d) Standard state for a match
-match_states = ["0-0","0-1","1-0","1-1","2-0","0-2","2-1","1-2"
-                ,"V1" # absorbing state
-                ,"V2" # absorbing state
-                ]
-s0match = pd.DataFrame(np.zeros((1, len(match_states))), columns=match_states)
+s0match = pd.DataFrame(np.zeros((1, len(match_states))), columns=list(match_states))
+
+# (e) Exact absorbing-chain solver
+def resABSORB(MC):
+    """
+    Absorption probabilities of a chain for every starting state in one call
+    (one row per starting state).
+    """
+    return pd.DataFrame(absorb(MC.P), index=MC.state_values, columns=MC.state_values)
+
+def _limit(tMat, n, method):
+    with span(f"functions.limit.{method}", states=len(tMat)):
+        return _limit_by(tMat, n, method)
+
+def _limit_by(tMat, n, method):
+    if method == "exact":
+        return absorb(tMat)
+    elif method == "power":
+        return np.linalg.matrix_power(tMat, n)
+    elif method == "sparse":
+        # CSR matrices and sparse solves (optional scipy dependency)
+        from sparse import absorb_sparse
+        return absorb_sparse(tMat)
+    raise ValueError("Invalid method provided.")
+
+def _graph(level, tMat, states, graph):
+    # graph=True shows the chain diagram, a path writes it to that image file
+    # (visualization is only imported when needed)
+    with span(f"functions.graph.{level}"):
+        from visualization import CHAIN_STYLES, draw_chain
+        draw_chain(tMat, states, *CHAIN_STYLES[level], path=None if graph is True else graph)
 
 ################# I - Game model  ##############################################
 # (a) Build the transition matrix for a game
-def MCgame2(ppoint_server):
-    ppoint_ret = 1 - ppoint_server
-    STATES = ["0-0","0-15","15-0","15-15",
-              "30-0","0-30","40-0","30-15",
-              "15-30","0-40","40-15","15-40",
-              "30-30(DEUCE)","40-30(A-40)","30-40(40-A)",
-              "HOLD" # absorbing state
-              , "BREAK" # absorbing state
-              ]
-    idx = {state: i for i, state in enumerate(STATES)}
-    tMat = np.zeros((len(STATES), len(STATES)))
-
-    # Set the correct probabilities (server wins point)
-    tMat[idx["0-0"], idx["15-0"]] = ppoint_server
-    tMat[idx["15-0"], idx["30-0"]] = ppoint_server
-    tMat[idx["0-15"], idx["15-15"]] = ppoint_server
-    tMat[idx["30-0"], idx["40-0"]] = ppoint_server
-    tMat[idx["15-15"], idx["30-15"]] = ppoint_server
-    tMat[idx["0-30"], idx["15-30"]] = ppoint_server
-    tMat[idx["40-0"], idx["HOLD"]] = ppoint_server
-    tMat[idx["30-15"], idx["40-15"]] = ppoint_server
-    tMat[idx["40-15"], idx["HOLD"]] = ppoint_server
-    tMat[idx["40-30(A-40)"], idx["HOLD"]] = ppoint_server
-    tMat[idx["0-40"], idx["15-40"]] = ppoint_server
-    tMat[idx["15-40"], idx["30-40(40-A)"]] = ppoint_server
-    tMat[idx["30-40(40-A)"], idx["30-30(DEUCE)"]] = ppoint_server
-    tMat[idx["15-30"], idx["30-30(DEUCE)"]] = ppoint_server
-    tMat[idx["30-30(DEUCE)"], idx["40-30(A-40)"]] = ppoint_server
-
-    # Set the correct probabilities (returner wins point)
-    tMat[idx["0-0"], idx["0-15"]] = ppoint_ret
-    tMat[idx["15-0"], idx["15-15"]] = ppoint_ret
-    tMat[idx["0-15"], idx["0-30"]] = ppoint_ret
-    tMat[idx["30-0"], idx["30-15"]] = ppoint_ret
-    tMat[idx["15-15"], idx["15-30"]] = ppoint_ret
-    tMat[idx["0-30"], idx["0-40"]] = ppoint_ret
-    tMat[idx["40-0"], idx["40-15"]] = ppoint_ret
-    tMat[idx["30-15"], idx["30-30(DEUCE)"]] = ppoint_ret
-    tMat[idx["40-15"], idx["40-30(A-40)"]] = ppoint_ret
-    tMat[idx["40-30(A-40)"], idx["30-30(DEUCE)"]] = ppoint_ret
-    tMat[idx["0-40"], idx["BREAK"]] = ppoint_ret
-    tMat[idx["15-40"], idx["BREAK"]] = ppoint_ret
-    tMat[idx["30-40(40-A)"], idx["BREAK"]] = ppoint_ret
-    tMat[idx["15-30"], idx["15-40"]] = ppoint_ret
-    tMat[idx["30-30(DEUCE)"], idx["30-40(40-A)"]] = ppoint_ret
-
-    # Stationary (absorbing) states
-    tMat[idx["HOLD"], idx["HOLD"]] = 1
-    tMat[idx["BREAK"], idx["BREAK"]] = 1
-
-    # Create the Markov Chain object
-    MC_game2 = MarkovChain(tMat, STATES)
-    return MC_game2
+def MCgame2(ppoint_server, classes=None):
+    # With classes (one per game state, see core.classed_template),
+    # ppoint_server holds one probability per class
+    return MarkovChain(batchMC("game", ppoint_server, classes=classes)[0], list(game_states))
 
 # (b) Compute outcome probabilities for a service game
-def resGAME(ppoint_server, s_game, graph=False):
+@timed("functions.resGAME")
+def resGAME(ppoint_server, s_game, graph=False, method="exact"):
     MC_game1 = MCgame2(ppoint_server)
     # s_game is a 1x17 numpy array or pandas DataFrame (one-hot vector)
-    # To get the distribution after many steps, multiply by the transition matrix raised to a large power
+    # The distribution at absorption is s_game times the limit of the transition matrix powers,
+    # solved exactly ("exact", or "sparse" with CSR matrices) or approximated by a large power ("power")
     tMat = MC_game1.P
     s_game = np.array(s_game).reshape(1, -1)
-    # Matrix power
-    tMat_n = np.linalg.matrix_power(tMat, 10000)
-    resGAME = np.dot(s_game, tMat_n)
-    # Optionally, show the chain graph
+    tMat_n = _limit(tMat, 10000, method)
+    resGAME = s_game @ tMat_n
+    # Optionally, show the chain graph, or write it to the file graph names
     if graph:
-        # Build directed graph from transition matrix
-        G = nx.DiGraph()
-        states = MC_game1.state_values
-        for i, from_state in enumerate(states):
-            for j, to_state in enumerate(states):
-                prob = tMat[i, j]
-                if prob > 0:
-                    G.add_edge(from_state, to_state, weight=prob, label=f"{prob:.2f}")
-
-        pos = nx.spring_layout(G, seed=42)  # or use nx.circular_layout(G)
-        edge_labels = nx.get_edge_attributes(G, 'label')
-        plt.figure(figsize=(12, 5))
-        nx.draw(G, pos, with_labels=True, node_size=1500, node_color='lightblue', arrows=True)
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='red')
-        plt.title("Markov Chain: Tennis Game States")
-        plt.axis('off')
-        plt.show()
-    return pd.DataFrame(resGAME, columns=MC_game1.state_values)
+        _graph("game", tMat, MC_game1.state_values, graph)
+    with span("functions.frame.game"):
+        return pd.DataFrame(resGAME, columns=MC_game1.state_values)
 
 ################## II - Tie-break model ########################################
-def MCtb2(ppoint_srv1, ppoint_srv2):
-    # Define the states
-    STATES = [
-        "0-0","0-1","1-0","1-1",
-        "2-0","0-2","3-0","2-1",
-        "1-2","0-3","4-0","3-1",
-        "2-2","1-3","0-4","5-0",
-        "4-1", "3-2","2-3","1-4",
-        "0-5","5-1","4-2","3-3",
-        "2-4","1-5","5-2","4-3","3-4",
-        "2-5","5-3","4-4","3-5","5-4",
-        "4-5", "5-5","6-5","5-6",
-        "6-6"
-        ,"SETv1" # absorbing state
-        ,"SETv2" # absorbing state
-        ,"6-0",
-        "6-1","6-2","6-3","6-4","4-6",
-        "3-6","2-6","1-6","0-6","7-7","7-6","6-7"
-    ]
-    idx = {state: i for i, state in enumerate(STATES)}
-    tMat = np.zeros((len(STATES), len(STATES)))
-
-    # Helper for setting transitions
-    def set_trans(from_state, to_state, prob):
-        tMat[idx[from_state], idx[to_state]] = prob
+def MCtb2(ppoint_srv1, ppoint_srv2, classes=None):
+    return MarkovChain(batchMC("tb", ppoint_srv1, ppoint_srv2, classes=classes)[0], list(tb_states))
 
-    # Fill transitions as per R code
-    # Player 1 serving
-    set_trans("0-0","1-0", ppoint_srv1)
-    set_trans("3-0","4-0", ppoint_srv1)
-    set_trans("2-1","3-1", ppoint_srv1)
-    set_trans("1-2","2-2", ppoint_srv1)
-    set_trans("0-3","1-3", ppoint_srv1)
-    set_trans("4-0","5-0", ppoint_srv1)
-    set_trans("3-1","4-1", ppoint_srv1)
-    set_trans("2-2","3-2", ppoint_srv1)
-    set_trans("1-3","2-3", ppoint_srv1)
-    set_trans("0-4","1-4", ppoint_srv1)
-    set_trans("6-1","SETv1", ppoint_srv1)
-    set_trans("5-2","6-2", ppoint_srv1)
-    set_trans("4-3","5-3", ppoint_srv1)
-    set_trans("3-4","4-4", ppoint_srv1)
-    set_trans("2-5","3-5", ppoint_srv1)
-    set_trans("1-6","2-6", ppoint_srv1)
-    set_trans("6-2","SETv1", ppoint_srv1)
-    set_trans("5-3","6-3", ppoint_srv1)
-    set_trans("4-4","5-4", ppoint_srv1)
-    set_trans("3-5","4-5", ppoint_srv1)
-    set_trans("2-6","3-6", ppoint_srv1)
-    set_trans("6-5","SETv1", ppoint_srv1)
-    set_trans("5-6","6-6", ppoint_srv1)
-    set_trans("6-6","7-6", ppoint_srv1)
-
-    set_trans("0-0","0-1", 1-ppoint_srv1)
-    set_trans("3-0","3-1", 1-ppoint_srv1)
-    set_trans("2-1","2-2", 1-ppoint_srv1)
-    set_trans("1-2","1-3", 1-ppoint_srv1)
-    set_trans("0-3","0-4", 1-ppoint_srv1)
-    set_trans("4-0","4-1", 1-ppoint_srv1)
-    set_trans("3-1","3-2", 1-ppoint_srv1)
-    set_trans("2-2","2-3", 1-ppoint_srv1)
-    set_trans("1-3","1-4", 1-ppoint_srv1)
-    set_trans("0-4","0-5", 1-ppoint_srv1)
-    set_trans("6-1","6-2", 1-ppoint_srv1)
-    set_trans("5-2","5-3", 1-ppoint_srv1)
-    set_trans("4-3","4-4", 1-ppoint_srv1)
-    set_trans("3-4","3-5", 1-ppoint_srv1)
-    set_trans("2-5","2-6", 1-ppoint_srv1)
-    set_trans("1-6","SETv2", 1-ppoint_srv1)
-    set_trans("6-2","6-3", 1-ppoint_srv1)
-    set_trans("5-3","5-4", 1-ppoint_srv1)
-    set_trans("4-4","4-5", 1-ppoint_srv1)
-    set_trans("3-5","3-6", 1-ppoint_srv1)
-    set_trans("2-6","SETv2", 1-ppoint_srv1)
-    set_trans("6-5","6-6", 1-ppoint_srv1)
-    set_trans("5-6","SETv2", 1-ppoint_srv1)
-    set_trans("3-4","3-5", 1-ppoint_srv1)
-    set_trans("6-6","6-7", 1-ppoint_srv1)
-
-    # Player 2 serving
-    set_trans("1-0","1-1", ppoint_srv2)
-    set_trans("0-1","0-2", ppoint_srv2)
-    set_trans("2-0","2-1", ppoint_srv2)
-    set_trans("1-1","1-2", ppoint_srv2)
-    set_trans("0-2","0-3", ppoint_srv2)
-    set_trans("0-3","0-4", ppoint_srv2)
-    set_trans("5-0","5-1", ppoint_srv2)
-    set_trans("4-1","4-2", ppoint_srv2)
-    set_trans("3-2","3-3", ppoint_srv2)
-    set_trans("2-3","2-4", ppoint_srv2)
-    set_trans("1-4","1-5", ppoint_srv2)
-    set_trans("0-5","0-6", ppoint_srv2)
-    set_trans("6-0","6-1", ppoint_srv2)
-    set_trans("5-1","5-2", ppoint_srv2)
-    set_trans("4-2","5-2", ppoint_srv2)
-    set_trans("3-3","3-4", ppoint_srv2)
-    set_trans("2-4","2-5", ppoint_srv2)
-    set_trans("1-5","1-6", ppoint_srv2)
-    set_trans("0-6","SETv2", ppoint_srv2)
-    set_trans("6-3","6-4", ppoint_srv2)
-    set_trans("5-4","5-5", ppoint_srv2)
-    set_trans("4-5","4-6", ppoint_srv2)
-    set_trans("3-6","SETv2", ppoint_srv2)
-    set_trans("6-4","6-5", ppoint_srv2)
-    set_trans("5-5","5-6", ppoint_srv2)
-    set_trans("4-6","SETv2", ppoint_srv2)
-    set_trans("6-7","SETv2", ppoint_srv2)
-    set_trans("7-6","7-7", ppoint_srv2)
-    set_trans("4-2","4-3", ppoint_srv2)
-    set_trans("7-7","5-6", ppoint_srv2)
-
-    set_trans("1-0","2-0", 1-ppoint_srv2)
-    set_trans("0-1","1-1", 1-ppoint_srv2)
-    set_trans("2-0","3-0", 1-ppoint_srv2)
-    set_trans("1-1","2-1", 1-ppoint_srv2)
-    set_trans("0-2","1-2", 1-ppoint_srv2)
-    set_trans("0-3","1-3", 1-ppoint_srv2)
-    set_trans("5-0","6-0", 1-ppoint_srv2)
-    set_trans("4-1","5-1", 1-ppoint_srv2)
-    set_trans("3-2","4-2", 1-ppoint_srv2)
-    set_trans("2-3","3-3", 1-ppoint_srv2)
-    set_trans("1-4","2-4", 1-ppoint_srv2)
-    set_trans("0-5","1-5", 1-ppoint_srv2)
-    set_trans("6-0","SETv1", 1-ppoint_srv2)
-    set_trans("5-1","6-1", 1-ppoint_srv2)
-    set_trans("4-2","5-2", 1-ppoint_srv2)
-    set_trans("3-3","4-3", 1-ppoint_srv2)
-    set_trans("2-4","3-4", 1-ppoint_srv2)
-    set_trans("1-5","2-5", 1-ppoint_srv2)
-    set_trans("0-6","1-6", 1-ppoint_srv2)
-    set_trans("6-3","SETv1", 1-ppoint_srv2)
-    set_trans("5-4","6-4", 1-ppoint_srv2)
-    set_trans("4-5","5-5", 1-ppoint_srv2)
-    set_trans("3-6","4-6", 1-ppoint_srv2)
-    set_trans("6-4","SETv1", 1-ppoint_srv2)
-    set_trans("5-5","6-5", 1-ppoint_srv2)
-    set_trans("4-6","5-6", 1-ppoint_srv2)
-    set_trans("3-6","4-6", 1-ppoint_srv2)
-    set_trans("6-7","7-7", 1-ppoint_srv2)
-    set_trans("7-6","SETv1", 1-ppoint_srv2)
-    set_trans("7-7","6-5", 1-ppoint_srv2)
-
-    # Absorbing states
-    set_trans("SETv1","SETv1", 1)
-    set_trans("SETv2","SETv2", 1)
-
-    MC_tb = MarkovChain(tMat, STATES)
-    return MC_tb
-
-def resTIE(ppoint_srv1, ppoint_srv2, s_tb, graph=False):
+@timed("functions.resTIE")
+def resTIE(ppoint_srv1, ppoint_srv2, s_tb, graph=False, method="exact"):
     MC_tb = MCtb2(ppoint_srv1, ppoint_srv2)
     tMat = MC_tb.P
     s_tb = np.array(s_tb).reshape(1, -1)
-    tMat_n = np.linalg.matrix_power(tMat, 1000)
-    resTIE = np.dot(s_tb, tMat_n)
+    tMat_n = _limit(tMat, 1000, method)
+    resTIE = s_tb @ tMat_n
     if graph:
-        # Build directed graph from transition matrix
-        G = nx.DiGraph()
-        states = MC_tb.state_values
-        for i, from_state in enumerate(states):
-            for j, to_state in enumerate(states):
-                prob = tMat[i, j]
-                if prob > 0:
-                    G.add_edge(from_state, to_state, weight=prob, label=f"{prob:.2f}")
-
-        # Layout and draw
-        plt.figure(figsize=(18, 12))
-        pos = nx.spring_layout(G, seed=42)
-        nx.draw(G, pos, with_labels=True, node_size=1500, node_color='lightgreen', arrows=True)
-        edge_labels = nx.get_edge_attributes(G, 'label')
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='red')
-        plt.title("Markov Chain: Tie-break States")
-        plt.axis('off')
-        plt.show()
-    return pd.DataFrame(resTIE, columns=MC_tb.state_values)
+        _graph("tb", tMat, MC_tb.state_values, graph)
+    with span("functions.frame.tb"):
+        return pd.DataFrame(resTIE, columns=MC_tb.state_values)
 
 ################## III - Set model #############################################
 def MCset(phold1, phold2, ptie1):
-    STATES = [
-        "0-0","0-1","1-0","1-1",
-        "2-0","0-2","3-0","2-1",
-        "1-2","0-3","4-0","3-1",
-        "2-2","1-3","0-4","5-0",
-        "4-1", "3-2","2-3","1-4",
-        "0-5","5-1","4-2","3-3",
-        "2-4","1-5","5-2","4-3","3-4",
-        "2-5","5-3","4-4","3-5","5-4",
-        "4-5", "5-5","6-5","5-6",
-        "6-6"
-        ,"SETv1" # absorbing state
-        ,"SETv2" # absorbing state
-    ]
-    idx = {state: i for i, state in enumerate(STATES)}
-    tMat = np.zeros((len(STATES), len(STATES)))
-
-    def set_trans(from_state, to_state, prob):
-        tMat[idx[from_state], idx[to_state]] = prob
-
-    # Player 1 serving
-    set_trans("0-0","1-0", phold1)
-    set_trans("2-0","3-0", phold1)
-    set_trans("1-1","2-1", phold1)
-    set_trans("0-2","1-2", phold1)
-    set_trans("4-0","5-0", phold1)
-    set_trans("3-1","4-1", phold1)
-    set_trans("2-2","3-2", phold1)
-    set_trans("1-3","2-3", phold1)
-    set_trans("0-4","1-4", phold1)
-    set_trans("5-1","SETv1", phold1)
-    set_trans("4-2","5-2", phold1)
-    set_trans("3-3","4-3", phold1)
-    set_trans("2-4","3-4", phold1)
-    set_trans("1-5","2-5", phold1)
-    set_trans("5-3","SETv1", phold1)
-    set_trans("4-4","5-4", phold1)
-    set_trans("3-5","4-5", phold1)
-    set_trans("5-5","6-5", phold1)
-
-    set_trans("0-0","0-1", 1-phold1)
-    set_trans("2-0","2-1", 1-phold1)
-    set_trans("1-1","1-2", 1-phold1)
-    set_trans("0-2","0-3", 1-phold1)
-    set_trans("4-0","4-1", 1-phold1)
-    set_trans("3-1","3-2", 1-phold1)
-    set_trans("2-2","2-3", 1-phold1)
-    set_trans("1-3","1-4", 1-phold1)
-    set_trans("0-4","0-5", 1-phold1)
-    set_trans("5-1","5-2", 1-phold1)
-    set_trans("4-2","4-3", 1-phold1)
-    set_trans("3-3","3-4", 1-phold1)
-    set_trans("2-4","2-5", 1-phold1)
-    set_trans("1-5","SETv2", 1-phold1)
-    set_trans("5-3","5-4", 1-phold1)
-    set_trans("4-4","4-5", 1-phold1)
-    set_trans("3-5","SETv2", 1-phold1)
-    set_trans("5-5","5-6", 1-phold1)
-
-    # Player 2 serving
-    set_trans("1-0","1-1", phold2)
-    set_trans("0-1","0-2", phold2)
-    set_trans("3-0","3-1", phold2)
-    set_trans("2-1","2-2", phold2)
-    set_trans("1-2","1-3", phold2)
-    set_trans("0-3","0-4", phold2)
-    set_trans("5-0","5-1", phold2)
-    set_trans("4-1","4-2", phold2)
-    set_trans("3-2","3-3", phold2)
-    set_trans("2-3","2-4", phold2)
-    set_trans("1-4","1-5", phold2)
-    set_trans("0-5","SETv2", phold2)
-    set_trans("5-2","5-3", phold2)
-    set_trans("4-3","4-4", phold2)
-    set_trans("3-4","3-5", phold2)
-    set_trans("2-5","SETv2", phold2)
-    set_trans("5-4","5-5", phold2)
-    set_trans("4-5","SETv2", phold2)
-    set_trans("5-6","SETv2", phold2)
-    set_trans("6-5","6-6", phold2)
-
-    set_trans("1-0","2-0", 1-phold2)
-    set_trans("0-1","1-1", 1-phold2)
-    set_trans("3-0","4-0", 1-phold2)
-    set_trans("2-1","3-1", 1-phold2)
-    set_trans("1-2","2-2", 1-phold2)
-    set_trans("0-3","1-3", 1-phold2)
-    set_trans("5-0","SETv1", 1-phold2)
-    set_trans("4-1","5-1", 1-phold2)
-    set_trans("3-2","4-2", 1-phold2)
-    set_trans("2-3","3-3", 1-phold2)
-    set_trans("1-4","2-4", 1-phold2)
-    set_trans("0-5","1-5", 1-phold2)
-    set_trans("5-2","SETv1", 1-phold2)
-    set_trans("4-3","5-3", 1-phold2)
-    set_trans("3-4","4-4", 1-phold2)
-    set_trans("2-5","3-5", 1-phold2)
-    set_trans("5-4","SETv1", 1-phold2)
-    set_trans("4-5","5-5", 1-phold2)
-    set_trans("5-6","6-6", 1-phold2)
-    set_trans("6-5","SETv1", 1-phold2)
+    return MarkovChain(batchMC("set", phold1, phold2, ptie1)[0], list(set_states))
 
-    # Absorbing states
-    set_trans("SETv1","SETv1", 1)
-    set_trans("SETv2","SETv2", 1)
-
-    # Tie-break at 6-6
-    set_trans("6-6","SETv1", ptie1)
-    set_trans("6-6","SETv2", 1-ptie1)
-
-    MC_set = MarkovChain(tMat, STATES)
-    return MC_set
-
-def resSET(phold1, phold2, ptie1, s_set, graph=False):
+@timed("functions.resSET")
+def resSET(phold1, phold2, ptie1, s_set, graph=False, method="exact"):
     MC_set = MCset(phold1, phold2, ptie1)
     tMat = MC_set.P
     s_set = np.array(s_set).reshape(1, -1)
-    tMat_n = np.linalg.matrix_power(tMat, 100)
-    resSET = np.dot(s_set, tMat_n)
+    tMat_n = _limit(tMat, 100, method)
+    resSET = s_set @ tMat_n
     if graph:
-        # Build directed graph from transition matrix
-        G = nx.DiGraph()
-        states = MC_set.state_values
-        for i, from_state in enumerate(states):
-            for j, to_state in enumerate(states):
-                prob = tMat[i, j]
-                if prob > 0:
-                    G.add_edge(from_state, to_state, weight=prob, label=f"{prob:.2f}")
-
-        plt.figure(figsize=(18, 12))
-        pos = nx.spring_layout(G, seed=42)
-        nx.draw(G, pos, with_labels=True, node_size=1500, node_color='lightyellow', arrows=True)
-        edge_labels = nx.get_edge_attributes(G, 'label')
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='blue')
-        plt.title("Markov Chain: Set States")
-        plt.axis('off')
-        plt.show()
-    return pd.DataFrame(resSET, columns=MC_set.state_values)
+        _graph("set", tMat, MC_set.state_values, graph)
+    with span("functions.frame.set"):
+        return pd.DataFrame(resSET, columns=MC_set.state_values)
 
 ################## IV - Match model ############################################
 def MCmatch(pset_v1):
-    pset_v2 = 1 - pset_v1
-    STATES = ["0-0","0-1","1-0","1-1","2-0","0-2","2-1","1-2"
-              ,"V1" # absorbing state
-              ,"V2" # absorbing state
-              ]
-    idx = {state: i for i, state in enumerate(STATES)}
-    tMat = np.zeros((10, 10))
-
-    def set_trans(from_state, to_state, prob):
-        tMat[idx[from_state], idx[to_state]] = prob
-
-    # Set probabilities
-    set_trans("0-0","1-0", pset_v1)
-    set_trans("1-0","2-0", pset_v1)
-    set_trans("0-1","1-1", pset_v1)
-    set_trans("1-1","2-1", pset_v1)
+    return MarkovChain(batchMC("match", pset_v1)[0], list(match_states))
 
-    set_trans("0-0","0-1", pset_v2)
-    set_trans("1-0","1-1", pset_v2)
-    set_trans("0-1","0-2", pset_v2)
-    set_trans("1-1","1-2", pset_v2)
-
-    # Set stationary (absorbing) states
-    set_trans("2-0", "V1", 1)
-    set_trans("2-1", "V1", 1)
-    set_trans("0-2", "V2", 1)
-    set_trans("1-2", "V2", 1)
-    set_trans("V1", "V1", 1)
-    set_trans("V2", "V2", 1)
-
-    MC_match = MarkovChain(tMat, STATES)
-    return MC_match
-
-def resMATCH(pset_v1, s_match, graph=False):
+@timed("functions.resMATCH")
+def resMATCH(pset_v1, s_match, graph=False, method="exact"):
     MC_match = MCmatch(pset_v1)
     tMat = MC_match.P
     s_match = np.array(s_match).reshape(1, -1)
-    tMat_n = np.linalg.matrix_power(tMat, 5)  # 2 sets, 5 steps is enough for absorption
-    resMATCH = np.dot(s_match, tMat_n)
+    tMat_n = _limit(tMat, 5, method)  # 2 sets, 5 steps is enough for absorption
+    resMATCH = s_match @ tMat_n
     if graph:
-        G = nx.DiGraph()
-        states = MC_match.state_values
-        for i, from_state in enumerate(states):
-            for j, to_state in enumerate(states):
-                prob = tMat[i, j]
-                if prob > 0:
-                    G.add_edge(from_state, to_state, weight=prob, label=f"{prob:.2f}")
-
-        plt.figure(figsize=(12, 5))
-        pos = nx.spring_layout(G, seed=42)
-        nx.draw(G, pos, with_labels=True, node_size=1500, node_color='lightcoral', arrows=True)
-        edge_labels = nx.get_edge_attributes(G, 'label')
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='darkblue')
-        plt.title("Markov Chain: Match States")
-        plt.axis('off')
-        plt.show()
-    return pd.DataFrame(resMATCH, columns=MC_match.state_values)
+        _graph("match", tMat, MC_match.state_values, graph)
+    with span("functions.frame.match"):
+        return pd.DataFrame(resMATCH, columns=MC_match.state_values)
 
 ############# V. Let's concatenate all of these blocks ##############
 def predict1(gamescore, phold1, phold2, ptie1, pset_v1, s0match, s0set):
     """
     Computes match outcome probabilities when still in the first set.
     """
-    s1match = s0match.copy()
-    s1set = s0set.copy()
-
-    # Set current game score in set state
-    s1set.iloc[0, s1set.columns.get_loc("0-0")] = 0
-    s1set.iloc[0, s1set.columns.get_loc(gamescore)] = 1
-
-    # Compute probabilities for set completion from this score
-    set_probs = resSET(phold1, phold2, ptie1, s1set)
-    s1match.iloc[0, s1match.columns.get_loc("1-0")] = set_probs["SETv1"].iloc[0]
-    s1match.iloc[0, s1match.columns.get_loc("0-1")] = set_probs["SETv2"].iloc[0]
-    s1match.iloc[0, s1match.columns.get_loc("0-0")] = 0
-
-    # Compute match outcome
-    resTEST = resMATCH(pset_v1, s1match)
-    return resTEST
+    res = predict_match("0-0", gamescore, phold1, phold2, ptie1, pset_v1)
+    return pd.DataFrame(res.reshape(1, -1), columns=s0match.columns)
 
 def predict2(setscore, gamescore, phold1, phold2, ptie1, pset_v1, s0match, s0set):
     """
     Computes match outcome probabilities when in the second set.
     """
-    s1match = s0match.copy()
-    s1set = s0set.copy()
-
-    # Use integer-based indexing with .iloc
-    s1match.iloc[0, s1match.columns.get_loc("0-0")] = 0
-    s1match.iloc[0, s1match.columns.get_loc(setscore)] = 1
-
-    s1set.iloc[0, s1set.columns.get_loc("0-0")] = 0
-    s1set.iloc[0, s1set.columns.get_loc(gamescore)] = 1
-
-    set_probs = resSET(phold1, phold2, ptie1, s1set)
-
-    if setscore == "1-0":
-        s1match.iloc[0, s1match.columns.get_loc("2-0")] = set_probs["SETv1"].iloc[0]
-        s1match.iloc[0, s1match.columns.get_loc("1-1")] = set_probs["SETv2"].iloc[0]
-        s1match.iloc[0, s1match.columns.get_loc("1-0")] = 0
-    elif setscore == "0-1":
-        s1match.iloc[0, s1match.columns.get_loc("0-2")] = set_probs["SETv2"].iloc[0]
-        s1match.iloc[0, s1match.columns.get_loc("1-1")] = set_probs["SETv1"].iloc[0]
-        s1match.iloc[0, s1match.columns.get_loc("0-1")] = 0
-
-    resTEST = resMATCH(pset_v1, s1match)
-    return resTEST
+    res = predict_match(setscore, gamescore, phold1, phold2, ptie1, pset_v1)
+    return pd.DataFrame(res.reshape(1, -1), columns=s0match.columns)
 
 def predict3(gamescore, phold1, phold2, ptie1, pset_v1, s0match, s0set):
     """
     Computes match outcome probabilities when in the third set.
     """
-    s1match = s0match.copy()
-    s1set = s0set.copy()
-    setscore = "1-1"
+    res = predict_match("1-1", gamescore, phold1, phold2, ptie1, pset_v1)
+    return pd.DataFrame(res.reshape(1, -1), columns=s0match.columns)
 
-    s1match.iloc[0, s1match.columns.get_loc("0-0")] = 0
-    s1match.iloc[0, s1match.columns.get_loc(setscore)] = 1
-
-    s1set.iloc[0, s1set.columns.get_loc("0-0")] = 0
-    s1set.iloc[0, s1set.columns.get_loc(gamescore)] = 1
-
-    set_probs = resSET(phold1, phold2, ptie1, s1set)
-    s1match.iloc[0, s1match.columns.get_loc("2-1")] = set_probs["SETv1"].iloc[0]
-    s1match.iloc[0, s1match.columns.get_loc("1-2")] = set_probs["SETv2"].iloc[0]
-    s1match.iloc[0, s1match.columns.get_loc("1-1")] = 0
-
-    resTEST = resMATCH(pset_v1, s1match)
-    return resTEST
+def _start(s0, states):
+    # Starting distribution over states from a one-row DataFrame or an array
+    s0 = np.asarray(s0, dtype=float).reshape(-1)
+    if len(s0) != len(states):
+        raise ValueError(f"Expected a starting distribution over {len(states)} states.")
+    return s0
 
+@timed("functions.determiMM")
 def determiMM(ppoint_srv1, ppoint_srv2, setscore, gamescore, s0match, s0set, s0game, s0tb):
     """
     Computes match outcome probabilities, given the score and point/game/set probabilities.
+    phold1 / phold2, ptie1 and pset_v1 are the probabilities of holding, winning
+    the tie-break and winning the set from the starting distributions s0game,
+    s0tb and s0set (one-hot DataFrames or arrays, normally the 0-0 states);
+    s0match only gives the column labels of the result.
     """
-    # Compute intermediate probabilities
-    phold1 = resGAME(ppoint_srv1, s0game)["HOLD"].iloc[0]
-    phold2 = resGAME(ppoint_srv2, s0game)["HOLD"].iloc[0]
-    ptie1 = resTIE(ppoint_srv1, ppoint_srv2, s0tb)["SETv1"].iloc[0]
-    pset_v1 = resSET(phold1, phold2, ptie1, s0set)["SETv1"].iloc[0]
-
-    print(f"Let's modelize this match from the score: {setscore} Sets, {gamescore} Games")
-
-    if setscore == "0-0":
-        resTEST = predict1(gamescore, phold1, phold2, ptie1, pset_v1, s0match, s0set)
-    elif setscore == "1-1":
-        resTEST = predict3(gamescore, phold1, phold2, ptie1, pset_v1, s0match, s0set)
-    elif setscore in ["1-0", "0-1"]:
-        resTEST = predict2(setscore, gamescore, phold1, phold2, ptie1, pset_v1, s0match, s0set)
-    else:
+    if setscore not in ["0-0", "1-0", "0-1", "1-1"]:
         raise ValueError("Invalid setscore provided.")
 
-    return resTEST
+    phold1 = _start(s0game, game_states) @ absorb(batchMC("game", ppoint_srv1)[0])[:, game_index["HOLD"]]
+    phold2 = _start(s0game, game_states) @ absorb(batchMC("game", ppoint_srv2)[0])[:, game_index["HOLD"]]
+    ptie1 = _start(s0tb, tb_states) @ absorb(batchMC("tb", ppoint_srv1, ppoint_srv2)[0])[:, tb_index["SETv1"]]
+    pset_v1 = _start(s0set, set_states) @ absorb(batchMC("set", phold1, phold2, ptie1)[0])[:, set_index["SETv1"]]
+    res = predict_match(setscore, gamescore, phold1, phold2, ptie1, pset_v1)
+    with span("functions.frame.determiMM"):
+        return pd.DataFrame(res.reshape(1, -1), columns=s0match.columns)
@@ -0,0 +1,95 @@
+##### Precomputed (ppoint_srv1, ppoint_srv2) grid tables
+## The match-win probability from every live state (see core.live_states)
+## only depends on the two serve probabilities, so it is tabulated once over a
+## grid and stored in a memory-mapped file:
+#   magic (8 bytes) | header length (8 bytes) | JSON header | padding | values
+## The header holds the model version, and grids of another version are
+## rejected on load.
+## values is a C-ordered array of shape (len(p1), len(p2), len(states)). Worker
+## processes mapping the same file read-only share one copy in the page cache.
+
+import json
+
+import numpy as np
+
+from core import _first_server, live_index, live_state, live_states, liveValues
+
+MAGIC = b"TENNGRID"
+_ALIGN = 64
+# Version of the pricing model stored in the header: bump it whenever the
+# values of liveValues change (chains, fixes), so older grids are rebuilt
+VERSION = 2
+
+def buildGrid(path, p1=np.linspace(0.4, 0.9, 51), p2=np.linspace(0.4, 0.9, 51), dtype="float32"):
+    """
+    Tabulates liveValues over the p1 x p2 grid and writes it to path.
+    Rows of the grid are solved one at a time, so memory stays bounded by len(p2).
+    """
+    p1, p2 = np.asarray(p1, dtype=float), np.asarray(p2, dtype=float)
+    if np.any(np.diff(p1) <= 0) or np.any(np.diff(p2) <= 0):
+        raise ValueError("Grid axes must be strictly increasing.")
+    header = json.dumps({"version": VERSION, "p1": p1.tolist(), "p2": p2.tolist(), "dtype": np.dtype(dtype).str,
+                         "states": [list(s) for s in live_states]}).encode()
+    offset = -(-(len(MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        f.write(b"\0" * (offset - len(MAGIC) - 8 - len(header)))
+    values = np.memmap(path, dtype=dtype, mode="r+", offset=offset, shape=(len(p1), len(p2), len(live_states)))
+    for i, p in enumerate(p1):
+        values[i] = liveValues(np.full(len(p2), p), p2)
+    values.flush()
+    del values
+    return loadGrid(path)
+
+def loadGrid(path):
+    """
+    Maps a grid file read-only. Nothing is read from disk until it is queried.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a grid file.")
+        n = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(n))
+    offset = -(-(len(MAGIC) + 8 + n) // _ALIGN) * _ALIGN
+    if header.get("version") != VERSION:
+        raise ValueError(f"{path} was built by model version {header.get('version')}, "
+                         f"not {VERSION}, rebuild it.")
+    p1, p2 = np.array(header["p1"]), np.array(header["p2"])
+    states = tuple(tuple(s) for s in header["states"])
+    if states != live_states:
+        raise ValueError(f"{path} was built for different live states, rebuild it.")
+    values = np.memmap(path, dtype=np.dtype(header["dtype"]), mode="r", offset=offset,
+                       shape=(len(p1), len(p2), len(states)))
+    # A plain ndarray view of the mapping avoids the np.memmap overhead on every lookup
+    return {"p1": p1, "p2": p2, "values": values.view(np.ndarray)}
+
+def _bracket(axis, p):
+    if np.ndim(p) == 0:
+        # Scalar fast path, the common case when quoting a single match
+        p = float(p)
+        if not axis[0] <= p <= axis[-1]:
+            raise ValueError(f"Serve probability outside the grid [{axis[0]}, {axis[-1]}].")
+        i = min(int(np.searchsorted(axis, p, side="right")) - 1, len(axis) - 2)
+        return i, (p - axis[i]) / (axis[i + 1] - axis[i])
+    p = np.asarray(p, dtype=float)
+    if np.any(p < axis[0]) or np.any(p > axis[-1]):
+        raise ValueError(f"Serve probability outside the grid [{axis[0]}, {axis[-1]}].")
+    i = np.clip(np.searchsorted(axis, p, side="right") - 1, 0, len(axis) - 2)
+    return i, (p - axis[i]) / (axis[i + 1] - axis[i])
+
+def gridMM(grid, ppoint_srv1, ppoint_srv2, setscore="0-0", gamescore="0-0", pointscore="0-0", server=None):
+    """
+    Probability that player 1 wins the match from a live score, by bilinear
+    interpolation of the grid. ppoint_srv1 and ppoint_srv2 can be arrays.
+    server=None has player 1 serve first in the current set, as in batchLiveMM.
+    """
+    if server is None:
+        server = _first_server(gamescore, pointscore)
+    k = live_index[live_state(setscore, gamescore, pointscore, server)]
+    i, u = _bracket(grid["p1"], ppoint_srv1)
+    j, w = _bracket(grid["p2"], ppoint_srv2)
+    v = grid["values"]
+    return ((1 - u) * (1 - w) * v[i, j, k] + u * (1 - w) * v[i + 1, j, k]
+            + (1 - u) * w * v[i, j + 1, k] + u * w * v[i + 1, j + 1, k])
@@ -0,0 +1,175 @@
+##### In-play Bayesian updating
+## Serve probabilities that learn from the match: each player's probability of
+## winning a point on serve has a Beta posterior, updated after every point that
+## player serves. The match price is the posterior expectation of the match-win
+## probability, integrated over a precomputed grid (grid.buildGrid) instead of
+## re-solving chains:
+#   E[V1] = sum_ij w1_i w2_j values[i, j, state]
+## where w1, w2 are the weights of the grid nodes under the two posteriors,
+## exact for the bilinear interpolant of the grid used by grid.gridMM. A point
+## only changes the posterior of its server, so only that player's weights are
+## recomputed; the score advances as in replay. Matches start at 0-0 and are
+## updated together, each call scoring one point in any subset of them.
+## Requires scipy (optional, as for sparse.py).
+
+import numpy as np
+
+try:
+    from scipy.special import betainc, betaln
+except ImportError as e:  # pragma: no cover
+    raise ImportError("In-play updating requires scipy (pip install scipy).") from e
+
+from replay import _new_scores, _play, _point_server, _score_index
+
+def beta_prior(ppoint_srv, strength):
+    """
+    Beta(alpha, beta) with mean ppoint_srv and weight of `strength` points.
+    """
+    ppoint_srv, strength = np.asarray(ppoint_srv, dtype=float), np.asarray(strength, dtype=float)
+    return ppoint_srv * strength, (1 - ppoint_srv) * strength
+
+def _cdfs(axis, alpha, beta):
+    # Regularized incomplete beta functions I(alpha, beta) and I(alpha + 1, beta)
+    # at the nodes, (N, len(axis)) each
+    alpha, beta = np.atleast_1d(alpha)[:, None], np.atleast_1d(beta)[:, None]
+    return betainc(alpha, beta, axis), betainc(alpha + 1, beta, axis)
+
+def _density_step(axis, alpha, beta):
+    # x^a (1-x)^b / B(a, b) at the nodes: I(a + 1, b) = I(a, b) - step / a and
+    # I(a, b + 1) = I(a, b) + step / b
+    alpha, beta = alpha[:, None], beta[:, None]
+    return np.exp(alpha * np.log(axis) + beta * np.log1p(-axis) - betaln(alpha, beta))
+
+def _weights(axis, alpha, beta, I0, I1):
+    # Node weights from the CDF I0 and the partial first moment mean * I1
+    F0, F1 = I0, (alpha / (alpha + beta))[:, None] * I1
+    d0, d1 = np.diff(F0, axis=1), np.diff(F1, axis=1)
+    h = np.diff(axis)
+    w = np.zeros(F0.shape)
+    w[:, :-1] += (axis[1:] * d0 - d1) / h
+    w[:, 1:] += (d1 - axis[:-1] * d0) / h
+    w[:, 0] += F0[:, 0]
+    w[:, -1] += 1 - F0[:, -1]
+    return w
+
+def node_weights(axis, alpha, beta):
+    """
+    Weights of the grid nodes (N, len(axis)) such that weights @ f[axis] is
+    the expectation of the piecewise-linear interpolant of f under
+    Beta(alpha, beta), the mass outside the grid going to the end nodes.
+    """
+    alpha, beta = np.atleast_1d(np.asarray(alpha, dtype=float)), np.atleast_1d(np.asarray(beta, dtype=float))
+    return _weights(axis, alpha, beta, *_cdfs(axis, alpha, beta))
+
+class InPlay:
+    """
+    Live matches priced under Beta posteriors of the serve probabilities.
+    """
+    def __init__(self, grid):
+        self.grid = grid
+        self.n = 0
+        self.alpha = np.zeros((0, 2))  # posterior of (ppoint_srv1, ppoint_srv2)
+        self.beta = np.zeros((0, 2))
+        self._axes = (grid["p1"], grid["p2"])
+        # Per player: I(alpha, beta) and I(alpha + 1, beta) at the nodes, node weights
+        self._I0, self._I1, self._w = ([np.zeros((0, len(axis))) for axis in self._axes] for _ in range(3))
+        self._scores = _new_scores(np.zeros(0))
+        self._over = np.zeros(0, dtype=bool)
+        # State-major copy of the grid, filled as states are visited: one
+        # contiguous (p1, p2) slab per state instead of a strided gather
+        values = grid["values"]
+        self._slabs = np.empty((values.shape[2],) + values.shape[:2], dtype=values.dtype)
+        self._filled = np.zeros(values.shape[2], dtype=bool)
+
+    def add(self, ppoint_srv1, ppoint_srv2, strength=100, server=1):
+        """
+        Starts matches at 0-0 with prior means ppoint_srv1 / ppoint_srv2 worth
+        `strength` points each (scalars or arrays), server serving first.
+        Returns the ids of the new matches.
+        """
+        p1, p2, strength, server = np.broadcast_arrays(*(np.atleast_1d(np.asarray(x)) for x in
+                                                          (ppoint_srv1, ppoint_srv2, strength, server)))
+        if not np.isin(server, (1, 2)).all():
+            raise ValueError("Invalid server provided.")
+        if np.any(p1 <= 0) | np.any(p1 >= 1) | np.any(p2 <= 0) | np.any(p2 >= 1) | np.any(strength <= 0):
+            raise ValueError("Invalid prior provided.")
+        ids = np.arange(self.n, self.n + len(p1))
+        self.n += len(p1)
+        a1, b1 = beta_prior(p1, strength)
+        a2, b2 = beta_prior(p2, strength)
+        self.alpha = np.concatenate([self.alpha, np.stack([a1, a2], axis=1)])
+        self.beta = np.concatenate([self.beta, np.stack([b1, b2], axis=1)])
+        for player, (a, b) in enumerate([(a1, b1), (a2, b2)]):
+            I0, I1 = _cdfs(self._axes[player], a, b)
+            self._I0[player] = np.concatenate([self._I0[player], I0])
+            self._I1[player] = np.concatenate([self._I1[player], I1])
+            self._w[player] = np.concatenate([self._w[player], _weights(self._axes[player], a, b, I0, I1)])
+        new = _new_scores(server)
+        self._scores = {k: np.concatenate([v, new[k]]) for k, v in self._scores.items()}
+        self._over = np.concatenate([self._over, np.zeros(len(p1), dtype=bool)])
+        return ids
+
+    def point(self, ids, winners):
+        """
+        Scores one point in each match of ids (winners: 1 or 2, the player who
+        won it), updates the posterior of its server and returns the new
+        prices() of those matches.
+        """
+        ids = np.atleast_1d(np.asarray(ids, dtype=int))
+        winners = np.broadcast_to(np.asarray(winners), ids.shape)
+        if len(np.unique(ids)) != len(ids) or np.any((ids < 0) | (ids >= self.n)):
+            raise ValueError("Invalid match ids provided.")
+        if not np.isin(winners, (1, 2)).all():
+            raise ValueError("Invalid point winner provided.")
+        if self._over[ids].any():
+            raise ValueError("Match already over.")
+
+        # Posterior of the server of the point only, one step of the
+        # incomplete beta recurrences instead of a new evaluation
+        srv = _point_server({k: v[ids] for k, v in self._scores.items()})
+        held = winners == srv
+        for player in (0, 1):
+            mine = srv == player + 1
+            for won in (True, False):
+                s = ids[mine & (held == won)]
+                if not s.size:
+                    continue
+                axis, a, b = self._axes[player], self.alpha[s, player], self.beta[s, player]
+                I0, I1 = self._I0[player][s], self._I1[player][s]
+                if won:
+                    # alpha + 1: I(a + 1, b), I(a + 2, b)
+                    I0, I1 = I1, I1 - _density_step(axis, a + 1, b) / (a + 1)[:, None]
+                    self.alpha[s, player] = a = a + 1
+                else:
+                    # beta + 1: I(a, b + 1), I(a + 1, b + 1)
+                    I0, I1 = (I0 + _density_step(axis, a, b) / b[:, None],
+                              I1 + _density_step(axis, a + 1, b) / b[:, None])
+                    self.beta[s, player] = b = b + 1
+                self._I0[player][s], self._I1[player][s] = I0, I1
+                self._w[player][s] = _weights(axis, a, b, I0, I1)
+
+        live = np.zeros(self.n, dtype=bool)
+        live[ids] = True
+        p1_won = np.zeros(self.n, dtype=bool)
+        p1_won[ids] = winners == 1
+        self._over |= _play(self._scores, live, p1_won)
+        return self.prices(ids)
+
+    def prices(self, ids=None):
+        """
+        Dict of arrays: V1 and V2 (posterior expectations) and the posterior
+        means of ppoint_srv1 / ppoint_srv2, for ids (default all matches).
+        """
+        ids = np.arange(self.n) if ids is None else np.atleast_1d(np.asarray(ids, dtype=int))
+        V1 = (self._scores["s1"][ids] == 2).astype(float)
+        going = ~self._over[ids]
+        g = ids[going]
+        if g.size:
+            k = _score_index({key: v[g] for key, v in self._scores.items()})
+            new = np.unique(k[~self._filled[k]])
+            if new.size:
+                self._slabs[new] = np.moveaxis(self.grid["values"][:, :, new], 2, 0)
+                self._filled[new] = True
+            V1[going] = np.einsum("mi,mij,mj->m", self._w[0][g], self._slabs[k], self._w[1][g])
+        mean = self.alpha[ids] / (self.alpha[ids] + self.beta[ids])
+        return {"V1": V1, "V2": 1 - V1, "ppoint_srv1": mean[:, 0], "ppoint_srv2": mean[:, 1]}
@@ -0,0 +1,137 @@
+##### Opt-in instrumentation
+## The hot paths of the hierarchy (matrix build, solves, packaging, caches)
+## report events to a sink when one is enabled. A sink is any callable taking
+## an event dict {"name": ..., "seconds": ..., and sizes such as "n" (batch) or
+## "states"}; Aggregator keeps per-name counters in memory, LogSink writes one
+## JSON line per event to a logger. While no sink is enabled, the hooks cost one
+## global lookup per call, so they stay in production code.
+## Usage:
+##   agg = Aggregator()
+##   with enabled(agg):
+##       determiMM(...)
+##   agg.summary()
+
+import json
+import logging
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+
+_sink = None
+_NULL = nullcontext()
+
+def enable(sink):
+    """
+    Sends every event to sink (a callable taking an event dict).
+    """
+    global _sink
+    _sink = sink
+
+def disable():
+    global _sink
+    _sink = None
+
+@contextmanager
+def enabled(sink):
+    """
+    enable(sink) for the duration of a with block.
+    """
+    previous = _sink
+    enable(sink)
+    try:
+        yield sink
+    finally:
+        enable(previous)
+
+def emit(name, **fields):
+    """
+    Sends an event without timing (e.g. a cache hit) if a sink is enabled.
+    """
+    sink = _sink
+    if sink is not None:
+        sink({"name": name, **fields})
+
+def timed(name, sizes=None):
+    """
+    Decorator timing each call of the function as the event `name`. sizes(args,
+    result) returns extra fields (batch size, number of states...).
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            sink = _sink
+            if sink is None:
+                return fn(*args, **kwargs)
+            start = perf_counter()
+            result = fn(*args, **kwargs)
+            event = {"name": name, "seconds": perf_counter() - start}
+            if sizes is not None:
+                event.update(sizes(args, result))
+            sink(event)
+            return result
+        return wrapper
+    return decorator
+
+@contextmanager
+def _span(name, fields):
+    start = perf_counter()
+    yield
+    emit(name, seconds=perf_counter() - start, **fields)
+
+def span(name, **fields):
+    """
+    Context manager timing its block as the event `name`.
+    """
+    return _NULL if _sink is None else _span(name, fields)
+
+class Aggregator:
+    """
+    In-memory sink: per event name (and state-space size, so the game,
+    tie-break, set and match solves are counted apart), calls, total / max
+    seconds, rows (sum of "n") and cache hits / misses.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._stats = {}
+
+    def __call__(self, event):
+        with self._lock:
+            key = f"{event['name']}[{event['states']}]" if "states" in event else event["name"]
+            s = self._stats.setdefault(key, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                             "rows": 0, "hits": 0, "misses": 0})
+            s["calls"] += 1
+            seconds = event.get("seconds", 0.0)
+            s["seconds"] += seconds
+            s["max_seconds"] = max(s["max_seconds"], seconds)
+            s["rows"] += event.get("n", 0)
+            if "hit" in event:
+                s["hits" if event["hit"] else "misses"] += 1
+
+    def summary(self):
+        """
+        Dict of the counters per key, with mean_seconds and hit_rate.
+        """
+        with self._lock:
+            out = {name: dict(s) for name, s in self._stats.items()}
+        for s in out.values():
+            s["mean_seconds"] = s["seconds"] / s["calls"]
+            lookups = s["hits"] + s["misses"]
+            s["hit_rate"] = s["hits"] / lookups if lookups else None
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+class LogSink:
+    """
+    Structured-log sink: one JSON line per event on a logging.Logger.
+    """
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger("tennis.instrument")
+        self.level = level
+
+    def __call__(self, event):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, json.dumps(event))
@@ -0,0 +1,112 @@
+##### Pressure points
+## Serve probabilities that depend on what the point is worth. Every point is
+## in one of the classes of PRESSURE_CLASSES, the first that applies of:
+#   set_point    the point can end the set (set points for either player, in a
+#                game or in the tie-break)
+#   break_point  the receiver leads 40-x or has the advantage
+#   tiebreak     any other tie-break point
+#   regular      any other point
+## Each class is a state class of the chains (core.classed_template), so the
+## chains keep their structure and are filled and solved in one batch, as in
+## core.batchMM. A game decides the set when its server is serving for the
+## set (game points are set points) or to stay in it (break points are), so
+## there are three game chains per player and the set chain picks the hold
+## probability of the right one at each game score.
+
+import numpy as np
+
+from core import (_after_set, _set_after_game, _state_index, absorb_to, chain_template, classed_template,
+                  game_states, set_states, tb_states)
+from instrument import timed
+
+PRESSURE_CLASSES = ("regular", "break_point", "set_point", "tiebreak")
+
+_BREAK_POINTS = ("0-40", "15-40", "30-40(40-A)")
+_GAME_POINTS = ("40-0", "40-15", "40-30(A-40)")
+
+def _game_classes(set_on):
+    # Classes 0 regular, 1 break point, 2 set point of the game states, for a
+    # game where the set is on the game points ("for"), on the break points
+    # ("stay") or on neither (None)
+    def cls(state):
+        if state in _BREAK_POINTS:
+            return 2 if set_on == "stay" else 1
+        if state in _GAME_POINTS and set_on == "for":
+            return 2
+        return 0
+    return tuple(cls(s) for s in game_states)
+
+def _tb_classes():
+    # Classes 0 tie-break point, 1 set point of the tie-break states
+    def cls(state):
+        if state in ("SETv1", "SETv2"):
+            return 0
+        a, b = map(int, state.split("-"))
+        return int((a >= 6 and a > b) or (b >= 6 and b > a))
+    return tuple(cls(s) for s in tb_states)
+
+def _set_classes():
+    # Classes 0 regular, 1 serving for the set, 2 serving to stay in it, of
+    # the set states (player 1 serves first in the set)
+    def cls(state):
+        if state in ("SETv1", "SETv2", "6-6"):
+            return 0
+        g1, g2 = map(int, state.split("-"))
+        server_wins = (g1 + g2) % 2 == 0
+        if _set_after_game(state, server_wins) in ("SETv1", "SETv2"):
+            return 1
+        if _set_after_game(state, not server_wins) in ("SETv1", "SETv2"):
+            return 2
+        return 0
+    return tuple(cls(s) for s in set_states)
+
+def _classes(ppoint_srv, n):
+    # Probability of each class, (n,) arrays, from a probability or a dict of them
+    if not isinstance(ppoint_srv, dict):
+        ppoint_srv = {"regular": ppoint_srv}
+    unknown = set(ppoint_srv) - set(PRESSURE_CLASSES)
+    if unknown or "regular" not in ppoint_srv:
+        raise ValueError(f"Invalid point classes provided: expected regular and any of {PRESSURE_CLASSES}.")
+    return {k: np.broadcast_to(np.asarray(ppoint_srv.get(k, ppoint_srv["regular"]), dtype=float), (n,))
+            for k in PRESSURE_CLASSES}
+
+def _holds(p):
+    # Probability of holding a game where the set is on nothing, the game
+    # points or the break points
+    probs = [p["regular"], p["break_point"], p["set_point"]]
+    holds = []
+    for set_on in (None, "for", "stay"):
+        template = classed_template("game", _game_classes(set_on))
+        # No set point class in a game that does not decide the set
+        holds.append(absorb_to(template, "HOLD", *probs[:template.n_params])[:, 0])
+    return holds
+
+@timed("pressure.pressureMM", lambda args, res: {"n": len(res["V1"])})
+def pressureMM(ppoint_srv1, ppoint_srv2, setscore="0-0", gamescore="0-0"):
+    """
+    batchMM with state-dependent serve probabilities. ppoint_srv1 and
+    ppoint_srv2 are probabilities (scalars or arrays of length N), or dicts of
+    them keyed by PRESSURE_CLASSES; classes left out use "regular". Returns a
+    dict of arrays of length N keyed as batchMM (phold1 and phold2 are the
+    holds of a game that does not decide the set).
+    """
+    sizes = [np.size(v) for p in (ppoint_srv1, ppoint_srv2)
+             for v in (p.values() if isinstance(p, dict) else [p])]
+    n = max(sizes + [np.size(setscore), np.size(gamescore)])
+    p1, p2 = _classes(ppoint_srv1, n), _classes(ppoint_srv2, n)
+    rows = np.arange(n)
+
+    holds1, holds2 = _holds(p1), _holds(p2)
+    tb = absorb_to(classed_template("tb", _tb_classes()), "SETv1",
+                   p1["tiebreak"], p1["set_point"], p2["tiebreak"], p2["set_point"])
+    ptie1 = tb[:, 0]
+    # The tie-break probability only appears at 6-6, whose class is 0
+    set_lim = absorb_to(classed_template("set", _set_classes()), "SETv1", *holds1, *holds2, ptie1, ptie1, ptie1)
+    pset_v1 = set_lim[:, 0]
+    match_lim = absorb_to(chain_template("match"), "V1", pset_v1)
+
+    pset_now = set_lim[rows, _state_index(set_states, gamescore, n)]
+    i_win, i_lose = _after_set(setscore, n)
+    pmatch_v1 = pset_now * match_lim[rows, i_win] + (1 - pset_now) * match_lim[rows, i_lose]
+    return {"phold1": holds1[0], "phold2": holds2[0], "ptie1": ptie1, "pset_v1": pset_v1,
+            "pset_now": pset_now, "V1": pmatch_v1, "V2": 1 - pmatch_v1}
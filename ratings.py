@@ -0,0 +1,170 @@
+##### Serve and return ratings from historical matches
+## Turns match statistics into the model inputs. Every match gives each
+## player serve points played / won and return points played / won; these are
+## summed per (player, surface), and over all surfaces as surface "all", with
+## an exponential time decay of half-life `half_life` days:
+#   weight = 0.5 ** ((ref - date) / half_life)
+## where ref is the latest date seen. The sums are the whole state: new results
+## rescale them to the new ref and add on, so updates never revisit old files
+## and the order of the files does not matter.
+## table() shrinks the rates towards the player's all-surface rate and the
+## tour rate, and ppoints() reads it to give ppoint_srv1 / ppoint_srv2 for any
+## pairings (tournament.matchup), to pass on to batchMM, batchLiveMM...
+## Input columns: date, surface, player1, player2, svpt1, svwon1, svpt2,
+## svwon2 (serve points played / won by each player), or the usual ATP / WTA
+## results files (tourney_date, surface, winner_id, loser_id, w_svpt,
+## w_1stWon, w_2ndWon, l_svpt, l_1stWon, l_2ndWon).
+
+import numpy as np
+import pandas as pd
+
+from bulk import read_chunks
+from tournament import matchup
+
+COLUMNS = ("date", "surface", "player1", "player2", "svpt1", "svwon1", "svpt2", "svwon2")
+_SUMS = ["serve_won", "serve_pts", "return_won", "return_pts"]
+
+def normalize(chunk):
+    """
+    DataFrame of match statistics in the columns of COLUMNS, from either
+    input layout. Matches without serve points are dropped.
+    """
+    if "winner_id" in chunk:
+        chunk = pd.DataFrame({
+            "date": pd.to_datetime(chunk["tourney_date"].astype(str), format="%Y%m%d"),
+            "surface": chunk["surface"], "player1": chunk["winner_id"], "player2": chunk["loser_id"],
+            "svpt1": chunk["w_svpt"], "svwon1": chunk["w_1stWon"] + chunk["w_2ndWon"],
+            "svpt2": chunk["l_svpt"], "svwon2": chunk["l_1stWon"] + chunk["l_2ndWon"]})
+    missing = [c for c in COLUMNS if c not in chunk]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}.")
+    chunk = chunk.loc[:, list(COLUMNS)].dropna()
+    chunk = chunk[(chunk["svpt1"] > 0) & (chunk["svpt2"] > 0)]
+    return chunk.assign(date=pd.to_datetime(chunk["date"]), surface=chunk["surface"].astype(str).str.lower())
+
+class Ratings:
+    """
+    Time-decayed serve and return point sums per (player, surface), updated
+    incrementally.
+    """
+    def __init__(self, half_life=365.0):
+        self.half_life = half_life
+        self.ref = None
+        self.sums = pd.DataFrame(columns=_SUMS, dtype=float,
+                                 index=pd.MultiIndex.from_arrays([[], []], names=["player", "surface"]))
+
+    def _decay(self, days):
+        return 0.5 ** (np.asarray(days, dtype=float) / self.half_life)
+
+    def update(self, matches):
+        """
+        Adds a DataFrame of match statistics (see normalize) to the sums.
+        """
+        m = normalize(matches)
+        if m.empty:
+            return self
+        dates = m["date"].values.astype("datetime64[D]")
+        latest = dates.max()
+        if self.ref is None or latest > self.ref:
+            if self.ref is not None:
+                self.sums *= self._decay((latest - self.ref) / np.timedelta64(1, "D"))
+            self.ref = latest
+        w = self._decay((self.ref - dates) / np.timedelta64(1, "D"))
+        # One row per player and match, both sides at once
+        rows = pd.DataFrame({
+            "player": np.concatenate([m["player1"].values, m["player2"].values]),
+            "surface": np.tile(m["surface"].values, 2),
+            "serve_won": np.tile(w, 2) * np.concatenate([m["svwon1"].values, m["svwon2"].values]),
+            "serve_pts": np.tile(w, 2) * np.concatenate([m["svpt1"].values, m["svpt2"].values]),
+            "return_won": np.tile(w, 2) * np.concatenate([(m["svpt2"] - m["svwon2"]).values,
+                                                          (m["svpt1"] - m["svwon1"]).values]),
+            "return_pts": np.tile(w, 2) * np.concatenate([m["svpt2"].values, m["svpt1"].values])})
+        by_surface = rows.groupby(["player", "surface"])[_SUMS].sum()
+        overall = rows.groupby("player")[_SUMS].sum()
+        overall.index = pd.MultiIndex.from_arrays([overall.index, ["all"] * len(overall)], names=["player", "surface"])
+        self.sums = pd.concat([self.sums, by_surface, overall]).groupby(level=["player", "surface"]).sum()
+        return self
+
+    def ingest(self, path, chunksize=100_000):
+        """
+        Streams a CSV or Parquet file of match statistics into the sums.
+        """
+        for chunk in read_chunks(path, chunksize):
+            self.update(chunk)
+        return self
+
+    def tour(self):
+        """
+        Tour-wide (serve, return) point shares of the sums.
+        """
+        s = self.sums.xs("all", level="surface").sum()
+        return s["serve_won"] / s["serve_pts"], s["return_won"] / s["return_pts"]
+
+    def table(self, prior=200.0, surface_prior=100.0):
+        """
+        Player-parameter table indexed by (player, surface): serve and ret,
+        the shares of serve / return points won, and the decayed point counts
+        behind them. All-surface rates are shrunk towards the tour with the
+        weight of `prior` points, surface rates towards the player's
+        all-surface rate with the weight of `surface_prior` points. The tour
+        shares are in table.attrs["tour"].
+        """
+        if self.ref is None:
+            raise ValueError("No matches ingested.")
+        tour_serve, tour_return = self.tour()
+        s = self.sums
+        overall = s.xs("all", level="surface")
+        serve_all = (overall["serve_won"] + prior * tour_serve) / (overall["serve_pts"] + prior)
+        ret_all = (overall["return_won"] + prior * tour_return) / (overall["return_pts"] + prior)
+        player = s.index.get_level_values("player")
+        base_serve, base_ret = serve_all.reindex(player).values, ret_all.reindex(player).values
+        is_all = (s.index.get_level_values("surface") == "all")
+        k = np.where(is_all, prior, surface_prior)
+        table = pd.DataFrame({
+            "serve": (s["serve_won"] + k * np.where(is_all, tour_serve, base_serve)) / (s["serve_pts"] + k),
+            "ret": (s["return_won"] + k * np.where(is_all, tour_return, base_ret)) / (s["return_pts"] + k),
+            "serve_points": s["serve_pts"], "return_points": s["return_pts"]}, index=s.index)
+        table.attrs = {"tour": (float(tour_serve), float(tour_return)), "ref": str(self.ref)}
+        return table
+
+    def save(self, path):
+        """
+        Writes the sums to a CSV file, with the reference date and half-life on
+        the first line.
+        """
+        with open(path, "w") as f:
+            f.write(f"# ref={self.ref} half_life={self.half_life}\n")
+            self.sums.to_csv(f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            meta = dict(x.split("=") for x in f.readline().lstrip("# ").split())
+            sums = pd.read_csv(f, index_col=["player", "surface"], dtype={"surface": str})
+        out = cls(float(meta["half_life"]))
+        out.ref = None if meta["ref"] == "None" else np.datetime64(meta["ref"], "D")
+        out.sums = sums.astype(float)
+        return out
+
+def ppoints(table, player1, player2, surface="all"):
+    """
+    ppoint_srv1 and ppoint_srv2 of the pairings (player1[i], player2[i]) on
+    surface (scalars or arrays), from a Ratings.table(). Surfaces a player has
+    no record on fall back to their all-surface rates, unknown players to the
+    tour. Returns a dict of arrays, ready for batchMM(**ppoints(...)).
+    """
+    player1, player2, surface = np.broadcast_arrays(np.atleast_1d(player1), np.atleast_1d(player2),
+                                                    np.atleast_1d(np.asarray(surface, dtype=object)))
+    tour = table.attrs["tour"]
+    surface = np.char.lower(surface.astype(str))
+
+    def lookup(players):
+        rates = table[["serve", "ret"]]
+        exact = rates.reindex(pd.MultiIndex.from_arrays([players, surface]))
+        overall = rates.reindex(pd.MultiIndex.from_arrays([players, np.full(len(players), "all")]))
+        out = exact.fillna(overall.set_axis(exact.index)).fillna({"serve": tour[0], "ret": tour[1]})
+        return out["serve"].values, out["ret"].values
+
+    serve1, ret1 = lookup(player1)
+    serve2, ret2 = lookup(player2)
+    return {"ppoint_srv1": matchup(serve1, ret2, tour), "ppoint_srv2": matchup(serve2, ret1, tour)}
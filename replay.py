@@ -0,0 +1,165 @@
+##### Point-by-point replay
+## Replays recorded matches (best of 3, tie-break at 6-6) into win-probability
+## paths: player 1's probability of winning the match before the first point
+## and after every point. Matches are read from any iterable and processed in
+## chunks: the score of every match of a chunk advances one point per step,
+## vectorized across the chunk, and each new score is looked up in the match's
+## live value table (core.liveValues, solved once per distinct pair of serve
+## probabilities in the chunk). Memory depends on the chunk size only.
+## Point sequences are either the winner of every point ("1"/"2") or, as in
+## the usual point-by-point archives, whether the server or the receiver won it
+## ("S"/"R", with "A" aces and "D" double faults, and the ";", ".", "/"
+## separators ignored). The server is tracked from the match's first server.
+## Usage:
+##   for path in replay((points, 0.64, 0.61) for points in archive):
+##       ...
+
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+
+from core import live_index, live_state, liveValues
+
+_WINNERS = {"1": 1, "2": 2}
+_SERVE_CODES = {"S": 1, "A": 1, "R": 2, "D": 2}
+_SEPARATORS = set(";./ \t\n")
+
+def parse_points(points):
+    """
+    Parses a point sequence into (outcomes, relative): an int8 array of 1 and
+    2 holding, point by point, the winner (relative=False) or whether the
+    server (1) or the receiver (2) won it (relative=True).
+    """
+    if isinstance(points, str):
+        chars = [c for c in points.upper() if c not in _SEPARATORS]
+        if all(c in _WINNERS for c in chars):
+            return np.array([_WINNERS[c] for c in chars], dtype=np.int8), False
+        if all(c in _SERVE_CODES for c in chars):
+            return np.array([_SERVE_CODES[c] for c in chars], dtype=np.int8), True
+        raise ValueError(f"Invalid point sequence provided: {points[:40]}")
+    outcomes = np.asarray(points, dtype=np.int8).ravel()
+    if not np.isin(outcomes, (1, 2)).all():
+        raise ValueError("Invalid point sequence provided.")
+    return outcomes, False
+
+@lru_cache(maxsize=None)
+def _state_lookup():
+    # live_index of every reachable score, by (sets 1, sets 2, games 1, games 2,
+    # points 1, points 2, server of the next point - 1); -1 where unreachable.
+    # Game points are normalized to at most 4-3 and tie-break points below 7-7.
+    lut = np.full((2, 2, 7, 7, 9, 9, 2), -1, dtype=np.int64)
+    names = ["0", "15", "30", "40", "A"]
+    for s1, s2, g1, g2, x, y, srv in np.ndindex(*lut.shape):
+        tb = g1 == 6 and g2 == 6
+        if tb:
+            pointscore = f"{x}-{y}"
+        elif max(x, y) <= 4 and not (x == 4 and y == 4):
+            a, b = (x, y) if srv == 0 else (y, x)
+            pointscore = f"{names[a]}-{names[b]}"
+        else:
+            continue
+        try:
+            lut[s1, s2, g1, g2, x, y, srv] = live_index[live_state(f"{s1}-{s2}", f"{g1}-{g2}", pointscore, srv + 1)]
+        except ValueError:
+            pass
+    lut.setflags(write=False)
+    return lut
+
+def _new_scores(first_server):
+    # Score of n matches at 0-0, as a dict of arrays
+    n = len(first_server)
+    m = {k: np.zeros(n, dtype=np.int64) for k in ("s1", "s2", "g1", "g2", "x", "y")}
+    m["server"] = np.array(first_server, dtype=np.int64)  # server of the game, or first server of the tie-break
+    return m
+
+def _point_server(m):
+    # Server of the next point: the serve changes after the first tie-break
+    # point, then every two points
+    in_tb = (m["g1"] == 6) & (m["g2"] == 6)
+    return np.where(in_tb & (((m["x"] + m["y"] + 1) // 2) % 2 == 1), 3 - m["server"], m["server"])
+
+def _play(m, live, p1_won):
+    # Scores one point in the matches where live is set; returns where the match is over
+    s1, s2, g1, g2, x, y, server = (m[k] for k in ("s1", "s2", "g1", "g2", "x", "y", "server"))
+    in_tb = (g1 == 6) & (g2 == 6)
+    x += live & p1_won
+    y += live & ~p1_won
+
+    # Game (or tie-break) over?
+    need = np.where(in_tb, 7, 4)
+    ended = live & (np.maximum(x, y) >= need) & (np.abs(x - y) >= 2)
+    p1g, p2g = ended & (x > y), ended & (y > x)
+    # Deuce (and 7-7 in a tie-break) repeat earlier states
+    deuce = ~ended & (np.minimum(x, y) >= need)
+    x -= np.where(deuce, np.where(in_tb, 2, 1), 0)
+    y -= np.where(deuce, np.where(in_tb, 2, 1), 0)
+    g1 += p1g
+    g2 += p2g
+    x[ended] = 0
+    y[ended] = 0
+    # The receiver of the game (or of the first tie-break point) serves next
+    server[ended] = 3 - server[ended]
+
+    # Set or match over?
+    set_end = (ended & in_tb) | ((g1 >= 6) & (g1 - g2 >= 2)) | ((g2 >= 6) & (g2 - g1 >= 2))
+    s1 += set_end & p1g
+    s2 += set_end & p2g
+    g1[set_end] = 0
+    g2[set_end] = 0
+    return (s1 == 2) | (s2 == 2)
+
+def _score_index(m):
+    # live_index of the score of every unfinished match (meaningless for the others)
+    return _state_lookup()[np.minimum(m["s1"], 1), np.minimum(m["s2"], 1), m["g1"], m["g2"],
+                           m["x"], m["y"], _point_server(m) - 1]
+
+def _replay_chunk(outcomes, relative, ppoint_srv1, ppoint_srv2, first_server):
+    # Win-probability paths of one chunk of matches, as a list of arrays
+    n = len(outcomes)
+    lengths = np.array([len(o) for o in outcomes])
+    steps = int(lengths.max(initial=0))
+    codes = np.zeros((n, steps), dtype=np.int8)
+    for i, o in enumerate(outcomes):
+        codes[i, :len(o)] = o
+
+    # One value table per distinct pair of serve probabilities
+    pairs, which = np.unique(np.column_stack([ppoint_srv1, ppoint_srv2]), axis=0, return_inverse=True)
+    values = np.atleast_2d(liveValues(pairs[:, 0], pairs[:, 1]))
+    which = which.ravel()
+
+    m = _new_scores(first_server)
+    stop = lengths.copy()  # number of points played, trailing points after the end are dropped
+    out = np.empty((n, steps + 1))
+    out[:, 0] = values[which, _score_index(m)]
+    live = np.ones(n, dtype=bool)
+    for t in range(steps):
+        live &= t < stop
+        if not live.any():
+            break
+        code = codes[:, t]
+        p1_won = np.where(relative, (code == 1) == (_point_server(m) == 1), code == 1)
+        done = _play(m, live, p1_won)
+        stop[live & done] = t + 1
+        going = live & ~done
+        out[going, t + 1] = values[which[going], _score_index(m)[going]]
+        out[live & done, t + 1] = (m["s1"] == 2)[live & done]
+    return [out[i, :stop[i] + 1].copy() for i in range(n)]
+
+def replay(matches, chunk_size=1_000):
+    """
+    Yields, for every match of the iterable, the array of player 1's
+    probability of winning the match before the first point and after every
+    point. A match is (points, ppoint_srv1, ppoint_srv2) or (points,
+    ppoint_srv1, ppoint_srv2, server), server being who served the first point
+    (default 1). Points recorded after the end of the match are dropped.
+    """
+    matches = iter(matches)
+    while chunk := list(islice(matches, chunk_size)):
+        parsed = [parse_points(m[0]) for m in chunk]
+        first_server = np.array([m[3] if len(m) > 3 else 1 for m in chunk], dtype=np.int64)
+        if not np.isin(first_server, (1, 2)).all():
+            raise ValueError("Invalid server provided.")
+        yield from _replay_chunk([o for o, _ in parsed], np.array([r for _, r in parsed]),
+                                 np.array([m[1] for m in chunk], dtype=float),
+                                 np.array([m[2] for m in chunk], dtype=float), first_server)
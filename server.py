@@ -0,0 +1,164 @@
+##### Local pricing server
+## asyncio server on localhost speaking JSON lines over TCP: one request per
+## line, {"id": ..., "ppoint_srv1": .., "ppoint_srv2": .., "setscore": ..,
+## "gamescore": .., "pointscore": .., "server": ..}, answered by one line with
+## the same id and the prices of core.batchLiveMM (or "error").
+## {"op": "metrics"} returns latency percentiles and batch sizes.
+## Identical requests in flight share one result, and concurrent requests are
+## gathered for up to `window` seconds into one batched chain solve, run off
+## the event loop. A request the batch cannot price (e.g. a singular chain) is
+## priced again on its own, so it only fails itself.
+## Usage: python server.py [--port 8765] [--window 0.002] [--max-batch 4096]
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from core import _first_server, batchLiveMM, live_state
+
+def _price_keys(keys):
+    # Prices of the keys in one batch or, if the batch fails, one by one, with
+    # the exception in place of the prices of a key that fails on its own
+    try:
+        res = batchLiveMM(*zip(*keys))
+    except Exception as e:
+        if len(keys) == 1:
+            return [e]
+        return [_price_keys([key])[0] for key in keys]
+    return [{k: float(v[i]) for k, v in res.items()} for i in range(len(keys))]
+
+class PricingServer:
+    """
+    Coalescing, micro-batching pricer. price() can be awaited directly, or
+    served over TCP with serve().
+    """
+    def __init__(self, window=0.002, max_batch=4096, history=10_000):
+        self.window = window
+        self.max_batch = max_batch
+        self._inflight = {}  # key -> future shared by identical requests
+        self._pending = []   # keys waiting for the next batch
+        self._timer = None
+        self._latencies = deque(maxlen=history)
+        self._batch_sizes = deque(maxlen=history)
+        self._counts = {"requests": 0, "coalesced": 0, "batches": 0, "errors": 0}
+
+    @staticmethod
+    def _key(request):
+        p1, p2 = float(request["ppoint_srv1"]), float(request["ppoint_srv2"])
+        if not (0 < p1 < 1 and 0 < p2 < 1):
+            raise ValueError("Invalid serve probability provided.")
+        gamescore, pointscore = request.get("gamescore", "0-0"), request.get("pointscore", "0-0")
+        server = request.get("server") or _first_server(gamescore, pointscore)
+        return (p1, p2) + live_state(request.get("setscore", "0-0"), gamescore, pointscore, int(server))
+
+    async def price(self, request):
+        """
+        Prices one request (a dict) and returns the dict of prices.
+        """
+        start = time.perf_counter()
+        self._counts["requests"] += 1
+        try:
+            key = self._key(request)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            self._counts["errors"] += 1
+            raise ValueError(f"Invalid request: {e}") from None
+        future = self._inflight.get(key)
+        if future is not None:
+            self._counts["coalesced"] += 1
+        else:
+            future = self._inflight[key] = asyncio.get_running_loop().create_future()
+            self._pending.append(key)
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        result = await asyncio.shield(future)
+        self._latencies.append(time.perf_counter() - start)
+        return result
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        keys, self._pending = self._pending, []
+        if keys:
+            self._batch_sizes.append(len(keys))
+            self._counts["batches"] += 1
+            asyncio.get_running_loop().create_task(self._run(keys))
+
+    async def _run(self, keys):
+        results = await asyncio.get_running_loop().run_in_executor(None, _price_keys, keys)
+        for key, res in zip(keys, results):
+            future = self._inflight.pop(key)
+            if isinstance(res, Exception):
+                self._counts["errors"] += 1
+                future.set_exception(res)
+            else:
+                future.set_result(res)
+
+    def metrics(self):
+        """
+        Latency percentiles (seconds), batch sizes and counters.
+        """
+        lat = np.array(self._latencies) if self._latencies else np.zeros(1)
+        sizes = np.array(self._batch_sizes) if self._batch_sizes else np.zeros(1)
+        return {"p50": float(np.percentile(lat, 50)), "p99": float(np.percentile(lat, 99)),
+                "batch_mean": float(sizes.mean()), "batch_max": int(sizes.max()), **self._counts}
+
+    async def _answer(self, line, writer):
+        request = None
+        try:
+            request = json.loads(line)
+            if isinstance(request, dict) and request.get("op") == "metrics":
+                out = self.metrics()
+            else:
+                out = await self.price(request)
+        except ValueError as e:
+            out = {"error": str(e)}
+        except Exception as e:
+            # Failures of the pricing itself (e.g. a singular chain) only fail their request
+            out = {"error": f"{type(e).__name__}: {e}"}
+        if isinstance(request, dict) and "id" in request:
+            out["id"] = request["id"]
+        writer.write((json.dumps(out) + "\n").encode())
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        tasks = set()
+        while line := await reader.readline():
+            task = asyncio.create_task(self._answer(line, writer))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+        await writer.drain()
+        writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """
+        Serves until cancelled.
+        """
+        server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local pricing server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--window", type=float, default=0.002, help="batching window in seconds")
+    parser.add_argument("--max-batch", type=int, default=4096)
+    args = parser.parse_args(argv)
+    print(f"Pricing on {args.host}:{args.port}", file=sys.stderr)
+    try:
+        asyncio.run(PricingServer(args.window, args.max_batch).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+##### Monte Carlo match simulator
+## Plays matches point by point from ppoint_srv1 / ppoint_srv2, vectorized
+## across matches: every iteration plays one point of every unfinished match.
+## Matches are split into fixed-size shards, each with its own RNG stream
+## spawned from one seed, so results are reproducible whatever the number of
+## worker processes. Besides validating the analytic chains (crosscheck), the
+## samples price markets they do not cover (duration, breaks, ...).
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from core import batchMM
+from formats import BEST_OF_3, formatMM
+
+_FIELDS = ("winner", "sets", "games", "points", "breaks", "tiebreaks", "set_scores")
+
+def _set_rules(fmt, final):
+    # Tie-break games (-1: advantage set) and tie-break points of each match's current set
+    tb_at = -1 if fmt.tiebreak_at is None else fmt.tiebreak_at
+    final_tb_at, final_tb_points = {"standard": (tb_at, fmt.tiebreak_points),
+                                    "advantage": (-1, fmt.tiebreak_points),
+                                    "long_tiebreak": (tb_at, fmt.final_tiebreak_points),
+                                    "match_tiebreak": (0, fmt.final_tiebreak_points)}[fmt.final_set]
+    return np.where(final, final_tb_at, tb_at), np.where(final, final_tb_points, fmt.tiebreak_points)
+
+def _simulate_shard(ppoint_srv1, ppoint_srv2, n, seed, fmt, reset_serve):
+    rng = np.random.default_rng(seed)
+    W, G = fmt.sets_to_win, fmt.set_games
+    out = {"winner": np.zeros(n, dtype=np.int8), "sets": np.zeros((n, 2), dtype=np.int16),
+           "points": np.zeros(n, dtype=np.int32), "breaks": np.zeros((n, 2), dtype=np.int16),
+           "tiebreaks": np.zeros(n, dtype=np.int16), "set_scores": np.zeros((n, 2 * W - 1, 2), dtype=np.int16)}
+
+    # Working state of the unfinished matches only, compacted as matches end
+    m = {"id": np.arange(n),
+         "p1": np.broadcast_to(np.asarray(ppoint_srv1, dtype=float), (n,)).copy(),
+         "p2": np.broadcast_to(np.asarray(ppoint_srv2, dtype=float), (n,)).copy(),
+         "server": np.ones(n, dtype=np.int8),  # server of the current game, or first server of the tie-break
+         **{k: np.zeros(n, dtype=np.int16) for k in ("s1", "s2", "g1", "g2", "x", "y", "b1", "b2", "tb")},
+         "points": np.zeros(n, dtype=np.int32), "scores": np.zeros((n, 2 * W - 1, 2), dtype=np.int16)}
+    while m["id"].size:
+        final = (m["s1"] == W - 1) & (m["s2"] == W - 1)
+        tb_at, tb_points = _set_rules(fmt, final)
+        in_tb = (m["g1"] == tb_at) & (m["g2"] == tb_at)
+
+        # Serve changes every game, and every two points in a tie-break
+        server = m["server"]
+        srv = np.where(in_tb & (((m["x"] + m["y"] + 1) // 2) % 2 == 1), 3 - server, server)
+        p1_won = (rng.random(srv.size) < np.where(srv == 1, m["p1"], m["p2"])) == (srv == 1)
+        x, y = m["x"], m["y"]
+        x += p1_won
+        y += ~p1_won
+        m["points"] += 1
+
+        # Game (or tie-break) over?
+        target = np.where(in_tb, tb_points, 4)
+        won_by_2 = ((x >= target) & (x - y >= 2)) | ((y >= target) & (y - x >= 2))
+        ended = np.where(in_tb, won_by_2, (np.maximum(x, y) >= 4) if fmt.no_ad else won_by_2)
+        p1g = ended & (x > y)
+        p2g = ended & (y > x)
+        m["b1"] += p1g & ~in_tb & (server == 2)
+        m["b2"] += p2g & ~in_tb & (server == 1)
+        m["tb"] += ended & in_tb
+        m["g1"] += p1g
+        m["g2"] += p2g
+        x[ended] = 0
+        y[ended] = 0
+        # The receiver of the game (or of the first tie-break point) serves next
+        server[ended] = 3 - server[ended]
+
+        # Set over?
+        g1, g2 = m["g1"], m["g2"]
+        set_end = (ended & in_tb) | ((g1 >= G) & (g1 - g2 >= 2)) | ((g2 >= G) & (g2 - g1 >= 2))
+        if set_end.any():
+            s = np.flatnonzero(set_end)
+            m["scores"][s, m["s1"][s] + m["s2"][s], 0] = g1[s]
+            m["scores"][s, m["s1"][s] + m["s2"][s], 1] = g2[s]
+            m["s1"] += set_end & p1g
+            m["s2"] += set_end & p2g
+            g1[s] = 0
+            g2[s] = 0
+            if reset_serve:
+                server[s] = 1
+
+            done = set_end & ((m["s1"] == W) | (m["s2"] == W))
+            if done.any():
+                d, ids = np.flatnonzero(done), m["id"][done]
+                out["winner"][ids] = np.where(m["s1"][d] == W, 1, 2)
+                out["sets"][ids] = np.stack([m["s1"][d], m["s2"][d]], axis=1)
+                out["points"][ids] = m["points"][d]
+                out["breaks"][ids] = np.stack([m["b1"][d], m["b2"][d]], axis=1)
+                out["tiebreaks"][ids] = m["tb"][d]
+                out["set_scores"][ids] = m["scores"][d]
+                m = {k: v[~done] for k, v in m.items()}
+
+    out["games"] = out["set_scores"].sum(axis=1)
+    return out
+
+def simulate(ppoint_srv1, ppoint_srv2, n_matches, seed=0, fmt=BEST_OF_3, reset_serve=True,
+             processes=1, shard_size=100_000):
+    """
+    Simulates n_matches matches and returns a dict of per-match arrays:
+    winner (1 or 2), sets (N, 2), games (N, 2) won by each player, points
+    played, breaks (N, 2) won by each player, tiebreaks, and set_scores
+    (N, max sets, 2), zero for sets not played.
+    ppoint_srv1 and ppoint_srv2 are scalars or arrays of length n_matches.
+    reset_serve=True has player 1 serve first in every set, as in the analytic
+    chains; False alternates the serve across sets as in a real match.
+    """
+    p1 = np.broadcast_to(np.asarray(ppoint_srv1, dtype=float), (n_matches,))
+    p2 = np.broadcast_to(np.asarray(ppoint_srv2, dtype=float), (n_matches,))
+    bounds = list(range(0, n_matches, shard_size)) + [n_matches]
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds) - 1)
+    jobs = [(p1[lo:hi], p2[lo:hi], hi - lo, sq, fmt, reset_serve)
+            for lo, hi, sq in zip(bounds[:-1], bounds[1:], seeds)]
+    if processes == 1 or len(jobs) == 1:
+        shards = [_simulate_shard(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            shards = list(pool.map(_simulate_shard, *zip(*jobs)))
+    return {field: np.concatenate([shard[field] for shard in shards]) for field in _FIELDS}
+
+def crosscheck(ppoint_srv1, ppoint_srv2, n_matches=1_000_000, seed=0, fmt=BEST_OF_3, processes=1):
+    """
+    Compares the simulated probability that player 1 wins the match with the
+    analytic one (formatMM, and determiMM for best of 3). z is the gap in
+    standard errors.
+    """
+    res = simulate(ppoint_srv1, ppoint_srv2, n_matches, seed, fmt, processes=processes)
+    p_hat = float(np.mean(res["winner"] == 1))
+    stderr = float(np.sqrt(p_hat * (1 - p_hat) / n_matches))
+    out = {"simulated": p_hat, "stderr": stderr,
+           "formatMM": float(formatMM(fmt, ppoint_srv1, ppoint_srv2)["V1"][0])}
+    if fmt == BEST_OF_3:
+        out["determiMM"] = float(batchMM(ppoint_srv1, ppoint_srv2)["V1"][0])
+    for key in ("formatMM", "determiMM"):
+        if key in out:
+            out[f"z_{key}"] = (p_hat - out[key]) / stderr
+    return out
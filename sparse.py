@@ -0,0 +1,62 @@
+##### Sparse backend
+## Every state has at most two successors, so a chain with S states has about
+## 2S transitions. Here chains are stored in CSR and the absorbing system
+## (I - Q) B = R is solved with a sparse triangular solve when the chain is
+## acyclic (sets, matches) and a sparse LU factorization otherwise (deuce and
+## tie-break loops), so memory and time scale with the number of transitions.
+## Requires scipy, an optional dependency shared only with inplay.py (the
+## numeric core and the pricing paths do not import it).
+
+import numpy as np
+
+try:
+    import scipy.sparse as sp
+    from scipy.sparse.linalg import splu, spsolve_triangular
+except ImportError as e:  # pragma: no cover
+    raise ImportError("The sparse backend requires scipy (pip install scipy).") from e
+
+from formats import BEST_OF_3, flat_template
+
+def fill_sparse(template, *params):
+    """
+    CSR transition matrix of one chain of a compiled core.Template.
+    """
+    p = np.append(np.asarray(params, dtype=float), 0.0)
+    if len(params) != template.n_params:
+        raise ValueError(f"Expected {template.n_params} probabilities, got {len(params)}.")
+    n = len(template.states)
+    values = template.a + template.b * p[template.param]
+    return sp.csr_array((values, (template.rows, template.cols)), shape=(n, n))
+
+def absorb_sparse(tMat):
+    """
+    Sparse counterpart of core.absorb: the limit of tMat^n as a CSR matrix.
+    """
+    tMat = sp.csr_array(tMat)
+    diag = tMat.diagonal()
+    absorbing = np.flatnonzero(np.isclose(diag, 1))
+    transient = np.flatnonzero(~np.isclose(diag, 1))
+    tMat_t = tMat[transient]
+    Q = tMat_t[:, transient].tocoo()
+    R = tMat_t[:, absorbing].toarray()
+    A = (sp.eye_array(len(transient)) - Q).tocsr()
+    if np.all(Q.row < Q.col):
+        # Acyclic chain with states in topological order: I - Q is upper triangular
+        B = spsolve_triangular(A, R, lower=False)
+    elif np.all(Q.row > Q.col):
+        B = spsolve_triangular(A, R, lower=True)
+    else:
+        B = splu(A.tocsc()).solve(R)
+    rows = np.concatenate([np.repeat(transient, len(absorbing)), absorbing])
+    cols = np.concatenate([np.tile(absorbing, len(transient)), absorbing])
+    values = np.concatenate([B.ravel(), np.ones(len(absorbing))])
+    return sp.csr_array((values, (rows, cols)), shape=tMat.shape)
+
+def flatMM(ppoint_srv1, ppoint_srv2, fmt=BEST_OF_3):
+    """
+    Probability that player 1 wins the match from every state of the flattened
+    point-by-point chain of fmt (formats.flat_template), solved sparsely.
+    """
+    template = flat_template(fmt)
+    lim = absorb_sparse(fill_sparse(template, ppoint_srv1, ppoint_srv2))
+    return lim[:, [template.states.index("V1")]].toarray().ravel()
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from core import batchMM
+from functions import determiMM, s0game, s0match, s0set, s0tb
+
+SCORES = [("0-0", "0-0"), ("1-0", "3-4"), ("0-1", "5-5"), ("1-1", "6-6"), ("1-1", "2-5")]
+
+@pytest.mark.parametrize("setscore, gamescore", SCORES)
+def test_batchmm_matches_determimm(setscore, gamescore):
+    p1, p2 = np.array([0.64, 0.58, 0.7]), np.array([0.61, 0.66, 0.52])
+    res = batchMM(p1, p2, setscore, gamescore)
+    for i in range(len(p1)):
+        frame = determiMM(p1[i], p2[i], setscore, gamescore, s0match, s0set, s0game, s0tb)
+        np.testing.assert_allclose(res["V1"][i], frame["V1"].iloc[0], atol=1e-12)
+        np.testing.assert_allclose(res["V2"][i], frame["V2"].iloc[0], atol=1e-12)
+
+def test_rows_carry_their_own_scores():
+    p1, p2 = np.full(len(SCORES), 0.63), np.full(len(SCORES), 0.6)
+    setscores, gamescores = zip(*SCORES)
+    res = batchMM(p1, p2, list(setscores), list(gamescores))
+    for i, (setscore, gamescore) in enumerate(SCORES):
+        np.testing.assert_allclose(res["V1"][i], batchMM(0.63, 0.6, setscore, gamescore)["V1"][0], atol=1e-15)
+
+def test_invalid_setscore():
+    with pytest.raises(ValueError):
+        batchMM([0.6], [0.6], "2-0", "0-0")
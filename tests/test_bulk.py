@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bulk import price_chunk, run
+from core import batchLiveMM, batchMM
+
+def _fixtures():
+    # The last row leaves its server empty and takes the default (player 2
+    # serves at 3-2 when player 1 served first)
+    return pd.DataFrame({"ppoint_srv1": [0.64, 0.64, 1.2, 0.62, 0.65], "ppoint_srv2": [0.6, 0.6, 0.6, 0.61, 0.6],
+                         "setscore": ["0-0", "0-0", "0-0", "1-1", "0-0"],
+                         "gamescore": ["2-1", "2-1", "0-0", "6-6", "3-2"],
+                         "pointscore": ["15-30", "1-0", "0-0", "3-4", "0-0"], "server": [2, 1, 1, 1, None]})
+
+def test_bad_rows_do_not_fail_the_chunk():
+    out = price_chunk(_fixtures())
+    assert list(out["error"] != "") == [False, True, True, False, False]
+    assert out["V1"].isna().tolist() == [False, True, True, False, False]
+    good = out.iloc[[0, 3]]
+    ref = batchLiveMM(good["ppoint_srv1"], good["ppoint_srv2"], good["setscore"].to_numpy(),
+                      good["gamescore"].to_numpy(), good["pointscore"].to_numpy(), [2, 1])
+    np.testing.assert_allclose(good["V1"], ref["V1"], atol=1e-14)
+
+def test_empty_server_takes_the_default():
+    out = price_chunk(_fixtures())
+    assert out["V1"].iloc[4] == pytest.approx(batchMM(0.65, 0.6, "0-0", "3-2")["V1"][0], abs=1e-14)
+
+def test_run_counts_failed_rows(tmp_path):
+    _fixtures().to_csv(tmp_path / "in.csv", index=False)
+    rows, errors, _ = run(str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), chunksize=3)
+    out = pd.read_csv(tmp_path / "out.csv", keep_default_na=False)
+    assert (rows, errors) == (5, 2)
+    assert list(out["error"] != "") == [False, True, True, False, False]
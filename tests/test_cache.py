@@ -0,0 +1,17 @@
+import pytest
+
+from cache import LayerCache
+from core import batchMM
+
+def test_price_matches_batch_mm():
+    cache = LayerCache()
+    for setscore, gamescore in [("0-0", "0-0"), ("1-0", "4-5"), ("1-1", "6-6")]:
+        assert cache.price(0.64, 0.6, setscore, gamescore) == pytest.approx(
+            batchMM(0.64, 0.6, setscore, gamescore)["V1"][0], abs=1e-14)
+
+@pytest.mark.parametrize("setscore, gamescore, message", [("2-0", "0-0", "setscore"), ("0-0", "7-7", "gamescore"),
+                                                          ("0-0", "40-15", "gamescore"), ("0-0", "SETv1", "gamescore"),
+                                                          ("0-0", "SETv2", "gamescore")])
+def test_invalid_scores_raise_value_error(setscore, gamescore, message):
+    with pytest.raises(ValueError, match=f"Invalid {message} provided."):
+        LayerCache().price(0.64, 0.6, setscore, gamescore)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from calibration import calibrate, gradMM
+from core import batchMM
+
+P1, P2 = np.array([0.64, 0.58, 0.7]), np.array([0.6, 0.66, 0.55])
+H = 1e-6
+
+@pytest.mark.parametrize("setscore, gamescore", [("0-0", "0-0"), ("1-0", "4-5"), ("1-1", "6-6")])
+def test_gradient_matches_finite_differences(setscore, gamescore):
+    values, jacobian = gradMM(P1, P2, setscore, gamescore)
+    for key, value in batchMM(P1, P2, setscore, gamescore).items():
+        np.testing.assert_allclose(values[key], value, atol=1e-12)
+    for j, (e1, e2) in enumerate(((H, 0), (0, H))):
+        up, down = batchMM(P1 + e1, P2 + e2, setscore, gamescore), batchMM(P1 - e1, P2 - e2, setscore, gamescore)
+        for key in values:
+            np.testing.assert_allclose(jacobian[key][:, j], (up[key] - down[key]) / (2 * H), atol=1e-7)
+
+def test_calibrate_round_trip():
+    prices = batchMM(P1, P2, "1-0", "2-3")
+    res = calibrate({"V1": prices["V1"], "phold1": prices["phold1"]}, "1-0", "2-3")
+    assert res["converged"].all()
+    np.testing.assert_allclose(res["ppoint_srv1"], P1, atol=1e-8)
+    np.testing.assert_allclose(res["ppoint_srv2"], P2, atol=1e-8)
+
+def test_calibrate_with_total():
+    prices = batchMM(P1, P2)
+    res = calibrate({"V1": prices["V1"]}, total=P1 + P2)
+    assert res["converged"].all()
+    np.testing.assert_allclose(res["ppoint_srv1"], P1, atol=1e-8)
+
+def test_invalid_targets():
+    with pytest.raises(ValueError):
+        calibrate({"V1": 0.6})
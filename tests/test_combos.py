@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from combos import comboMM, match_paths, price_combo
+from core import batchMM
+from distributions import matchDistributions
+from formats import BEST_OF_3
+from simulator import simulate
+
+P1, P2 = np.array([0.64, 0.58, 0.7]), np.array([0.6, 0.66, 0.55])
+SCORES = (["0-0", "1-0", "1-1"], ["0-0", "4-5", "6-6"])
+
+def test_paths_are_a_distribution():
+    np.testing.assert_allclose(match_paths(P1, P2, *SCORES)["prob"].sum(axis=1), 1, atol=1e-12)
+
+def test_win_legs_match_batchmm():
+    res = comboMM(P1, P2, [(i, "win", 1) for i in range(3)], *SCORES)
+    np.testing.assert_allclose(res["legs"], batchMM(P1, P2, *SCORES)["V1"], atol=1e-12)
+    assert res["independent"] == pytest.approx(np.prod(res["legs"]))
+
+def test_set_score_legs_match_distributions():
+    paths = match_paths(P1, P2, "1-0", "2-3")
+    labels, probs = matchDistributions(BEST_OF_3, P1, P2, "1-0", "2-3")["match_scores"]
+    for j, label in enumerate(labels):
+        res = price_combo(paths, [(i, "sets", label) for i in range(3)])
+        np.testing.assert_allclose(res["legs"], probs[:, j], atol=1e-12)
+
+def test_legs_match_simulator():
+    n = 100_000
+    sim = simulate(0.64, 0.6, n, seed=5)
+    sets_played = (sim["set_scores"].sum(axis=2) > 0).sum(axis=1)
+    legs = {("win", 2): sim["winner"] == 2,
+            ("sets", "2-1"): (sim["sets"][:, 0] == 2) & (sim["sets"][:, 1] == 1),
+            ("total_sets", 3): sets_played == 3,
+            ("tiebreak", True): sim["tiebreaks"] > 0,
+            ("set_winner", 2, 2): sim["set_scores"][:, 1, 1] > sim["set_scores"][:, 1, 0],
+            ("set_tiebreak", 1, True): sim["set_scores"][:, 0].sum(axis=1) == 13}
+    paths = match_paths(0.64, 0.6)
+    for (event, *args), hit in legs.items():
+        p = price_combo(paths, [(0, event, *args)])["legs"][0]
+        assert abs(hit.mean() - p) < 4 * np.sqrt(p * (1 - p) / n), event
+    # Two legs on the same match are and-ed over its paths
+    both = price_combo(paths, [(0, "win", 1), (0, "tiebreak", True)])["matches"][0]
+    hit = (sim["winner"] == 1) & (sim["tiebreaks"] > 0)
+    assert abs(hit.mean() - both) < 4 * np.sqrt(both * (1 - both) / n)
+
+def test_correlation_stays_within_bounds():
+    paths = match_paths(P1, P2)
+    legs = [(i, "win", 1) for i in range(3)]
+    q = price_combo(paths, legs)["legs"]
+    for rho in (-1.0, 0.0, 0.3, 1.0):
+        joint = price_combo(paths, legs, np.full((3, 3), rho))["joint"]
+        assert max(0.0, q.sum() - 2) <= joint <= q.min()
+
+def test_invalid_legs():
+    paths = match_paths(P1, P2, "1-0", "0-0")
+    for leg in [(5, "win", 1), (0, "win", 3), (0, "aces", 10), (0, "set_winner", 1, 1)]:
+        with pytest.raises(ValueError):
+            price_combo(paths, [leg])
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from core import batchMM
+from distributions import matchDistributions
+from formats import BEST_OF_3, GRAND_SLAM, formatMM
+
+P1, P2 = np.array([0.64, 0.6, 0.55]), np.array([0.6, 0.62, 0.66])
+
+def _won(d, sets_to_win):
+    labels, probs = d["match_scores"]
+    return probs[:, [int(s.split("-")[0]) == sets_to_win for s in labels]].sum(axis=1)
+
+@pytest.mark.parametrize("setscore, gamescore", [("0-0", "0-0"), ("1-0", "4-5"), ("0-1", "2-3"), ("1-1", "6-6")])
+def test_live_score_matches_batchmm(setscore, gamescore):
+    d = matchDistributions(BEST_OF_3, P1, P2, setscore, gamescore)
+    np.testing.assert_allclose(_won(d, 2), batchMM(P1, P2, setscore, gamescore)["V1"], atol=1e-12)
+    np.testing.assert_allclose(d["total_games"].sum(axis=1), 1, atol=1e-12)
+
+@pytest.mark.parametrize("setscore, gamescore", [("2-2", "5-5"), ("1-2", "3-2")])
+def test_live_score_matches_formatmm(setscore, gamescore):
+    d = matchDistributions(GRAND_SLAM, P1, P2, setscore, gamescore)
+    np.testing.assert_allclose(_won(d, 3), formatMM(GRAND_SLAM, P1, P2, setscore, gamescore)["V1"], atol=1e-12)
+
+def test_games_already_played_count():
+    # From 1-1 at 6-5 the current set has at least 12 games
+    d = matchDistributions(BEST_OF_3, P1, P2, "1-1", "6-5")
+    assert np.allclose(d["total_games"][:, :12], 0)
+
+@pytest.mark.parametrize("setscore, gamescore", [("2-0", "0-0"), ("x", "0-0"), ("0-0", "7-5"), ("0-0", "9-9")])
+def test_invalid_score(setscore, gamescore):
+    with pytest.raises(ValueError):
+        matchDistributions(BEST_OF_3, P1, P2, setscore, gamescore)
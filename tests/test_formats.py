@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from core import absorb_to, batchMM, chain_template
+from formats import (ADVANTAGE_FINAL_SET, BEST_OF_3, BEST_OF_5, DOUBLES, GRAND_SLAM, SHORT_SETS, MatchFormat,
+                     compile_format, formatMM)
+from simulator import crosscheck
+
+PRESETS = [BEST_OF_3, BEST_OF_5, GRAND_SLAM, ADVANTAGE_FINAL_SET, DOUBLES, SHORT_SETS]
+
+@pytest.mark.parametrize("p1, p2", [(0.62, 0.58), (0.55, 0.7)])
+def test_generated_tiebreak_matches_core(p1, p2):
+    # The rule-driven tie-break and the hand-written core.tb_matrix agree
+    # from every point score
+    generated = compile_format(BEST_OF_3)["tb"]
+    np.testing.assert_allclose(absorb_to(generated, "SETv1", p1, p2)[0],
+                               absorb_to(chain_template("tb"), "SETv1", p1, p2)[0]
+                               [[chain_template("tb").states.index(s) for s in generated.states]], atol=1e-12)
+
+@pytest.mark.parametrize("setscore, gamescore", [("0-0", "0-0"), ("1-0", "4-5"), ("0-1", "6-6"), ("1-1", "3-3")])
+def test_best_of_3_matches_batchmm(setscore, gamescore):
+    p1, p2 = np.array([0.64, 0.57]), np.array([0.6, 0.68])
+    np.testing.assert_allclose(formatMM(BEST_OF_3, p1, p2, setscore, gamescore)["V1"],
+                               batchMM(p1, p2, setscore, gamescore)["V1"], atol=1e-12)
+
+@pytest.mark.parametrize("fmt", PRESETS)
+def test_presets_match_simulator(fmt):
+    res = crosscheck(0.64, 0.6, n_matches=50_000, seed=3, fmt=fmt)
+    assert abs(res["z_formatMM"]) < 4
+    if "z_determiMM" in res:
+        assert abs(res["z_determiMM"]) < 4
+
+def test_invalid_final_set():
+    with pytest.raises(ValueError):
+        formatMM(MatchFormat(final_set="sudden_death"), 0.6, 0.6)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from core import set_states
+from functions import resGAME, resMATCH, resSET, resTIE, s0game, s0match, s0set, s0tb
+
+def _pair(res, *args):
+    exact, power = res(*args, method="exact"), res(*args, method="power")
+    assert list(exact.columns) == list(power.columns)
+    return exact.to_numpy(), power.to_numpy()
+
+@pytest.mark.parametrize("p", [0.5, 0.62, 0.71])
+def test_game_exact_matches_power(p):
+    exact, power = _pair(resGAME, p, s0game)
+    np.testing.assert_allclose(exact, power, atol=1e-12)
+
+@pytest.mark.parametrize("p1, p2", [(0.62, 0.6), (0.55, 0.7)])
+def test_tiebreak_exact_matches_power(p1, p2):
+    exact, power = _pair(resTIE, p1, p2, s0tb)
+    np.testing.assert_allclose(exact, power, atol=1e-12)
+
+@pytest.mark.parametrize("gamescore", ["0-0", "3-2", "5-5", "6-6"])
+def test_set_exact_matches_power(gamescore):
+    s_set = np.zeros((1, len(set_states)))
+    s_set[0, set_states.index(gamescore)] = 1
+    exact, power = _pair(resSET, 0.81, 0.74, 0.56, s_set)
+    np.testing.assert_allclose(exact, power, atol=1e-12)
+    np.testing.assert_allclose(exact.sum(), 1, atol=1e-12)
+
+def test_match_exact_matches_power():
+    s_match = s0match.copy()
+    s_match.iloc[0, 0] = 1
+    exact, power = _pair(resMATCH, 0.63, s_match)
+    np.testing.assert_allclose(exact, power, atol=1e-12)
+
+def test_invalid_method():
+    with pytest.raises(ValueError):
+        resGAME(0.6, s0game, method="magic")
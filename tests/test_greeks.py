@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from core import absorb_grad, absorb_to, chain_template, liveGreeks, liveValues
+
+H = 1e-5
+
+@pytest.mark.parametrize("level, target, params", [("game", "HOLD", (0.63,)), ("tb", "SETv1", (0.62, 0.58)),
+                                                   ("set", "SETv1", (0.8, 0.75, 0.55))])
+def test_absorb_grad_matches_finite_differences(level, target, params):
+    template = chain_template(level)
+    values, grads, hessians = absorb_grad(template, target, *params, hessian=True)
+    np.testing.assert_allclose(values, absorb_to(template, target, *params), atol=1e-14)
+    for k in range(len(params)):
+        up, down = (np.array(params, dtype=float) for _ in range(2))
+        up[k] += H
+        down[k] -= H
+        np.testing.assert_allclose(grads[k], (absorb_to(template, target, *up) - absorb_to(template, target, *down))
+                                   / (2 * H), atol=1e-8)
+        _, grads_up = absorb_grad(template, target, *up)
+        _, grads_down = absorb_grad(template, target, *down)
+        np.testing.assert_allclose(hessians[:, k], (grads_up - grads_down) / (2 * H), atol=1e-6)
+
+def test_live_greeks_match_finite_differences():
+    p1, p2 = 0.64, 0.6
+    greeks = liveGreeks(p1, p2)
+    np.testing.assert_allclose(greeks["V1"], liveValues(p1, p2), atol=1e-12)
+    np.testing.assert_allclose(greeks["dV1_dp1"], (liveValues(p1 + H, p2) - liveValues(p1 - H, p2)) / (2 * H), atol=1e-7)
+    np.testing.assert_allclose(greeks["dV1_dp2"], (liveValues(p1, p2 + H) - liveValues(p1, p2 - H)) / (2 * H), atol=1e-7)
+    def d(key, e1, e2):
+        return (liveGreeks(p1 + e1, p2 + e2)[key] - liveGreeks(p1 - e1, p2 - e2)[key]) / (2 * H)
+    np.testing.assert_allclose(greeks["d2V1_dp1dp1"], d("dV1_dp1", H, 0), atol=1e-5)
+    np.testing.assert_allclose(greeks["d2V1_dp1dp2"], d("dV1_dp1", 0, H), atol=1e-5)
+    np.testing.assert_allclose(greeks["d2V1_dp2dp2"], d("dV1_dp2", 0, H), atol=1e-5)
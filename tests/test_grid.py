@@ -0,0 +1,53 @@
+import json
+
+import numpy as np
+import pytest
+
+import grid
+from core import batchMM, live_index, live_state, liveValues
+from grid import MAGIC, buildGrid, gridMM, loadGrid
+
+AXIS = np.linspace(0.55, 0.7, 16)
+
+@pytest.fixture(scope="module")
+def built(tmp_path_factory):
+    path = tmp_path_factory.mktemp("grid") / "grid.bin"
+    buildGrid(path, AXIS, AXIS, dtype="float64")
+    return path
+
+def test_nodes_match_live_values(built):
+    g = loadGrid(built)
+    for i, j in [(0, 0), (1, 3), (3, 2)]:
+        np.testing.assert_allclose(g["values"][i, j], liveValues(AXIS[i], AXIS[j]), atol=1e-15)
+    k = live_index[live_state("1-0", "4-5", "30-40", 2)]
+    assert gridMM(g, AXIS[1], AXIS[3], "1-0", "4-5", "30-40", 2) == pytest.approx(liveValues(AXIS[1], AXIS[3])[k])
+
+def test_interpolation_between_nodes(built):
+    g = loadGrid(built)
+    p1, p2 = np.array([0.575, 0.61, 0.68]), np.array([0.6, 0.66, 0.56])
+    exact = batchMM(p1, p2, "0-0", "3-2")["V1"]
+    # Default server: player 2 serves at 3-2 when player 1 served first
+    np.testing.assert_allclose(gridMM(g, p1, p2, "0-0", "3-2"), exact, atol=2e-3)
+    assert gridMM(g, 0.65, 0.6, "0-0", "3-2") == pytest.approx(gridMM(g, 0.65, 0.6, "0-0", "3-2", server=2))
+
+def test_outside_the_grid(built):
+    with pytest.raises(ValueError):
+        gridMM(loadGrid(built), 0.5, 0.6)
+
+def _rewrite_header(src, dst, **changes):
+    # Copies a grid file with header fields changed (None drops them), padding
+    # the header to its old length so the values keep their offset
+    data = src.read_bytes()
+    start = len(MAGIC) + 8
+    n = int.from_bytes(data[len(MAGIC):start], "little")
+    header = json.loads(data[start:start + n])
+    header.update(changes)
+    new = json.dumps({k: v for k, v in header.items() if v is not None}).encode()
+    assert len(new) <= n
+    dst.write_bytes(data[:start] + new.ljust(n) + data[start + n:])
+
+@pytest.mark.parametrize("version", [grid.VERSION - 1, None])
+def test_other_model_version_is_rejected(built, tmp_path, version):
+    _rewrite_header(built, tmp_path / "old.bin", version=version)
+    with pytest.raises(ValueError, match="version"):
+        loadGrid(tmp_path / "old.bin")
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+from scipy.integrate import quad
+from scipy.stats import beta as beta_dist
+
+from grid import buildGrid, gridMM
+from inplay import InPlay, _cdfs, node_weights
+from replay import replay
+
+AXIS = np.round(np.linspace(0.5, 0.75, 26), 10)
+
+@pytest.fixture(scope="module")
+def grid(tmp_path_factory):
+    return buildGrid(tmp_path_factory.mktemp("grid") / "grid.bin", AXIS, AXIS, dtype="float64")
+
+@pytest.mark.parametrize("a, b", [(6.4, 3.6), (64, 36), (30, 30), (900, 100)])
+def test_node_weights_match_quadrature(a, b):
+    w = node_weights(AXIS, a, b)[0]
+    assert w.sum() == pytest.approx(1, abs=1e-12)
+    pdf = beta_dist(a, b).pdf
+    for k in range(len(AXIS)):
+        # Hat function of node k, flat outside the grid
+        hat = np.zeros(len(AXIS))
+        hat[k] = 1
+        expected = sum(quad(lambda x: np.interp(x, AXIS, hat) * pdf(x), lo, hi, epsabs=1e-13)[0]
+                       for lo, hi in zip(np.r_[0, AXIS], np.r_[AXIS, 1]))
+        assert w[k] == pytest.approx(expected, abs=1e-9)
+
+def test_incremental_updates_match_fresh_evaluation(grid):
+    rng = np.random.default_rng(5)
+    live = InPlay(grid)
+    ids = live.add([0.64, 0.6, 0.7], [0.6, 0.66, 0.55], strength=[50, 200, 20])
+    for _ in range(300):
+        going = ids[~live._over[ids]]
+        if not going.size:
+            break
+        live.point(going, rng.integers(1, 3, len(going)))
+    assert live.alpha.sum() + live.beta.sum() > 300
+    for player, axis in enumerate((grid["p1"], grid["p2"])):
+        I0, I1 = _cdfs(axis, live.alpha[:, player], live.beta[:, player])
+        np.testing.assert_allclose(live._I0[player], I0, atol=1e-10)
+        np.testing.assert_allclose(live._I1[player], I1, atol=1e-10)
+        np.testing.assert_allclose(live._w[player], node_weights(axis, live.alpha[:, player], live.beta[:, player]),
+                                   atol=1e-10)
+
+def test_strong_prior_approaches_grid(grid):
+    # On grid nodes gridMM is exact, so a near-certain prior prices as replay
+    points = [1, 1, 2, 1, 2, 2, 2, 1, 1, 1, 2, 2, 1, 2, 1, 1, 1, 2, 2, 2, 2, 1, 2, 1]
+    path = next(replay([(points, 0.64, 0.6, 2)]))
+    errors = []
+    for strength in (1e2, 1e4, 1e6):
+        live = InPlay(grid)
+        i = live.add(0.64, 0.6, strength=strength, server=2)
+        prices = [live.prices(i)["V1"][0]] + [live.point(i, w)["V1"][0] for w in points]
+        errors.append(np.abs(np.array(prices) - path).max())
+    assert errors[0] > errors[1] > errors[2]
+    assert errors[2] < 1e-3
+    live = InPlay(grid)
+    i = live.add(0.615, 0.652, strength=1e7)
+    assert live.prices(i)["V1"][0] == pytest.approx(gridMM(grid, 0.615, 0.652), abs=1e-3)
+
+def test_invalid_points(grid):
+    live = InPlay(grid)
+    with pytest.raises(ValueError):
+        live.add(1.0, 0.6)
+    i = live.add(0.64, 0.6)
+    for ids, winner in ((i, 3), ([0, 0], 1), (5, 1)):
+        with pytest.raises(ValueError):
+            live.point(ids, winner)
@@ -0,0 +1,67 @@
+import logging
+
+import pytest
+
+import instrument
+from cache import LayerCache
+from core import batchMM
+from functions import resGAME, s0game
+from instrument import Aggregator, LogSink, emit, enabled, span, timed
+
+def test_aggregator_counts_timed_span_and_cache_events():
+    agg = Aggregator()
+    with enabled(agg):
+        batchMM([0.64, 0.6, 0.7], [0.6, 0.62, 0.55])
+    stats = agg.summary()
+    assert stats["core.batchMM"]["calls"] == 1 and stats["core.batchMM"]["rows"] == 3
+    assert stats["core.batchMM"]["seconds"] > 0
+    # Solves are keyed by the size of their chain: two game solves (one per
+    # server), then the tie-break, set and match
+    for states, rows in ((17, 6), (54, 3), (41, 3), (10, 3)):
+        assert stats[f"core.absorb[{states}]"]["rows"] == rows
+
+    agg.clear()
+    cache = LayerCache()
+    with enabled(agg):
+        resGAME(0.64, s0game)
+        cache.price(0.64, 0.6, "0-0", "0-0")
+        cache.price(0.64, 0.6, "0-0", "0-0")
+    stats = agg.summary()
+    assert stats["functions.resGAME"]["calls"] == 1
+    assert stats["functions.frame.game"]["calls"] == 1
+    assert stats["cache.game"]["misses"] >= 1 and stats["cache.game"]["hits"] >= 1
+    assert stats["cache.match"]["hit_rate"] == pytest.approx(0.5)
+
+def test_nothing_is_emitted_when_disabled():
+    events = []
+    with enabled(events.append):
+        emit("inside")
+    assert instrument._sink is None
+    batchMM(0.64, 0.6)
+    emit("outside")
+    with span("outside.span"):
+        pass
+    assert [e["name"] for e in events] == ["inside"]
+    assert span("x") is instrument._NULL
+
+def test_timed_sizes_and_nesting():
+    events = []
+
+    @timed("test.double", lambda args, res: {"n": len(res)})
+    def double(x):
+        return x * 2
+
+    outer = Aggregator()
+    with enabled(outer):
+        with enabled(events.append):
+            assert double([1]) == [1, 1]
+        double([1, 2])
+    assert events[0]["name"] == "test.double" and events[0]["n"] == 2
+    assert outer.summary()["test.double"]["rows"] == 4
+    outer.clear()
+    assert outer.summary() == {}
+
+def test_log_sink(caplog):
+    with caplog.at_level(logging.DEBUG, logger="tennis.instrument"), enabled(LogSink()):
+        emit("cache.game", hit=True)
+    assert '"name": "cache.game"' in caplog.text
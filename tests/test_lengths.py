@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from core import _played, absorb_steps, batchMC, chain_template, step_distribution
+from distributions import lengthMM
+from simulator import simulate
+
+LEVELS = [("game", (0.63,)), ("tb", (0.62, 0.58)), ("set", (0.8, 0.75, 0.55)), ("match", (0.6,))]
+
+def _power_distribution(level, params, k_max):
+    # P(T = k) from every state by explicit powers of the matrix restricted to
+    # the states left by a played step: P(T > k) = Q^k 1
+    tMat = batchMC(level, *params)[0]
+    live = _played(chain_template(level))
+    Q = tMat[np.ix_(live, live)]
+    survival = np.zeros((len(tMat), k_max + 1))
+    s = np.ones(live.sum())
+    for k in range(k_max + 1):
+        survival[live, k] = s
+        s = Q @ s
+    before = np.concatenate([np.ones((len(tMat), 1)), survival[:, :-1]], axis=1)
+    return before - survival
+
+@pytest.mark.parametrize("level, params", LEVELS)
+def test_steps_match_matrix_powers(level, params):
+    template = chain_template(level)
+    dist = step_distribution(template, *params)[0]
+    power = _power_distribution(level, params, dist.shape[1] - 1)
+    np.testing.assert_allclose(dist, power, atol=1e-12)
+    assert dist.sum(axis=1) == pytest.approx(1, abs=1e-10)
+    mean, var = absorb_steps(template, *params)
+    k = np.arange(dist.shape[1])
+    np.testing.assert_allclose(mean[0], power @ k, atol=1e-8)
+    np.testing.assert_allclose(var[0], power @ k ** 2 - (power @ k) ** 2, atol=1e-7)
+
+@pytest.mark.parametrize("level, params", LEVELS)
+def test_distribution_from_a_start(level, params):
+    template = chain_template(level)
+    every = step_distribution(template, *params)[0]
+    for i in range(len(template.states)):
+        from_i = step_distribution(template, *params, start=i)[0]
+        np.testing.assert_allclose(from_i, every[i, :len(from_i)], atol=1e-12)
+
+def test_lengths_match_simulator():
+    n = 100_000
+    sim = simulate(0.64, 0.6, n, seed=9)
+    res = lengthMM(0.64, 0.6)
+    for observed, dist in (((sim["set_scores"].sum(axis=2) > 0).sum(axis=1), res["match"]["dist"][0]),
+                           (sim["set_scores"][:, 0].sum(axis=1), res["set"]["dist"][0])):
+        for k, p in enumerate(dist):
+            assert abs(np.mean(observed == k) - p) < 4 * np.sqrt(p * (1 - p) / n) + 1e-12, k
+    sets = (sim["set_scores"].sum(axis=2) > 0).sum(axis=1)
+    assert abs(sets.mean() - res["match"]["mean"][0]) < 4 * np.sqrt(res["match"]["var"][0] / n)
+
+def test_lengths_from_a_score():
+    res = lengthMM([0.64, 0.6], [0.6, 0.66], setscore="1-1", gamescore="6-6", pointscore="40-30(A-40)")
+    np.testing.assert_allclose(res["match"]["dist"][:, 1], 1, atol=1e-12)
+    np.testing.assert_allclose(res["set"]["dist"][:, 1], 1, atol=1e-12)
+    np.testing.assert_allclose(res["game1"]["mean"], res["game1"]["dist"] @ np.arange(res["game1"]["dist"].shape[1]),
+                               atol=1e-8)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from core import absorb, batchLiveMM, batchMC, batchMM, liveMM, liveValues, match_index, tb_index
+from formats import flat_template
+
+P1, P2 = 0.64, 0.6
+
+def _tiebreak_price(pointscore):
+    # V1 at 0-0 in sets, 6-6, from the tie-break chain (player 1 served first)
+    pset_v1 = batchMM(P1, P2)["pset_v1"]
+    ptb = absorb(batchMC("tb", P1, P2))[0, tb_index[pointscore], tb_index["SETv1"]]
+    match = absorb(batchMC("match", pset_v1))[0]
+    return ptb * match[match_index["1-0"], match_index["V1"]] + (1 - ptb) * match[match_index["0-1"], match_index["V1"]]
+
+@pytest.mark.parametrize("pointscore, server", [("0-0", 1), ("1-0", 2), ("2-1", 1), ("3-4", 1), ("4-1", 2), ("5-4", 2)])
+def test_tiebreak_default_server(pointscore, server):
+    values = liveValues(P1, P2)
+    v1 = batchLiveMM(P1, P2, "0-0", "6-6", pointscore)["V1"][0]
+    assert v1 == pytest.approx(liveMM(values, "0-0", "6-6", pointscore, server), abs=1e-12)
+    assert v1 == pytest.approx(_tiebreak_price(pointscore), abs=1e-12)
+
+def test_batch_live_matches_scalar():
+    rng = np.random.default_rng(0)
+    p1, p2 = rng.uniform(0.55, 0.72, 4), rng.uniform(0.55, 0.72, 4)
+    scores = [("1-0", "3-2", "15-30", 2), ("0-1", "6-6", "3-3", 1), ("1-1", "5-4", "40-A", 1), ("0-0", "0-0", "0-0", 1)]
+    res = batchLiveMM(p1, p2, *map(list, zip(*scores)))
+    for i, score in enumerate(scores):
+        assert res["V1"][i] == pytest.approx(liveMM(liveValues(p1[i], p2[i]), *score), abs=1e-12)
+
+def _live_score(state):
+    # flat_template label "s1-s2 g1-g2 a-b" as (setscore, gamescore, pointscore)
+    setscore, gamescore, points = state.split()
+    if gamescore == "6-6":
+        return setscore, gamescore, points
+    a, b = map(int, points.split("-"))
+    return setscore, gamescore, f"{['0', '15', '30', '40', 'A'][a]}-{['0', '15', '30', '40', 'A'][b]}"
+
+@pytest.mark.parametrize("p1, p2", [(0.64, 0.6), (0.52, 0.71)])
+def test_live_tables_match_flat_chain(p1, p2):
+    sparse = pytest.importorskip("sparse")
+    states = flat_template().states
+    live = [i for i, s in enumerate(states) if s not in ("V1", "V2")]
+    n = len(live)
+    res = batchLiveMM(np.full(n, p1), np.full(n, p2), *map(list, zip(*(_live_score(states[i]) for i in live))))
+    np.testing.assert_allclose(res["V1"], sparse.flatMM(p1, p2)[live], atol=1e-12)
+
+@pytest.mark.parametrize("setscore, gamescore", [("0-0", "3-2"), ("1-0", "0-1"), ("1-1", "4-5")])
+def test_default_server_at_odd_game_score(setscore, gamescore):
+    # Player 2 serves after an odd number of games when player 1 served first
+    values = liveValues(0.65, 0.6)
+    expected = batchMM(0.65, 0.6, setscore, gamescore)["V1"][0]
+    assert liveMM(values, setscore, gamescore) == pytest.approx(expected, abs=1e-12)
+    assert liveMM(values, setscore, gamescore, server=2) == pytest.approx(expected, abs=1e-12)
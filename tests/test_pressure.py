@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from core import absorb, batchMC, batchMM, chain_template, classed_template, game_matrix, game_states
+from pressure import PRESSURE_CLASSES, _game_classes, pressureMM
+
+P1 = {"regular": 0.64, "break_point": 0.57, "set_point": 0.6, "tiebreak": 0.67}
+P2 = {"regular": 0.62, "break_point": 0.66, "set_point": 0.55, "tiebreak": 0.6}
+
+@pytest.mark.parametrize("setscore, gamescore", [("0-0", "0-0"), ("1-0", "5-4"), ("1-1", "6-6"), ("0-1", "4-5")])
+def test_equal_classes_match_batchmm(setscore, gamescore):
+    p1, p2 = np.array([0.64, 0.58]), np.array([0.6, 0.67])
+    res = pressureMM({k: p1 for k in PRESSURE_CLASSES}, {k: p2 for k in PRESSURE_CLASSES}, setscore, gamescore)
+    for key, value in batchMM(p1, p2, setscore, gamescore).items():
+        np.testing.assert_allclose(res[key], value, atol=1e-14)
+
+def test_classed_template_matches_hand_edited_matrix():
+    # Game where the server wins break points with probability q: the rows of
+    # the break-point states come from the chain at q
+    p, q = 0.64, 0.52
+    classes = _game_classes(None)
+    tMat = game_matrix(p)
+    for i, c in enumerate(classes):
+        if c == 1:
+            tMat[i] = game_matrix(q)[i]
+    template = classed_template("game", classes)
+    np.testing.assert_allclose(batchMC("game", [p, q], classes=classes)[0], tMat, atol=1e-15)
+    np.testing.assert_allclose(absorb(batchMC("game", [p, q], classes=classes))[0], absorb(tMat), atol=1e-14)
+    assert template.n_params == 2 and template.rows is chain_template("game").rows
+
+def test_classed_template_one_class_per_state():
+    p = np.linspace(0.5, 0.7, len(game_states))
+    tMat = batchMC("game", p, classes=tuple(range(len(game_states))))[0]
+    for i in range(len(game_states)):
+        np.testing.assert_allclose(tMat[i], game_matrix(p[i])[i], atol=1e-15)
+
+def test_invalid_classes():
+    with pytest.raises(ValueError):
+        classed_template("game", (0, 1))
+    with pytest.raises(ValueError):
+        pressureMM({"break_point": 0.6}, 0.6)
+
+def _point_class(set_point, break_point, tiebreak):
+    return "set_point" if set_point else "break_point" if break_point else "tiebreak" if tiebreak else "regular"
+
+def _set_over(g1, g2):
+    return g1 == 7 or g2 == 7 or (max(g1, g2) == 6 and min(g1, g2) <= 4)
+
+def _simulate(n, rng):
+    # Point-by-point best of 3, player 1 serving first in every set and
+    # tie-break, each point played at the probability of its class
+    p = {1: P1, 2: P2}
+    wins = 0
+    u = iter(rng.random(n * 400))
+    for _ in range(n):
+        sets = [0, 0]
+        while max(sets) < 2:
+            g = [0, 0]
+            while not _set_over(*g):
+                if g == [6, 6]:
+                    x = [0, 0]
+                    while not (max(x) >= 7 and abs(x[0] - x[1]) >= 2):
+                        k = sum(x)
+                        server = 1 if ((k + 1) // 2) % 2 == 0 else 2
+                        cls = _point_class(max(x) >= 6 and x[0] != x[1], False, True)
+                        won = next(u) < p[server][cls]
+                        x[server - 1 if won else 2 - server] += 1
+                    g[0 if x[0] > x[1] else 1] += 1
+                    continue
+                server = 1 if sum(g) % 2 == 0 else 2
+                s, r = server - 1, 2 - server
+                a = b = 0
+                while not (max(a, b) >= 4 and abs(a - b) >= 2):
+                    game_point, break_point = a >= 3 and a > b, b >= 3 and b > a
+                    held, broke = list(g), list(g)
+                    held[s] += 1
+                    broke[r] += 1
+                    set_point = (game_point and _set_over(*held)) or (break_point and _set_over(*broke))
+                    if next(u) < p[server][_point_class(set_point, break_point, False)]:
+                        a += 1
+                    else:
+                        b += 1
+                g[s if a > b else r] += 1
+            sets[0 if g[0] > g[1] else 1] += 1
+        wins += sets[0] == 2
+    return wins / n
+
+def test_pressure_matches_simulation():
+    n = 20_000
+    v1 = pressureMM(P1, P2)["V1"][0]
+    assert abs(_simulate(n, np.random.default_rng(7)) - v1) < 4 * np.sqrt(v1 * (1 - v1) / n)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ratings import Ratings, ppoints
+
+def _matches(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    players = np.array(["a", "b", "c", "d", "e"])
+    pairs = np.array([rng.choice(players, 2, replace=False) for _ in range(n)])
+    svpt = rng.integers(40, 120, (n, 2))
+    return pd.DataFrame({
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 700, n), unit="D"),
+        "surface": rng.choice(["Hard", "Clay", "Grass"], n), "player1": pairs[:, 0], "player2": pairs[:, 1],
+        "svpt1": svpt[:, 0], "svwon1": rng.binomial(svpt[:, 0], 0.64), "svpt2": svpt[:, 1],
+        "svwon2": rng.binomial(svpt[:, 1], 0.6)})
+
+def _sorted(sums):
+    return sums.sort_index()
+
+def test_incremental_matches_single_pass():
+    matches = _matches()
+    single = Ratings(half_life=180).update(matches)
+    incremental = Ratings(half_life=180)
+    # Out of date order, in uneven chunks
+    shuffled = matches.sample(frac=1, random_state=1)
+    for lo, hi in ((0, 10), (10, 150), (150, 151), (151, len(shuffled))):
+        incremental.update(shuffled.iloc[lo:hi])
+    assert incremental.ref == single.ref
+    pd.testing.assert_frame_equal(_sorted(incremental.sums), _sorted(single.sums), rtol=1e-10)
+    pd.testing.assert_frame_equal(incremental.table(), single.table(), rtol=1e-10)
+
+def test_decay_weights():
+    matches = _matches(2).assign(date=[pd.Timestamp("2024-01-01"), pd.Timestamp("2024-07-01")],
+                                 player1=["a", "c"], player2=["b", "d"])
+    r = Ratings(half_life=182).update(matches)
+    # The older match counts half, one half-life before the latest
+    assert r.sums.loc[("a", "all"), "serve_pts"] == pytest.approx(0.5 * matches["svpt1"].iloc[0])
+    assert r.sums.loc[("c", "all"), "serve_pts"] == pytest.approx(matches["svpt1"].iloc[1])
+    later = Ratings(half_life=182).update(matches.iloc[[0]]).update(matches.iloc[[1]])
+    pd.testing.assert_frame_equal(_sorted(later.sums), _sorted(r.sums), rtol=1e-12)
+
+def test_save_load_round_trip(tmp_path):
+    r = Ratings(half_life=90).update(_matches())
+    r.save(tmp_path / "ratings.csv")
+    loaded = Ratings.load(tmp_path / "ratings.csv")
+    assert loaded.ref == r.ref and loaded.half_life == r.half_life
+    pd.testing.assert_frame_equal(_sorted(loaded.sums), _sorted(r.sums), check_dtype=False)
+
+def test_ppoints_fall_back_to_tour():
+    table = Ratings().update(_matches()).table()
+    res = ppoints(table, ["a", "zz"], ["b", "yy"], "hard")
+    assert np.all((res["ppoint_srv1"] > 0) & (res["ppoint_srv1"] < 1))
+    assert res["ppoint_srv1"][1] == pytest.approx(table.attrs["tour"][0])
+
+def test_table_needs_matches():
+    with pytest.raises(ValueError):
+        Ratings().table()
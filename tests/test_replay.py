@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from core import batchLiveMM
+from replay import parse_points, replay
+
+NAMES = ["0", "15", "30", "40"]
+
+def _score(winners, first_server):
+    # Reference scorer: (setscore, gamescore, pointscore, server of the next
+    # point) before every point, the winner, and the number of points played
+    # and the longest tie-break, point by point with the serve carried across sets
+    sets, games, pts = [0, 0], [0, 0], [0, 0]
+    game_server, scores, longest = first_server, [], 0
+    for t, w in enumerate(winners):
+        tb = games == [6, 6]
+        if tb:
+            k = sum(pts)
+            server = game_server if ((k + 1) // 2) % 2 == 0 else 3 - game_server
+            pointscore = f"{pts[0]}-{pts[1]}"
+        else:
+            server = game_server
+            a, b = pts[server - 1], pts[2 - server]
+            if a >= 3 and b >= 3:
+                pointscore = "40-40" if a == b else "A-40" if a > b else "40-A"
+            else:
+                pointscore = f"{NAMES[a]}-{NAMES[b]}"
+        scores.append((f"{sets[0]}-{sets[1]}", f"{games[0]}-{games[1]}", pointscore, server))
+        pts[w - 1] += 1
+        need = 7 if tb else 4
+        if max(pts) >= need and abs(pts[0] - pts[1]) >= 2:
+            longest = max(longest, sum(pts)) if tb else longest
+            games[0 if pts[0] > pts[1] else 1] += 1
+            pts = [0, 0]
+            game_server = 3 - game_server
+            if tb or (max(games) >= 6 and abs(games[0] - games[1]) >= 2):
+                sets[0 if games[0] > games[1] else 1] += 1
+                games = [0, 0]
+                if max(sets) == 2:
+                    return scores, 1 if sets[0] == 2 else 2, t + 1, longest
+    return scores, None, len(winners), longest
+
+def _play(rng, p1, p2, first_server):
+    # Random point winners at the serve probabilities, up to the end of the match
+    winners = []
+    while _score(winners, first_server)[1] is None:
+        # Server of the next point, from the score before a dummy point
+        server = _score(winners + [1], first_server)[0][-1][3]
+        p = p1 if server == 1 else p2
+        winners.append(server if rng.random() < p else 3 - server)
+    return winners
+
+def _relative(winners, first_server, rng):
+    # The same points as S/A (server won) and R/D (receiver won) codes, with separators
+    scores, _, _, _ = _score(winners, first_server)
+    codes = [rng.choice(["S", "A"]) if w == s[3] else rng.choice(["R", "D"]) for w, s in zip(winners, scores)]
+    return "".join(c + rng.choice(["", "", ";", ".", "/"]) for c in codes)
+
+def _expected(winners, p1, p2, first_server):
+    scores, winner, played, longest = _score(winners, first_server)
+    v1 = batchLiveMM(np.full(len(scores), p1), np.full(len(scores), p2), *map(list, zip(*scores)))["V1"]
+    return np.append(v1, float(winner == 1)), played, longest
+
+@pytest.fixture(scope="module")
+def matches():
+    rng = np.random.default_rng(11)
+    out = []
+    for i in range(12):
+        # Strong servers make tie-breaks, and long ones, common
+        p1, p2 = (0.9, 0.88) if i % 3 == 0 else (rng.uniform(0.55, 0.7), rng.uniform(0.55, 0.7))
+        first_server = 1 + i % 2
+        out.append((_play(rng, p1, p2, first_server), p1, p2, first_server))
+    return out
+
+def test_paths_match_batch_live_pricing(matches):
+    rng = np.random.default_rng(3)
+    longest = 0
+    inputs = []
+    for i, (winners, p1, p2, first_server) in enumerate(matches):
+        # Trailing points after the end are dropped
+        points = winners + [1, 2, 2] if i % 4 == 1 else winners
+        if i % 3 == 2:
+            points = _relative(points, first_server, rng)
+        elif i % 2:
+            points = "".join(map(str, points))
+        inputs.append((points, p1, p2, first_server))
+    paths = list(replay(inputs, chunk_size=5))
+    assert len(paths) == len(matches)
+    for path, (winners, p1, p2, first_server) in zip(paths, matches):
+        expected, played, tb = _expected(winners, p1, p2, first_server)
+        longest = max(longest, tb)
+        assert len(path) == played + 1
+        np.testing.assert_allclose(path, expected, atol=1e-12)
+    # Some tie-break went past 6-6
+    assert longest > 14
+
+def test_unfinished_match(matches):
+    # A path stops at the last point recorded, priced from the score it leaves
+    winners, p1, p2, first_server = matches[1]
+    path = next(replay([(winners[:50], p1, p2, first_server)]))
+    np.testing.assert_allclose(path, _expected(winners[:51], p1, p2, first_server)[0][:51], atol=1e-12)
+
+def test_parse_points():
+    outcomes, relative = parse_points("SA;R.D/ S")
+    assert relative and outcomes.tolist() == [1, 1, 2, 2, 1]
+    outcomes, relative = parse_points("1 2\n21")
+    assert not relative and outcomes.tolist() == [1, 2, 2, 1]
+    assert parse_points([1, 2, 2])[0].tolist() == [1, 2, 2]
+    for bad in ("SX", "12S", [1, 3]):
+        with pytest.raises(ValueError):
+            parse_points(bad)
+
+def test_invalid_server():
+    with pytest.raises(ValueError):
+        next(replay([("SSSS", 0.6, 0.6, 3)]))
@@ -0,0 +1,58 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import server
+from core import batchLiveMM
+from server import PricingServer
+
+def _price_all(requests, **kwargs):
+    async def go():
+        pricer = PricingServer(window=0.01, **kwargs)
+        out = await asyncio.gather(*[pricer.price(r) for r in requests], return_exceptions=True)
+        return out, pricer.metrics()
+    return asyncio.run(go())
+
+def test_prices_match_batch_live():
+    requests = [{"ppoint_srv1": 0.64, "ppoint_srv2": 0.6, "gamescore": "6-6", "pointscore": "1-0"},
+                {"ppoint_srv1": 0.62, "ppoint_srv2": 0.65, "setscore": "1-0", "gamescore": "3-2", "pointscore": "15-30"}]
+    out, metrics = _price_all(requests)
+    ref = batchLiveMM([0.64, 0.62], [0.6, 0.65], ["0-0", "1-0"], ["6-6", "3-2"], ["1-0", "15-30"])
+    np.testing.assert_allclose([o["V1"] for o in out], ref["V1"], atol=1e-14)
+    assert metrics["batches"] == 1
+
+@pytest.mark.parametrize("p", [0.0, 1.0, 1.2, -0.1])
+def test_out_of_range_probabilities_are_rejected(p):
+    out, metrics = _price_all([{"ppoint_srv1": p, "ppoint_srv2": 0.6}])
+    assert isinstance(out[0], ValueError)
+    assert metrics["errors"] == 1
+
+def test_failed_row_does_not_fail_the_batch(monkeypatch):
+    def fragile(p1, p2, *scores):
+        if 0.5 in p1:
+            raise np.linalg.LinAlgError("Singular matrix")
+        return batchLiveMM(p1, p2, *scores)
+    monkeypatch.setattr(server, "batchLiveMM", fragile)
+    out, metrics = _price_all([{"ppoint_srv1": 0.64, "ppoint_srv2": 0.6}, {"ppoint_srv1": 0.5, "ppoint_srv2": 0.6},
+                               {"ppoint_srv1": 0.62, "ppoint_srv2": 0.6}])
+    assert isinstance(out[1], np.linalg.LinAlgError)
+    assert out[0]["V1"] == pytest.approx(batchLiveMM(0.64, 0.6)["V1"][0], abs=1e-14)
+    assert out[2]["V1"] == pytest.approx(batchLiveMM(0.62, 0.6)["V1"][0], abs=1e-14)
+    assert metrics["errors"] == 1
+
+def test_answer_reports_pricing_failures(monkeypatch):
+    def broken(*args):
+        raise RuntimeError("solver crashed")
+    monkeypatch.setattr(server, "batchLiveMM", broken)
+
+    class Writer:
+        lines = []
+        def write(self, data):
+            self.lines.append(data.decode())
+        async def drain(self):
+            pass
+
+    writer = Writer()
+    asyncio.run(PricingServer(window=0.001)._answer(b'{"id": 7, "ppoint_srv1": 0.6, "ppoint_srv2": 0.6}', writer))
+    assert writer.lines == ['{"error": "RuntimeError: solver crashed", "id": 7}\n']
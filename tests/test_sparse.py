@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+
+from core import absorb, batchMC, batchMM
+from formats import BEST_OF_5, GRAND_SLAM, formatMM
+from functions import resSET, s0set
+from sparse import absorb_sparse, flatMM
+
+@pytest.mark.parametrize("level, params", [("game", (0.63,)), ("tb", (0.62, 0.58)),
+                                           ("set", (0.8, 0.75, 0.55)), ("match", (0.6,))])
+def test_absorb_sparse_matches_dense(level, params):
+    tMat = batchMC(level, *params)[0]
+    np.testing.assert_allclose(absorb_sparse(tMat).toarray(), absorb(tMat), atol=1e-12)
+
+def test_flat_chain_matches_layers():
+    assert flatMM(0.64, 0.6)[0] == pytest.approx(batchMM(0.64, 0.6)["V1"][0], abs=1e-12)
+
+@pytest.mark.parametrize("fmt", [BEST_OF_5, GRAND_SLAM])
+def test_flat_chain_matches_formats(fmt):
+    assert flatMM(0.64, 0.6, fmt)[0] == pytest.approx(formatMM(fmt, 0.64, 0.6)["V1"][0], abs=1e-12)
+
+def test_sparse_method():
+    np.testing.assert_allclose(resSET(0.8, 0.75, 0.55, s0set, method="sparse").to_numpy(),
+                               resSET(0.8, 0.75, 0.55, s0set).to_numpy(), atol=1e-12)
@@ -0,0 +1,58 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from tournament import advancement, head_to_head, tournamentMM
+
+def _brute_force(H, draw):
+    # Probability that each position wins the draw, over every bracket outcome
+    n = len(draw)
+    wins = np.zeros(n)
+    for outcome in itertools.product((0, 1), repeat=n - 1):
+        alive, prob, bits = list(range(n)), 1.0, iter(outcome)
+        while len(alive) > 1:
+            nxt = []
+            for a, b in zip(alive[::2], alive[1::2]):
+                if draw[a] < 0 or draw[b] < 0:
+                    # A bye: the other position goes through, whatever the bit
+                    next(bits)
+                    nxt.append(a if draw[b] < 0 else b)
+                    prob *= 0.5
+                    continue
+                winner = a if next(bits) == 0 else b
+                prob *= H[draw[a], draw[b]] if winner == a else H[draw[b], draw[a]]
+                nxt.append(winner)
+            alive = nxt
+        wins[alive[0]] += prob
+    return wins
+
+def test_outrights_match_enumeration():
+    rng = np.random.default_rng(0)
+    serve, ret = rng.uniform(0.6, 0.7, 8), rng.uniform(0.33, 0.4, 8)
+    H = head_to_head(serve, ret)
+    np.testing.assert_allclose(H + H.T, 1, atol=1e-12)
+    draw = [3, 0, 5, 1, 7, 2, 6, 4]
+    res = tournamentMM(serve, ret, draw)
+    np.testing.assert_allclose(res["reach"][:, -1], _brute_force(H, draw), atol=1e-12)
+    np.testing.assert_allclose(res["reach"].sum(axis=0), [8, 4, 2, 1], atol=1e-12)
+
+def test_byes():
+    rng = np.random.default_rng(1)
+    H = head_to_head(rng.uniform(0.6, 0.7, 6), rng.uniform(0.33, 0.4, 6))
+    draw = [0, -1, 1, 2, 3, -1, 4, 5]
+    np.testing.assert_allclose(advancement(H, draw)["reach"][:, -1], _brute_force(H, draw), atol=1e-12)
+
+def test_results_fix_the_bracket():
+    H = np.array([[.5, .6, .7, .8], [.4, .5, .6, .7], [.3, .4, .5, .6], [.2, .3, .4, .5]])
+    reach = advancement(H, [0, 1, 2, 3], [[0]])["reach"]
+    np.testing.assert_array_equal(reach[:2, 1], [1, 0])
+    # Player 0 meets player 2 (who beats 3 w.p. 0.6) or player 3 in the final
+    np.testing.assert_allclose(reach[:, -1], [0.6 * 0.7 + 0.4 * 0.8, 0, 0.6 * 0.3, 0.4 * 0.2], atol=1e-15)
+
+def test_final_needs_both_semifinals():
+    H = np.full((4, 4), 0.5)
+    with pytest.raises(ValueError, match="not decided"):
+        advancement(H, [0, 1, 2, 3], [[0], [0]])
+    reach = advancement(H, [0, 1, 2, 3], [[0, 3], [0]])["reach"]
+    np.testing.assert_array_equal(reach[:, -1], [1, 0, 0, 0])
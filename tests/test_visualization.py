@@ -0,0 +1,51 @@
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("matplotlib")
+pytest.importorskip("networkx")
+
+import visualization
+from functions import resGAME, resMATCH, s0game, s0match
+from instrument import Aggregator, enabled
+from visualization import render_chains
+
+PNG = b"\x89PNG"
+
+def test_render_chains_writes_files_and_reuses_layouts(tmp_path):
+    visualization._structure.cache_clear()
+    paths = [tmp_path / f"game{i}.png" for i in range(3)]
+    agg = Aggregator()
+    with enabled(agg):
+        assert render_chains("game", [0.6, 0.65, 0.7], paths=paths, titles=["a", "b", "c"]) == paths
+        render_chains("game", [0.55], paths=[tmp_path / "again.svg"])
+    for path in paths:
+        assert path.read_bytes().startswith(PNG)
+    assert b"<svg" in (tmp_path / "again.svg").read_bytes()
+    # One layout for the first call, taken from the cache by the second
+    layout = agg.summary()["visualization.layout"]
+    assert (layout["misses"], layout["hits"]) == (1, 1)
+    assert visualization._structure.cache_info().hits == 1
+
+def test_render_chains_checks_paths(tmp_path):
+    with pytest.raises(ValueError):
+        render_chains("match", [0.6, 0.7], paths=[tmp_path / "one.png"])
+
+def test_graph_option_writes_the_diagram(tmp_path):
+    s_match = s0match.copy()
+    s_match.iloc[0, 0] = 1
+    resGAME(0.64, s0game, graph=str(tmp_path / "game.png"))
+    resMATCH(0.6, s_match, graph=str(tmp_path / "match.png"))
+    assert (tmp_path / "game.png").read_bytes().startswith(PNG)
+    assert (tmp_path / "match.png").read_bytes().startswith(PNG)
+
+def test_files_are_written_without_a_display(tmp_path):
+    # Fresh interpreter with no display: file output draws on its own Agg
+    # canvases, so pyplot manages no figure
+    code = ("import sys; from visualization import render_chains; "
+            f"render_chains('tb', [0.6], [0.62], paths=[{str(tmp_path / 'tb.png')!r}]); "
+            "import matplotlib.pyplot as plt; assert plt.get_fignums() == []")
+    env = {"PATH": "", "MPLBACKEND": "", "PYTHONPATH": str(visualization.__file__).rsplit("/", 1)[0]}
+    subprocess.run([sys.executable, "-c", code], check=True, env=env, cwd=tmp_path)
+    assert (tmp_path / "tb.png").read_bytes().startswith(PNG)
@@ -0,0 +1,126 @@
+##### Knockout tournaments
+## Outright prices for a single-elimination draw from per-player strengths.
+## (a) Head-to-head: player i serving against player j wins a point with
+#   p[i, j] = tour_serve + (serve[i] - tour_serve) - (ret[j] - tour_return)
+## (serve: share of serve points won, ret: share of return points won, the
+## tour averages default to the means of the field), and every ordered pair is
+## priced in one batch (core.batchLiveMM, or formats.formatMM for other
+## formats), averaged over who serves first.
+## (b) Draw: positions 0..2^R-1 in bracket order (position 2k meets 2k+1 in
+## the first round, and so on), holding player ids or -1 for a bye. Round by
+## round, a position reaches the next round with the probability that it
+## reached this one times its chance to beat whoever arrives from the other
+## half of its block, as a batched (blocks, s, s) @ (blocks, s) product.
+## Decided matches (results) and live prices of matches in progress (live)
+## are applied as the propagation goes, so outrights can be updated from any
+## partially completed draw.
+
+import numpy as np
+
+from core import batchLiveMM
+from formats import formatMM
+from instrument import timed
+
+def serve_matrix(serve, ret, tour=None):
+    """
+    Matrix (N, N) of the probability that player i wins a point on serve
+    against player j, clipped to [0.01, 0.99].
+    """
+    serve, ret = np.asarray(serve, dtype=float), np.asarray(ret, dtype=float)
+    tour = (serve.mean(), ret.mean()) if tour is None else tour
+    return matchup(serve[:, None], ret[None, :], tour)
+
+def matchup(serve, ret, tour):
+    """
+    Probability that a server with serve point share `serve` wins a point
+    against a receiver with return point share `ret` (arrays broadcast), given
+    the tour averages (serve, return), clipped to [0.01, 0.99].
+    """
+    tour_serve, tour_return = tour
+    return np.clip(tour_serve + (np.asarray(serve) - tour_serve) - (np.asarray(ret) - tour_return), 0.01, 0.99)
+
+@timed("tournament.head_to_head", lambda args, H: {"n": len(H)})
+def head_to_head(serve, ret, fmt=None, tour=None):
+    """
+    Matrix H (N, N) of the probability that player i beats player j, with
+    H + H.T = 1 off the diagonal (0.5 on it). fmt is a formats.MatchFormat
+    (default best of 3, as in determiMM).
+    """
+    p = serve_matrix(serve, ret, tour)
+    n = len(p)
+    i, j = np.nonzero(~np.eye(n, dtype=bool))
+    if fmt is None:
+        v1 = batchLiveMM(p[i, j], p[j, i])["V1"]
+    else:
+        v1 = formatMM(fmt, p[i, j], p[j, i])["V1"]
+    # first[i, j]: i beats j when i serves first
+    first = np.full((n, n), 0.5)
+    first[i, j] = v1
+    return (first + 1 - first.T) / 2
+
+def _draw(draw, n_players):
+    draw = np.asarray([-1 if d is None else d for d in draw], dtype=int)
+    rounds = int(np.log2(max(len(draw), 1)))
+    if len(draw) < 2 or 2 ** rounds != len(draw):
+        raise ValueError("Invalid draw provided: the number of positions must be a power of 2.")
+    players = draw[draw >= 0]
+    if np.any(draw >= n_players) or len(np.unique(players)) != len(players):
+        raise ValueError("Invalid draw provided: unknown or repeated player.")
+    return draw, rounds
+
+@timed("tournament.advancement", lambda args, res: {"n": len(res["player"])})
+def advancement(H, draw, results=(), live=None):
+    """
+    Probability that each position of the draw reaches each round, from the
+    head-to-head matrix H. results lists, round by round, the ids of the
+    players known to have won a match of that round (rounds and matches still
+    to be played may be left out, but a result needs both its players
+    decided); live maps (i, j) to the current
+    probability that player i beats player j in their match in progress.
+    Returns a dict: player (ids by position) and reach, of shape
+    (positions, rounds + 1), whose column r is the probability of winning r
+    matches (the last column: winning the tournament).
+    """
+    H = np.array(H, dtype=float)
+    draw, rounds = _draw(draw, len(H))
+    for (i, j), v in (live or {}).items():
+        H[i, j], H[j, i] = v, 1 - v
+    n = len(draw)
+    position = {p: k for k, p in enumerate(draw) if p >= 0}
+    # Head-to-head of the positions, 0 against a bye
+    idx = np.maximum(draw, 0)
+    Hd = np.where((draw >= 0)[:, None], H[idx][:, idx], 0)
+
+    reach = np.zeros((n, rounds + 1))
+    reach[:, 0] = draw >= 0
+    for r in range(rounds):
+        s = 2 ** r
+        blocks = n // (2 * s)
+        # (blocks, 2s, 2s) diagonal blocks of Hd, and both halves of each block
+        Hb = Hd.reshape(blocks, 2 * s, blocks, 2 * s)[np.arange(blocks), :, np.arange(blocks), :]
+        left, right = reach[:, r].reshape(blocks, 2, s).transpose(1, 0, 2)
+        # Against nobody (both opponents were byes) a player goes through
+        win_left = (Hb[:, :s, s:] @ right[..., None])[..., 0] + 1 - right.sum(axis=1, keepdims=True)
+        win_right = (Hb[:, s:, :s] @ left[..., None])[..., 0] + 1 - left.sum(axis=1, keepdims=True)
+        reach[:, r + 1] = np.stack([left * win_left, right * win_right], axis=1).reshape(n)
+        # Matches of this round already decided
+        for winner in (results[r] if r < len(results) else ()):
+            k = position.get(winner)
+            if k is None or reach[k, r] != 1:
+                raise ValueError(f"Invalid result provided: player {winner} is not known to play in round {r + 1}.")
+            # The other half of the block must have produced the opponent (or nobody)
+            other = reach[(k // s ^ 1) * s:(k // s ^ 1) * s + s, r]
+            if not np.all((other == 0) | (other == 1)):
+                raise ValueError(f"Invalid result provided: the opponent of player {winner} in round {r + 1} "
+                                 "is not decided.")
+            block = slice(k // (2 * s) * 2 * s, (k // (2 * s) + 1) * 2 * s)
+            reach[block, r + 1] = 0
+            reach[k, r + 1] = 1
+    return {"player": draw, "reach": reach}
+
+def tournamentMM(serve, ret, draw, results=(), live=None, fmt=None, tour=None):
+    """
+    Outright probabilities of a draw from per-player serve and return point
+    shares: head_to_head then advancement.
+    """
+    return advancement(head_to_head(serve, ret, fmt, tour), draw, results, live)
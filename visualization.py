@@ -0,0 +1,121 @@
+##### Chain diagrams
+## Plotting is only needed for graph=True, so it lives here and is imported on
+## demand: importing core or functions does not load matplotlib or networkx.
+## The graph and its layout depend only on the structure of a chain (its states
+## and which transitions are non-zero), so they are built once per structure and
+## cached; edges are read from the non-zero entries of the matrix in one step.
+## render_chains draws N chains of a level to image files on an Agg canvas
+## (no display, no interactive backend): chains sharing a structure reuse one
+## figure whose edge labels and title are the only artists updated between
+## files.
+## Usage:
+##   render_chains("game", [0.6, 0.65, 0.7], paths=["g60.png", "g65.png", "g70.png"])
+
+from functools import lru_cache
+
+import numpy as np
+import networkx as nx
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from core import batchMC, chain_template
+from instrument import emit, timed
+
+# Title, node colour, edge label colour and figure size of each level
+CHAIN_STYLES = {
+    "game": ("Markov Chain: Tennis Game States", "lightblue", "red", (12, 5)),
+    "tb": ("Markov Chain: Tie-break States", "lightgreen", "red", (18, 12)),
+    "set": ("Markov Chain: Set States", "lightyellow", "blue", (18, 12)),
+    "match": ("Markov Chain: Match States", "lightcoral", "darkblue", (12, 5)),
+}
+
+def _edges(tMat):
+    # (rows, cols) of the non-zero transitions, row-major
+    return np.nonzero(np.asarray(tMat))
+
+@lru_cache(maxsize=64)
+def _structure(states, rows, cols):
+    # Directed graph and spring layout of one chain structure (states a tuple,
+    # rows / cols the bytes of the edge index arrays)
+    rows, cols = np.frombuffer(rows, dtype=np.intp), np.frombuffer(cols, dtype=np.intp)
+    G = nx.DiGraph()
+    G.add_edges_from(zip(np.asarray(states, dtype=object)[rows], np.asarray(states, dtype=object)[cols]))
+    pos = nx.spring_layout(G, seed=42)
+    return G, pos
+
+def _layout(tMat, states):
+    rows, cols = _edges(tMat)
+    hits = _structure.cache_info().hits
+    G, pos = _structure(tuple(states), rows.tobytes(), cols.tobytes())
+    emit("visualization.layout", hit=_structure.cache_info().hits > hits)
+    return G, pos, rows, cols
+
+def _labels(values):
+    return np.char.mod("%.2f", values)
+
+def _headless(figsize, dpi=100):
+    # Figure on its own Agg canvas, outside pyplot
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _draw(fig, G, pos, title, node_color, font_color):
+    # Draws the graph on fig; returns the edge label artists keyed by edge
+    ax = fig.add_subplot()
+    nx.draw_networkx(G, pos, ax=ax, node_size=1500, node_color=node_color, arrows=True)
+    texts = nx.draw_networkx_edge_labels(G, pos, edge_labels={e: "" for e in G.edges}, font_color=font_color, ax=ax)
+    ax.set_title(title)
+    ax.set_axis_off()
+    return texts
+
+def draw_chain(tMat, states, title, node_color, font_color, figsize, path=None):
+    """
+    Draws the transition graph of a chain, one edge per non-zero transition.
+    Shows it, or with path writes it to that image file without a display.
+    """
+    G, pos, rows, cols = _layout(tMat, states)
+    if path is None:
+        # Interactive display only: file output does not go through pyplot
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=figsize)
+    else:
+        fig = _headless(figsize)
+    texts = _draw(fig, G, pos, title, node_color, font_color)
+    states = np.asarray(states)
+    for u, v, label in zip(states[rows], states[cols], _labels(np.asarray(tMat)[rows, cols])):
+        texts[u, v].set_text(label)
+    if path is None:
+        plt.show()
+        return None
+    fig.savefig(path)
+    return path
+
+@timed("visualization.render_chains", lambda args, paths: {"n": len(paths)})
+def render_chains(level, *params, paths, titles=None, classes=None, dpi=100):
+    """
+    Writes the diagrams of N chains of `level` ("game", "tb", "set" or
+    "match"), built from params as in core.batchMC, to the N image files of
+    paths (the format follows each extension). titles (one per chain)
+    default to the level's title. Returns paths.
+    """
+    tMats = batchMC(level, *params, classes=classes)
+    paths = list(paths)
+    if len(paths) != len(tMats):
+        raise ValueError(f"Expected {len(tMats)} paths, got {len(paths)}.")
+    title, node_color, font_color, figsize = CHAIN_STYLES[level]
+    titles = [title] * len(paths) if titles is None else list(titles)
+    states = np.asarray(chain_template(level).states)
+
+    # Chains with the same non-zero pattern share one figure
+    patterns, which = np.unique(tMats.reshape(len(tMats), -1) != 0, axis=0, return_inverse=True)
+    for k in range(len(patterns)):
+        members = np.flatnonzero(which.ravel() == k)
+        G, pos, rows, cols = _layout(tMats[members[0]], states)
+        fig = _headless(figsize, dpi)
+        texts = _draw(fig, G, pos, title, node_color, font_color)
+        changing = [texts[u, v] for u, v in zip(states[rows], states[cols])] + [fig.axes[0].title]
+        for m, row in zip(members, _labels(tMats[members][:, rows, cols])):
+            for text, label in zip(changing, [*row, titles[m]]):
+                text.set_text(label)
+            fig.savefig(paths[m])
+    return paths